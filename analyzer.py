@@ -0,0 +1,229 @@
+import csv
+import io
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional
+
+from clients import get_gateway
+
+ANALYZE_MAX_CONCURRENCY = int(os.environ.get("ANALYZE_MAX_CONCURRENCY", 8))
+EMOTIONS = ("happy", "neutral", "sad", "angry", "anxious")
+LEVELS = ("low", "medium", "high")
+TONES = ("positive", "neutral", "negative")
+MESSAGE_FIELDS = ("message", "text", "body", "content")
+
+# Shape every analysis must have; checked locally by validate_analysis
+ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "emotion": {"type": "string", "enum": list(EMOTIONS)},
+        "formality": {"type": "string", "enum": list(LEVELS)},
+        "urgency": {"type": "string", "enum": list(LEVELS)},
+        "urgency_score": {"type": "integer", "minimum": 1, "maximum": 5},
+        "relationship": {"type": "string"},
+        "summary": {"type": "string"},
+        "keywords": {"type": "array", "items": {"type": "string"}},
+        "responses": {
+            "type": "object",
+            "properties": {tone: {"type": "string"} for tone in TONES},
+            "required": list(TONES),
+        },
+    },
+    "required": ["emotion", "formality", "urgency", "urgency_score", "relationship",
+                 "summary", "keywords", "responses"],
+}
+
+
+class AnalysisError(ValueError):
+    pass
+
+
+@dataclass
+class InboxMessage:
+    row: int
+    message: str
+    id: Optional[str] = None
+    sender: Optional[str] = None
+
+
+@dataclass
+class AnalysisResult:
+    item: InboxMessage
+    analysis: Optional[dict] = None
+    error: Optional[str] = None
+    latency: float = 0.0
+
+
+def _check(value, schema: dict, path: str):
+    kind = schema["type"]
+    if kind == "object":
+        if not isinstance(value, dict):
+            raise AnalysisError(f"{path or 'analysis'} must be an object")
+        missing = [key for key in schema.get("required", []) if key not in value]
+        if missing:
+            raise AnalysisError(f"{path or 'analysis'} is missing {', '.join(missing)}")
+        return {key: _check(value[key], sub, f"{path}.{key}".lstrip("."))
+                for key, sub in schema["properties"].items() if key in value}
+    if kind == "array":
+        if not isinstance(value, list):
+            raise AnalysisError(f"{path} must be a list")
+        return [_check(item, schema["items"], f"{path}[]") for item in value]
+    if kind == "integer":
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or int(value) != value:
+            raise AnalysisError(f"{path} must be an integer")
+        value = int(value)
+        if not schema.get("minimum", value) <= value <= schema.get("maximum", value):
+            raise AnalysisError(f"{path} must be between {schema['minimum']} and {schema['maximum']}")
+        return value
+    if not isinstance(value, str):
+        raise AnalysisError(f"{path} must be a string")
+    value = value.strip()
+    if "enum" in schema:
+        value = value.lower()
+        if value not in schema["enum"]:
+            raise AnalysisError(f"{path} must be one of {', '.join(schema['enum'])}, got {value!r}")
+    return value
+
+
+def validate_analysis(data) -> dict:
+    """Check a decoded analysis against ANALYSIS_SCHEMA, normalising enum case"""
+    return _check(data, ANALYSIS_SCHEMA, "")
+
+
+def build_messages(message: str) -> List[dict]:
+    prompt = f"""
+    Analyze this message from someone else:
+    "{message}"
+
+    Reply with a JSON object with exactly these keys:
+    - "emotion": primary emotion, one of {", ".join(EMOTIONS)}
+    - "formality": one of {", ".join(LEVELS)}
+    - "urgency": one of {", ".join(LEVELS)}
+    - "urgency_score": integer from 1 (can wait) to 5 (needs a reply now)
+    - "relationship": short description of the relationship context
+    - "summary": 1-sentence plain language summary
+    - "keywords": list of important words
+    - "responses": object with "positive", "neutral" and "negative" response drafts
+    """
+    return [
+        {"role": "system", "content": "You are a social communication assistant. You reply only with JSON."},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def analyze(message: str, attempts: int = 2, use_cache: Optional[bool] = None) -> dict:
+    """Structured analysis of one message; retries once if the reply does not match the schema"""
+    gateway = get_gateway()
+    messages = build_messages(message)
+    params = {"temperature": 0.2, "max_tokens": 500, "response_format": {"type": "json_object"}}
+    for attempt in range(attempts):
+        response = gateway.chat("analyze_message", messages, use_cache=use_cache, **params)
+        content = response.choices[0].message.content or ""
+        try:
+            return validate_analysis(json.loads(content))
+        except (json.JSONDecodeError, AnalysisError) as e:
+            error = e
+            # Don't let the prompt cache replay a reply that failed validation
+            gateway.forget(messages, **params)
+            messages = messages + [
+                {"role": "assistant", "content": content},
+                {"role": "user", "content": f"That reply was invalid ({e}). Reply with corrected JSON only."}
+            ]
+    raise AnalysisError(f"Invalid analysis after {attempts} attempts: {error}")
+
+
+def to_sections(analysis: dict) -> dict:
+    """Shape used by the Analyzer tab"""
+    return {
+        "emotion": analysis["emotion"],
+        "cues": [f"Formality: {analysis['formality']}",
+                 f"Urgency: {analysis['urgency']} ({analysis['urgency_score']}/5)",
+                 f"Relationship: {analysis['relationship']}"],
+        "summary": analysis["summary"],
+        "keywords": analysis["keywords"],
+        "responses": analysis["responses"],
+    }
+
+
+def _analyze(item: InboxMessage, use_cache: Optional[bool] = None) -> AnalysisResult:
+    started = time.perf_counter()
+    result = AnalysisResult(item=item)
+    try:
+        result.analysis = analyze(item.message, use_cache=use_cache)
+    except Exception as e:
+        result.error = str(e)
+    result.latency = time.perf_counter() - started
+    return result
+
+
+def analyze_batch(items: Iterable[InboxMessage], max_workers: int = ANALYZE_MAX_CONCURRENCY,
+                  use_cache: Optional[bool] = None) -> Iterator[AnalysisResult]:
+    """Analyze messages concurrently, yielding each result as soon as it completes.
+
+    Closing the generator early (e.g. on a Streamlit rerun) cancels the
+    messages that have not started instead of waiting for them.
+    """
+    items = list(items)
+    if not items:
+        return
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(items)))
+    try:
+        futures = [executor.submit(_analyze, item, use_cache) for item in items]
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _message_item(row: int, record: dict) -> Optional[InboxMessage]:
+    record = {str(key).strip().lower(): value for key, value in record.items()}
+    text = next((record[key] for key in MESSAGE_FIELDS if record.get(key)), None)
+    if not isinstance(text, str) or not text.strip():
+        return None
+    sender = record.get("sender") or record.get("from")
+    return InboxMessage(row=row, message=text.strip(),
+                        id=str(record["id"]) if record.get("id") is not None else None,
+                        sender=str(sender) if sender else None)
+
+
+def read_messages(data: str, filename: str = "") -> List[InboxMessage]:
+    """Parse an exported inbox: a JSON array or JSONL records, a CSV with a
+    message/text/body column, or plain text with one message per line"""
+    data = data.lstrip("\ufeff")
+    first_line = data.lstrip().split("\n", 1)[0]
+    if first_line.startswith("["):
+        records = json.loads(data)
+    elif filename.endswith((".jsonl", ".json")) or first_line.startswith("{"):
+        records = [json.loads(line) for line in data.splitlines() if line.strip()]
+    elif filename.endswith(".csv") or set(MESSAGE_FIELDS) & {c.strip() for c in first_line.lower().split(",")}:
+        records = list(csv.DictReader(io.StringIO(data.lstrip())))
+    else:
+        records = [{"message": line} for line in data.splitlines()]
+    items = [_message_item(i, record) for i, record in enumerate(records, 1)]
+    return [item for item in items if item]
+
+
+def build_report(results: List[AnalysisResult], elapsed: float) -> dict:
+    """Aggregate a batch into emotion counts, an urgency ranking and throughput"""
+    analyzed = [r for r in results if r.analysis]
+    ranking = sorted(analyzed, key=lambda r: (-r.analysis["urgency_score"], r.item.row))
+    return {
+        "messages": len(results),
+        "analyzed": len(analyzed),
+        "failed": len(results) - len(analyzed),
+        "elapsed_seconds": round(elapsed, 2),
+        "messages_per_second": round(len(results) / elapsed, 2) if elapsed else None,
+        "avg_latency_seconds": round(sum(r.latency for r in results) / len(results), 2) if results else None,
+        "emotions": dict(Counter(r.analysis["emotion"] for r in analyzed).most_common()),
+        "urgency_ranking": [
+            {"row": r.item.row, "id": r.item.id, "sender": r.item.sender,
+             "urgency_score": r.analysis["urgency_score"], "urgency": r.analysis["urgency"],
+             "emotion": r.analysis["emotion"], "summary": r.analysis["summary"]}
+            for r in ranking
+        ],
+        "errors": [{"row": r.item.row, "id": r.item.id, "error": r.error} for r in results if r.error],
+    }
@@ -0,0 +1,109 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from transcript_cache import CACHE_ROOT
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = float(os.environ.get("RAG_ANSWER_CACHE_THRESHOLD", 0.92))
+DEFAULT_TTL_SECONDS = float(os.environ.get("RAG_ANSWER_CACHE_TTL", 7 * 24 * 3600))
+DEFAULT_MAX_ENTRIES = int(os.environ.get("RAG_ANSWER_CACHE_MAX_ENTRIES", 5000))
+
+
+class SemanticAnswerCache:
+    """SQLite store of answered questions, matched by question-embedding similarity.
+
+    Entries are scoped (normally to the video ids searched) and to the embed
+    model, expire after ``ttl`` seconds, and the least recently used ones are
+    evicted beyond ``max_entries``.
+    """
+
+    def __init__(self, path: Optional[str] = None, threshold: float = DEFAULT_THRESHOLD,
+                 ttl: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path or os.path.join(CACHE_ROOT, "answers.sqlite")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                " id INTEGER PRIMARY KEY, scope TEXT NOT NULL, model TEXT NOT NULL,"
+                " question TEXT NOT NULL, embedding BLOB NOT NULL, answer TEXT NOT NULL,"
+                " suggestions TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS answers_scope ON answers (scope, model)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def lookup(self, scope: str, model: str, embedding: Sequence[float]) -> Optional[dict]:
+        """Best stored answer for this scope whose question is similar enough, if any"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, question, embedding, answer, suggestions FROM answers "
+                "WHERE scope = ? AND model = ? AND created >= ?",
+                (scope, model, time.time() - self.ttl)
+            ).fetchall()
+            best = None
+            if rows:
+                matrix = np.stack([np.frombuffer(row[2], dtype=np.float32) for row in rows])
+                query = np.asarray(embedding, dtype=np.float32)
+                norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+                norms[norms == 0] = 1.0
+                similarities = matrix @ query / norms
+                i = int(np.argmax(similarities))
+                if similarities[i] >= self.threshold:
+                    best = rows[i], float(similarities[i])
+            if best is not None:
+                conn.execute("UPDATE answers SET last_used = ? WHERE id = ?", (time.time(), best[0][0]))
+        with self._lock:
+            if best is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if best is None:
+            return None
+        row, similarity = best
+        return {"question": row[1], "answer": row[3], "suggestions": json.loads(row[4]),
+                "similarity": similarity}
+
+    def store(self, scope: str, model: str, question: str, embedding: Sequence[float],
+              answer: str, suggestions: List[str]) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO answers (scope, model, question, embedding, answer, suggestions, created, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (scope, model, question, array("f", embedding).tobytes(), answer,
+                 json.dumps(suggestions), now, now)
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM answers WHERE created < ?", (now - self.ttl,))
+        conn.execute(
+            "DELETE FROM answers WHERE id NOT IN "
+            "(SELECT id FROM answers ORDER BY last_used DESC LIMIT ?)",
+            (self.max_entries,)
+        )
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0}
+
+
+answer_cache = SemanticAnswerCache()
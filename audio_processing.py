@@ -0,0 +1,328 @@
+import json
+import logging
+import os
+import re
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SECONDS = 600.0
+OVERLAP_SECONDS = 10.0
+
+# Codecs whose packets can be copied straight into a container Whisper accepts
+STREAM_COPY_CONTAINERS = {
+    "mp3": ".mp3",
+    "aac": ".m4a",
+    "opus": ".webm",
+    "vorbis": ".ogg",
+    "flac": ".flac",
+}
+
+# Pre-processing: speech-band mono at a bitrate Whisper handles without loss
+PREPROCESS_SAMPLE_RATE = 16000
+PREPROCESS_BITRATE = "32k"
+# Default libmp3lame bitrate, used to estimate what an unprocessed chunk costs
+BASELINE_BITRATE = 128000
+SILENCE_NOISE_DB = -35
+# Silences at least this long are cut out; shorter pauses are left intact
+MIN_TRIM_SILENCE = 2.0
+# Audio kept on each side of a trimmed silence so words are not clipped
+SILENCE_PADDING = 0.25
+# No chunk starts more than this before the previous one ends, fixed or silence-cut
+MAX_CHUNK_OVERLAP_SECONDS = OVERLAP_SECONDS + 2 * SILENCE_PADDING
+
+
+@dataclass
+class AudioInfo:
+    duration: float
+    codec: Optional[str]
+    bit_rate: Optional[int]
+
+
+@dataclass
+class ChunkInfo:
+    index: int
+    path: str
+    start: float
+    duration: float
+    elapsed: float = 0.0
+    size: int = 0
+    stream_copy: bool = False
+    # Absolute (start, end) spans kept after silence trimming; None keeps everything
+    kept: Optional[List[Tuple[float, float]]] = None
+
+    @property
+    def end(self) -> float:
+        return self.start + self.duration
+
+    @property
+    def speech_seconds(self) -> float:
+        if self.kept is None:
+            return self.duration
+        return sum(end - start for start, end in self.kept)
+
+    def to_absolute(self, t: float) -> float:
+        """Map a time in the uploaded (possibly trimmed) chunk to source time"""
+        if self.kept is None:
+            return self.start + t
+        for start, end in self.kept:
+            if t <= end - start:
+                return start + t
+            t -= end - start
+        return self.kept[-1][1] if self.kept else self.start
+
+
+@dataclass
+class PreprocessReport:
+    chunks: int
+    source_seconds: float
+    baseline_seconds: float
+    uploaded_seconds: float
+    baseline_bytes: int
+    uploaded_bytes: int
+
+    @property
+    def seconds_saved(self) -> float:
+        return self.baseline_seconds - self.uploaded_seconds
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.baseline_bytes - self.uploaded_bytes
+
+    def as_dict(self) -> dict:
+        return {
+            "chunks": self.chunks,
+            "source_seconds": round(self.source_seconds, 1),
+            "baseline_seconds": round(self.baseline_seconds, 1),
+            "uploaded_seconds": round(self.uploaded_seconds, 1),
+            "seconds_saved": round(self.seconds_saved, 1),
+            "baseline_bytes": self.baseline_bytes,
+            "uploaded_bytes": self.uploaded_bytes,
+            "bytes_saved": self.bytes_saved,
+        }
+
+    @classmethod
+    def from_chunks(cls, info: "AudioInfo", chunks: List[ChunkInfo]) -> "PreprocessReport":
+        """Compare uploaded chunks against fixed 600s stereo MP3 chunking"""
+        baseline_seconds = sum(length for _, length in plan_chunks(info.duration))
+        return cls(
+            chunks=len(chunks),
+            source_seconds=info.duration,
+            baseline_seconds=baseline_seconds,
+            uploaded_seconds=sum(chunk.speech_seconds for chunk in chunks),
+            baseline_bytes=int(baseline_seconds * BASELINE_BITRATE / 8),
+            uploaded_bytes=sum(chunk.size for chunk in chunks),
+        )
+
+
+def probe_audio(input_file: str) -> AudioInfo:
+    """Read duration and codec of the first audio stream in one ffprobe call"""
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "a:0",
+         "-show_entries", "format=duration,bit_rate:stream=codec_name",
+         "-of", "json", input_file],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True
+    )
+    data = json.loads(result.stdout)
+    streams = data.get("streams") or [{}]
+    fmt = data.get("format", {})
+    bit_rate = fmt.get("bit_rate")
+    return AudioInfo(
+        duration=float(fmt["duration"]),
+        codec=streams[0].get("codec_name"),
+        bit_rate=int(bit_rate) if bit_rate else None
+    )
+
+
+def plan_chunks(duration: float, chunk_seconds: float = CHUNK_SECONDS,
+                overlap_seconds: float = OVERLAP_SECONDS) -> List[tuple]:
+    """Return (start, duration) pairs covering the audio with fixed overlap"""
+    step = chunk_seconds - overlap_seconds
+    spans = []
+    start = 0.0
+    while start < duration:
+        spans.append((start, min(chunk_seconds, duration - start)))
+        start += step
+    return spans
+
+
+def _select_filter(chunk: ChunkInfo) -> str:
+    # Input seeking resets timestamps, so spans are relative to the chunk start
+    spans = "+".join(
+        f"between(t,{start - chunk.start:.3f},{end - chunk.start:.3f})"
+        for start, end in chunk.kept
+    )
+    return f"aselect='{spans}',asetpts=N/SR/TB"
+
+
+def encode_chunk(input_file: str, chunk: ChunkInfo, preprocess: bool = False) -> ChunkInfo:
+    if preprocess:
+        codec_args = ["-ac", "1", "-ar", str(PREPROCESS_SAMPLE_RATE),
+                      "-c:a", "libmp3lame", "-b:a", PREPROCESS_BITRATE]
+        if chunk.kept:
+            codec_args = ["-af", _select_filter(chunk)] + codec_args
+    elif chunk.stream_copy:
+        codec_args = ["-c:a", "copy"]
+    else:
+        codec_args = ["-c:a", "libmp3lame"]
+    ffmpeg_cmd = [
+        "ffmpeg",
+        "-ss", str(chunk.start),
+        "-i", input_file,
+        "-t", str(chunk.duration),
+        "-vn",
+        *codec_args,
+        "-y",
+        chunk.path
+    ]
+    started = time.perf_counter()
+    subprocess.run(ffmpeg_cmd, check=True, capture_output=True)
+    chunk.elapsed = time.perf_counter() - started
+    chunk.size = os.path.getsize(chunk.path)
+    return chunk
+
+
+def detect_silences(input_file: str, noise_db: float = SILENCE_NOISE_DB,
+                    min_silence: float = MIN_TRIM_SILENCE) -> List[Tuple[float, float]]:
+    """Energy-based voice activity detection with ffmpeg's silencedetect filter.
+
+    Decodes the file once at 16 kHz mono and returns (start, end) of every
+    silence at least ``min_silence`` seconds long.
+    """
+    result = subprocess.run(
+        ["ffmpeg", "-i", input_file, "-vn", "-ac", "1", "-ar", str(PREPROCESS_SAMPLE_RATE),
+         "-af", f"silencedetect=noise={noise_db}dB:d={min_silence}", "-f", "null", "-"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True
+    )
+    silences = []
+    start = None
+    for line in result.stderr.splitlines():
+        match = re.search(r"silence_(start|end): (-?[\d.]+)", line)
+        if not match:
+            continue
+        if match.group(1) == "start":
+            start = max(0.0, float(match.group(2)))
+        elif start is not None:
+            silences.append((start, float(match.group(2))))
+            start = None
+    if start is not None:
+        silences.append((start, float("inf")))
+    return silences
+
+
+def plan_chunks_at_silence(duration: float, silences: List[Tuple[float, float]],
+                           chunk_seconds: float = CHUNK_SECONDS,
+                           overlap_seconds: float = OVERLAP_SECONDS) -> List[Tuple[float, float, list]]:
+    """Plan (start, duration, kept spans) chunks that end inside silences.
+
+    Speech spans are the complement of the detected silences, padded so word
+    edges survive. Chunks pack whole speech spans up to ``chunk_seconds`` and
+    are cut in the silence between two spans, so they need no overlap; a
+    single span longer than a chunk falls back to fixed overlapping cuts.
+    """
+    speech = []
+    cursor = 0.0
+    for start, end in silences:
+        if start > cursor:
+            speech.append((max(0.0, cursor - SILENCE_PADDING), min(duration, start + SILENCE_PADDING)))
+        cursor = end
+    if cursor < duration:
+        speech.append((max(0.0, cursor - SILENCE_PADDING), duration))
+
+    pieces = []
+    for start, end in speech:
+        if end - start <= chunk_seconds:
+            pieces.append((start, end))
+        else:
+            for offset, length in plan_chunks(end - start, chunk_seconds, overlap_seconds):
+                pieces.append((start + offset, start + offset + length))
+
+    chunks = []
+    current = []
+    for piece in pieces:
+        if current and piece[1] - current[0][0] > chunk_seconds:
+            chunks.append(current)
+            current = []
+        current.append(piece)
+    if current:
+        chunks.append(current)
+    return [(spans[0][0], spans[-1][1] - spans[0][0], spans) for spans in chunks]
+
+
+def plan_preprocessed_chunks(input_file: str, output_dir: str, info: AudioInfo,
+                             chunk_seconds: float = CHUNK_SECONDS,
+                             overlap_seconds: float = OVERLAP_SECONDS) -> List[ChunkInfo]:
+    silences = detect_silences(input_file)
+    plan = plan_chunks_at_silence(info.duration, silences, chunk_seconds, overlap_seconds)
+    return [
+        ChunkInfo(index=i, path=os.path.join(output_dir, f"chunk_{i:03d}.mp3"),
+                  start=start, duration=length, kept=spans)
+        for i, (start, length, spans) in enumerate(plan)
+    ]
+
+
+def cut_workers(chunk_count: int, max_workers: Optional[int] = None) -> int:
+    """ffmpeg processes to cut ``chunk_count`` chunks with: one per CPU unless given"""
+    return max_workers or min(chunk_count, os.cpu_count() or 1) or 1
+
+
+def segment_audio(input_file: str, output_dir: str, info: Optional[AudioInfo] = None,
+                  max_workers: Optional[int] = None, stream_copy: Optional[bool] = None,
+                  preprocess: bool = False,
+                  chunk_seconds: float = CHUNK_SECONDS,
+                  overlap_seconds: float = OVERLAP_SECONDS) -> List[ChunkInfo]:
+    """Cut overlapping chunks in a bounded pool of ffmpeg processes.
+
+    Each chunk seeks on the input rather than decoding from the start, so
+    chunks are independent and run in parallel. When the source codec can be
+    stored in a container Whisper accepts, packets are copied instead of
+    re-encoded; pass ``stream_copy=False`` to force MP3 re-encoding. With
+    ``preprocess`` chunks are cut at silences, long silences are removed and
+    the audio is downmixed to 16 kHz mono at a low bitrate.
+    """
+    info = info or probe_audio(input_file)
+    os.makedirs(output_dir, exist_ok=True)
+    if preprocess:
+        chunks = plan_preprocessed_chunks(input_file, output_dir, info, chunk_seconds, overlap_seconds)
+    else:
+        copy_ext = STREAM_COPY_CONTAINERS.get(info.codec or "")
+        use_copy = bool(copy_ext) if stream_copy is None else (stream_copy and bool(copy_ext))
+        ext = copy_ext if use_copy else ".mp3"
+        chunks = [
+            ChunkInfo(index=i, path=os.path.join(output_dir, f"chunk_{i:03d}{ext}"),
+                      start=start, duration=length, stream_copy=use_copy)
+            for i, (start, length) in enumerate(plan_chunks(info.duration, chunk_seconds, overlap_seconds))
+        ]
+    workers = cut_workers(len(chunks), max_workers)
+
+    started = time.perf_counter()
+    done = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(encode_chunk, input_file, chunk, preprocess) for chunk in chunks]
+        for chunk, future in zip(chunks, futures):
+            try:
+                done.append(future.result())
+            except subprocess.CalledProcessError as e:
+                logger.error(f"Error creating chunk {chunk.index}: {e.stderr.decode(errors='replace')}")
+                for pending in futures:
+                    pending.cancel()
+                break
+    for chunk in done:
+        action = "preprocessed" if preprocess else "copied" if chunk.stream_copy else "encoded"
+        logger.info(f"Chunk {chunk.index} [{chunk.start:.0f}s +{chunk.duration:.0f}s] "
+                    f"{action} in {chunk.elapsed:.2f}s")
+    logger.info(f"Segmented {info.duration:.0f}s of {info.codec} audio into {len(done)} chunks "
+                f"with {workers} workers in {time.perf_counter() - started:.2f}s")
+    if preprocess:
+        logger.info(f"Pre-processing report: {PreprocessReport.from_chunks(info, done).as_dict()}")
+    return done
@@ -0,0 +1,99 @@
+"""Compare embedding backends: indexing throughput, query latency and stored bytes per vector.
+
+Usage: python benchmarks/bench_embeddings.py [--nodes 200 2000] [--backends openai local]
+       [--queries 20] [--fake] [--latency 0.2] [--json out.json]
+
+Nodes are synthetic transcript passages of roughly CHUNK_SIZE tokens, so
+their timing is representative but their retrieval quality is not. Both
+backends are called directly, bypassing the embedding cache, so every run
+measures real work. ``--fake`` (implied when OPENAI_API_KEY is unset) sends
+the OpenAI backend to the local stand-in server with ``--latency`` seconds
+per request.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_openai import WORDS, Behavior, FakeOpenAI  # noqa: E402
+
+WORDS_PER_NODE = 190  # about 256 tokens
+BYTES_PER_VALUE = {"float32": 4, "float16": 2, "int8": 1}
+
+
+def make_passages(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(WORDS_PER_NODE)) + f" ({i})" for i in range(count)]
+
+
+def measure(backend: str, nodes: int, queries: int, vector_dtype: str) -> dict:
+    from clients import get_embed_model
+    from embedding_cache import model_key
+
+    embed_model = get_embed_model(backend=backend)
+    # Warm up: loads a local model or opens the API connection outside the timed region
+    dim = len(embed_model.get_text_embedding("warm up"))
+
+    passages = make_passages(nodes)
+    started = time.perf_counter()
+    embed_model.get_text_embedding_batch(passages)
+    elapsed = time.perf_counter() - started
+
+    latencies = []
+    for i in range(queries):
+        started = time.perf_counter()
+        embed_model.get_query_embedding(f"what did the lecture say about {WORDS[i % len(WORDS)]} ({i})")
+        latencies.append(time.perf_counter() - started)
+    return {
+        "backend": backend,
+        "model": model_key(embed_model),
+        "nodes": nodes,
+        "dim": dim,
+        "index_seconds": round(elapsed, 3),
+        "nodes_per_second": round(nodes / elapsed, 1),
+        "query_ms_p50": round(statistics.median(latencies) * 1000, 2),
+        "query_ms_max": round(max(latencies) * 1000, 2),
+        f"bytes_per_vector_{vector_dtype}": dim * BYTES_PER_VALUE[vector_dtype],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, nargs="+", default=[200, 2000])
+    parser.add_argument("--backends", nargs="+", default=["openai", "local"])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--fake", action="store_true", help="use the local stand-in for the OpenAI API")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake server latency per request")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    fake = None
+    if "openai" in args.backends and (args.fake or not os.environ.get("OPENAI_API_KEY")):
+        # The stand-in returns 3072-d vectors, like text-embedding-3-large
+        fake = FakeOpenAI(embedding_dim=3072, embeddings=Behavior(latency=args.latency)).start()
+        os.environ.update(OPENAI_API_KEY="sk-benchmark", OPENAI_BASE_URL=fake.base_url)
+    vector_dtype = os.environ.get("RAG_VECTOR_DTYPE", "float16")
+
+    results = []
+    for nodes in args.nodes:
+        for backend in args.backends:
+            result = measure(backend, nodes, args.queries, vector_dtype)
+            results.append(result)
+            print(f"{nodes:>6} nodes  {backend:<7} {result['nodes_per_second']:>9.1f} nodes/s  "
+                  f"query p50 {result['query_ms_p50']:>8.2f} ms  {result['dim']:>5}d  "
+                  f"{result[f'bytes_per_vector_{vector_dtype}']:>6} B/vector ({vector_dtype})")
+    if fake:
+        fake.stop()
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Compare transcription backends by realtime factor (processing seconds per second of audio).
+
+Usage: python benchmarks/bench_transcription.py [--audio lecture.mp3] [--minutes 1 10]
+       [--backends openai local] [--fake] [--latency 0.5] [--json out.json]
+
+Each input is cut into the pipeline's chunks and transcribed by every
+backend with that backend's own concurrency. Without ``--audio``, synthetic
+tone bursts are used: fine for timing, meaningless for accuracy. ``--fake``
+(implied when OPENAI_API_KEY is unset) sends the OpenAI backend to the local
+stand-in server with ``--latency`` seconds per request, so the comparison
+runs offline. An RTF below 1 is faster than realtime.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_openai import Behavior, FakeOpenAI  # noqa: E402
+from run_benchmarks import slice_wav, synthesize_audio  # noqa: E402
+
+
+def make_chunks(audio: str, work_dir: str) -> list:
+    chunk_dir = tempfile.mkdtemp(dir=work_dir)
+    if shutil.which("ffmpeg") and shutil.which("ffprobe"):
+        from audio_processing import segment_audio
+        return segment_audio(audio, chunk_dir)
+    if not audio.endswith(".wav"):
+        raise SystemExit("ffmpeg is needed to split non-WAV audio")
+    return slice_wav(audio, chunk_dir)
+
+
+def measure(backend_name: str, label: str, chunks: list) -> dict:
+    from transcription_backends import get_backend
+
+    backend = get_backend(backend_name)
+    audio_seconds = sum(chunk.duration for chunk in chunks)
+    if backend_name == "local":
+        # Load the model outside the timed region; it is paid once per process
+        backend.model
+
+    def timed(chunk):
+        started = time.perf_counter()
+        segments = backend.transcribe(chunk.path)
+        return time.perf_counter() - started, segments
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=backend.max_concurrency) as executor:
+        results = list(executor.map(timed, chunks))
+    wall = time.perf_counter() - started
+    latencies = [latency for latency, _ in results]
+    return {
+        "input": label,
+        **backend.describe(),
+        "concurrency": backend.max_concurrency,
+        "chunks": len(chunks),
+        "audio_seconds": round(audio_seconds, 1),
+        "wall_seconds": round(wall, 3),
+        "realtime_factor": round(wall / audio_seconds, 4),
+        "chunk_rtf_p50": round(statistics.median(lat / c.duration for lat, c in zip(latencies, chunks)), 4),
+        "segments": sum(len(segments) for _, segments in results),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--audio", nargs="+", default=[], help="real recordings to transcribe")
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1, 10],
+                        help="lengths of synthetic audio when --audio is not given")
+    parser.add_argument("--backends", nargs="+", default=["openai", "local"])
+    parser.add_argument("--fake", action="store_true", help="use the local stand-in for the OpenAI API")
+    parser.add_argument("--latency", type=float, default=0.5, help="fake server latency per request")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    fake = None
+    if "openai" in args.backends and (args.fake or not os.environ.get("OPENAI_API_KEY")):
+        fake = FakeOpenAI(transcriptions=Behavior(latency=args.latency)).start()
+        os.environ.update(OPENAI_API_KEY="sk-benchmark", OPENAI_BASE_URL=fake.base_url)
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        inputs = [(os.path.basename(path), path) for path in args.audio]
+        for minutes in ([] if args.audio else args.minutes):
+            path = os.path.join(work_dir, f"synthetic_{minutes:g}m.wav")
+            synthesize_audio(path, minutes * 60)
+            inputs.append((f"synthetic {minutes:g} min", path))
+
+        for label, path in inputs:
+            chunks = make_chunks(path, work_dir)
+            for backend_name in args.backends:
+                result = measure(backend_name, label, chunks)
+                results.append(result)
+                print(f"{label:<24} {backend_name:<7} {result['wall_seconds']:>9.2f}s for "
+                      f"{result['audio_seconds']:>7.0f}s of audio  RTF {result['realtime_factor']:.3f} "
+                      f"({1 / result['realtime_factor']:.1f}x realtime)")
+    if fake:
+        fake.stop()
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Compare memory and top-k latency of the default SimpleVectorStore and NumpyVectorStore.
+
+Usage: python benchmarks/bench_vector_store.py [--rows 2000 20000] [--dim 3072] [--json out.json]
+
+Vectors are random, so recall for the truncated store understates what real
+text-embedding-3 vectors (trained for Matryoshka truncation) achieve.
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores import SimpleVectorStore
+from llama_index.core.vector_stores.types import VectorStoreQuery
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vector_store import NumpyVectorStore  # noqa: E402
+
+TOP_K = 5
+
+
+def make_nodes(vectors: np.ndarray) -> list:
+    return [TextNode(id_=str(i), text="", embedding=v.tolist()) for i, v in enumerate(vectors)]
+
+
+def measure(name: str, store, vectors: np.ndarray, queries: np.ndarray, exact: list) -> dict:
+    # Nodes are dropped after adding, so only what the store retains is counted
+    gc.collect()
+    tracemalloc.start()
+    nodes = make_nodes(vectors)
+    store.add(nodes)
+    del nodes
+    gc.collect()
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies, recalls = [], []
+    for query, truth in zip(queries, exact):
+        started = time.perf_counter()
+        result = store.query(VectorStoreQuery(query_embedding=query.tolist(), similarity_top_k=TOP_K))
+        latencies.append(time.perf_counter() - started)
+        recalls.append(len(set(result.ids) & truth) / TOP_K)
+    return {
+        "store": name,
+        "memory_mb": round(memory / 2 ** 20, 2),
+        "query_ms_p50": round(statistics.median(latencies) * 1000, 3),
+        "query_ms_max": round(max(latencies) * 1000, 3),
+        f"recall@{TOP_K}": round(statistics.mean(recalls), 3),
+    }
+
+
+def run(rows: int, dim: int, num_queries: int) -> list:
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(rows, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = vectors[rng.choice(rows, num_queries)] + rng.normal(scale=0.05, size=(num_queries, dim))
+    exact = [set(map(str, np.argsort(-(vectors @ q))[:TOP_K])) for q in queries.astype(np.float32)]
+
+    stores = [
+        ("SimpleVectorStore", SimpleVectorStore()),
+        ("Numpy float16", NumpyVectorStore(dtype="float16")),
+        ("Numpy int8", NumpyVectorStore(dtype="int8")),
+        (f"Numpy int8 @{dim // 3}d", NumpyVectorStore(dtype="int8", dimensions=dim // 3)),
+    ]
+    results = []
+    for name, store in stores:
+        result = measure(name, store, vectors, queries, exact)
+        result.update(rows=rows, dim=dim)
+        results.append(result)
+        print(f"{rows:>7} x {dim:<5} {name:<24} {result['memory_mb']:>9.2f} MB "
+              f"{result['query_ms_p50']:>9.3f} ms p50  recall@{TOP_K} {result[f'recall@{TOP_K}']:.3f}")
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[2000, 20000])
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for rows in args.rows:
+        results.extend(run(rows, args.dim, args.queries))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
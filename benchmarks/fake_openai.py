@@ -0,0 +1,252 @@
+"""Local stand-in for the OpenAI API, for offline benchmarks.
+
+Usage: python benchmarks/fake_openai.py [--port 8765] [--latency 0.2] [--error-rate 0.01] [--rate-limit-rate 0.05]
+
+Serves /v1/audio/transcriptions (verbose_json with segments), /v1/embeddings
+(deterministic vectors, float or base64) and /v1/chat/completions (plain or
+streamed) on a background thread. Each endpoint has its own latency, error
+rate and 429 rate, so retry and backoff paths can be exercised without a
+network or an API key. Point a client at it with ``OPENAI_BASE_URL=<url>``.
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Bytes of upload per second of audio: 128 kbps MP3, or 8 kHz 16-bit mono WAV
+AUDIO_BYTES_PER_SECOND = 16000
+SEGMENT_SECONDS = 5.0
+WORDS = ("lecture", "model", "data", "students", "example", "gradient", "network", "result",
+         "question", "theory", "memory", "signal", "vector", "history", "method", "answer")
+
+
+@dataclass
+class Behavior:
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after: float = 1.0
+
+
+@dataclass
+class EndpointStats:
+    requests: int = 0
+    errors: int = 0
+    rate_limited: int = 0
+
+
+@dataclass
+class FakeOpenAI:
+    """Threaded fake server; use as a context manager or call start()/stop()"""
+    port: int = 0
+    embedding_dim: int = 256
+    seed: int = 0
+    transcriptions: Behavior = field(default_factory=Behavior)
+    embeddings: Behavior = field(default_factory=Behavior)
+    chat: Behavior = field(default_factory=Behavior)
+
+    def __post_init__(self):
+        self.stats: Dict[str, EndpointStats] = {name: EndpointStats()
+                                                for name in ("transcriptions", "embeddings", "chat")}
+        self._random = random.Random(self.seed)
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def start(self) -> "FakeOpenAI":
+        fake = self
+
+        class Handler(_Handler):
+            server_state = fake
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def __enter__(self) -> "FakeOpenAI":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def outcome(self, endpoint: str) -> Optional[int]:
+        """Sleep for the endpoint's latency, then pick 429, 500 or None (success)"""
+        behavior: Behavior = getattr(self, endpoint)
+        with self._lock:
+            roll = self._random.random()
+            delay = behavior.latency + self._random.uniform(0, behavior.jitter)
+            stats = self.stats[endpoint]
+            stats.requests += 1
+            if roll < behavior.rate_limit_rate:
+                stats.rate_limited += 1
+                status = 429
+            elif roll < behavior.rate_limit_rate + behavior.error_rate:
+                stats.errors += 1
+                status = 500
+            else:
+                status = None
+        time.sleep(delay)
+        return status
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {name: vars(stats).copy() for name, stats in self.stats.items()}
+
+
+def fake_embedding(text: str, dim: int) -> np.ndarray:
+    """Unit vector seeded by the text, so repeated inputs embed identically"""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).normal(size=dim).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def fake_segments(duration: float, seed: int) -> List[dict]:
+    rng = random.Random(seed)
+    segments = []
+    start = 0.0
+    while start < duration:
+        end = min(duration, start + SEGMENT_SECONDS)
+        text = " ".join(rng.choice(WORDS) for _ in range(12)) + "."
+        segments.append({"id": len(segments), "seek": 0, "start": round(start, 2), "end": round(end, 2),
+                         "text": " " + text, "tokens": [], "temperature": 0.0, "avg_logprob": -0.2,
+                         "compression_ratio": 1.2, "no_speech_prob": 0.01})
+        start = end
+    return segments
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_state: FakeOpenAI
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _fail(self, status: int, endpoint: str) -> None:
+        behavior: Behavior = getattr(self.server_state, endpoint)
+        headers = {"Retry-After": str(behavior.retry_after)} if status == 429 else None
+        kind = "rate_limit_exceeded" if status == 429 else "server_error"
+        self._send_json(status, {"error": {"message": f"fake {kind}", "type": kind, "code": kind}}, headers)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        routes = {
+            "/v1/audio/transcriptions": ("transcriptions", self._transcription),
+            "/v1/embeddings": ("embeddings", self._embeddings),
+            "/v1/chat/completions": ("chat", self._chat),
+        }
+        path = self.path.split("?", 1)[0]
+        if path not in routes:
+            self._send_json(404, {"error": {"message": f"unknown path {path}"}})
+            return
+        endpoint, handle = routes[path]
+        status = self.server_state.outcome(endpoint)
+        if status is not None:
+            self._fail(status, endpoint)
+            return
+        handle(body)
+
+    def _transcription(self, body: bytes) -> None:
+        # Multipart upload; the audio length is estimated from its size
+        duration = max(1.0, len(body) / AUDIO_BYTES_PER_SECOND)
+        seed = int.from_bytes(hashlib.sha256(body[-4096:]).digest()[:4], "little")
+        segments = fake_segments(duration, seed)
+        self._send_json(200, {"task": "transcribe", "language": "english", "duration": duration,
+                              "text": "".join(s["text"] for s in segments).strip(), "segments": segments})
+
+    def _embeddings(self, body: bytes) -> None:
+        request = json.loads(body)
+        inputs = request["input"] if isinstance(request["input"], list) else [request["input"]]
+        dim = request.get("dimensions") or self.server_state.embedding_dim
+        data = []
+        for i, text in enumerate(inputs):
+            vector = fake_embedding(text if isinstance(text, str) else json.dumps(text), dim)
+            if request.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vector.tobytes()).decode("ascii")
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        tokens = sum(len(str(text).split()) for text in inputs)
+        self._send_json(200, {"object": "list", "model": request.get("model"), "data": data,
+                              "usage": {"prompt_tokens": tokens, "total_tokens": tokens}})
+
+    def _chat(self, body: bytes) -> None:
+        request = json.loads(body)
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in request.get("messages", []))
+        content = "This is a benchmark reply from the local stand-in server."
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(content.split()),
+                 "total_tokens": prompt_tokens + len(content.split())}
+        base = {"id": "chatcmpl-fake", "created": int(time.time()), "model": request.get("model")}
+        if not request.get("stream"):
+            choices = [{"index": i, "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop"} for i in range(request.get("n") or 1)]
+            self._send_json(200, {**base, "object": "chat.completion", "choices": choices, "usage": usage})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        events = [{"choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}
+                  for word in content.split()]
+        events.append({"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if (request.get("stream_options") or {}).get("include_usage"):
+            events.append({"choices": [], "usage": usage})
+        for event in events:
+            chunk = {**base, "object": "chat.completion.chunk", **event}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency, up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction answered with 429")
+    parser.add_argument("--embedding-dim", type=int, default=256)
+    args = parser.parse_args()
+
+    behavior = Behavior(args.latency, args.jitter, args.error_rate, args.rate_limit_rate)
+    fake = FakeOpenAI(port=args.port, embedding_dim=args.embedding_dim, transcriptions=behavior,
+                      embeddings=behavior, chat=behavior).start()
+    print(f"Serving a fake OpenAI API at {fake.base_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(json.dumps(fake.summary(), indent=2))
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Measure cold-start import time of polish_bot's startup path against the full RAG stack.
+
+Usage: python benchmarks/import_time.py [--repeat 5] [--top 10] [--json out.json]
+
+Each scenario runs in a fresh interpreter under ``python -X importtime``.
+"startup" is what polish_bot.py now imports before any tab runs; "rag_stack"
+is what it imported at module top before the RAG imports became lazy and is
+still paid the first time the RAG tab opens.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    "startup": "import streamlit, pyperclip, clients",
+    "rag_stack": (
+        "import streamlit, pyperclip, openai, llama_index.core, llama_index.embeddings.openai; "
+        "import rag_processor, jobs, query_expansion, answer_cache, embedding_cache"
+    ),
+}
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """(module, self_us, cumulative_us) for top-level imports in ``-X importtime`` output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # Nested imports are indented below the module that triggered them
+        if name.startswith(" ") and not name[1:].startswith(" "):
+            rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def run_once(code: str, env: Dict[str, str]) -> Tuple[float, List[Tuple[str, int, int]]]:
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, env=env,
+                          capture_output=True, text=True, check=True)
+    return time.perf_counter() - started, parse_importtime(proc.stderr)
+
+
+def measure(name: str, code: str, repeat: int, top: int, env: Dict[str, str]) -> dict:
+    walls, imports, heaviest = [], [], {}
+    for _ in range(repeat):
+        wall, rows = run_once(code, env)
+        walls.append(wall)
+        imports.append(sum(cumulative for _, _, cumulative in rows))
+        for module, _, cumulative in rows:
+            heaviest.setdefault(module, []).append(cumulative)
+    ranked = sorted(heaviest.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+    return {
+        "scenario": name,
+        "wall_ms_p50": round(statistics.median(walls) * 1000, 1),
+        "import_ms_p50": round(statistics.median(imports) / 1000, 1),
+        "heaviest": [(module, round(statistics.median(times) / 1000, 1)) for module, times in ranked[:top]],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # Importing rag_processor needs a key and creates its cache directories
+        env = dict(os.environ, OPENAI_API_KEY=os.environ.get("OPENAI_API_KEY", "sk-benchmark"),
+                   RAG_CACHE_DIR=cache_dir)
+        results = [measure(name, code, args.repeat, args.top, env) for name, code in SCENARIOS.items()]
+
+    for result in results:
+        print(f"{result['scenario']:<10} wall {result['wall_ms_p50']:>8.1f} ms   "
+              f"imports {result['import_ms_p50']:>8.1f} ms")
+        for module, ms in result["heaviest"]:
+            print(f"    {module:<40} {ms:>8.1f} ms")
+    startup, rag = results[0], results[1]
+    print(f"startup saves {rag['wall_ms_p50'] - startup['wall_ms_p50']:.1f} ms "
+          f"({1 - startup['wall_ms_p50'] / rag['wall_ms_p50']:.0%}) per cold start")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Time the video-to-RAG stages offline against the local fake OpenAI server.
+
+Usage: python benchmarks/run_benchmarks.py [--minutes 5 30] [--latency 0.3] [--error-rate 0.02]
+       [--rate-limit-rate 0.05] [--queries 20] [--json out.json] [--compare baseline.json]
+
+For each length, synthetic speech-like audio (tone bursts between silences)
+is written as a WAV file and pushed through split_audio_with_overlap,
+transcribe_chunk fan-out, combine_transcripts, build_rag_pipeline and
+retrieval. Every OpenAI call goes to benchmarks/fake_openai.py, and the
+caches live in a throwaway directory, so each run starts cold. Splitting
+needs ffmpeg; without it the WAV is sliced in Python and the split stage is
+reported as skipped. Use --compare to diff against an earlier --json run.
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_openai import Behavior, FakeOpenAI  # noqa: E402
+
+SAMPLE_RATE = 8000
+QUESTIONS = ("What is the main topic?", "How does the gradient method work?",
+             "Which example did the lecture use?", "What was the result?", "Summarize the theory")
+
+
+def synthesize_audio(path: str, seconds: float, seed: int = 0) -> None:
+    """Mono 16-bit WAV of 1-8 s tone bursts separated by 0.3-3 s of silence"""
+    rng = np.random.default_rng(seed)
+    total = int(seconds * SAMPLE_RATE)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        written = 0
+        while written < total:
+            burst = min(total - written, int(rng.uniform(1, 8) * SAMPLE_RATE))
+            t = np.arange(burst) / SAMPLE_RATE
+            pitch = rng.uniform(120, 300)
+            tone = np.sin(2 * math.pi * pitch * t) * (0.5 + 0.5 * np.sin(2 * math.pi * 3 * t))
+            f.writeframes((tone * 12000).astype(np.int16).tobytes())
+            written += burst
+            gap = min(total - written, int(rng.uniform(0.3, 3) * SAMPLE_RATE))
+            f.writeframes(np.zeros(gap, dtype=np.int16).tobytes())
+            written += gap
+
+
+def slice_wav(path: str, output_dir: str) -> list:
+    """ffmpeg-free stand-in for splitting: cut the WAV along the same chunk plan"""
+    from audio_processing import ChunkInfo, plan_chunks
+    with wave.open(path, "rb") as f:
+        frames = f.readframes(f.getnframes())
+    chunks = []
+    for i, (start, length) in enumerate(plan_chunks(len(frames) / 2 / SAMPLE_RATE)):
+        chunk = ChunkInfo(index=i, path=os.path.join(output_dir, f"chunk_{i:03d}.wav"), start=start, duration=length)
+        with wave.open(chunk.path, "wb") as out:
+            out.setnchannels(1)
+            out.setsampwidth(2)
+            out.setframerate(SAMPLE_RATE)
+            begin = int(start * SAMPLE_RATE) * 2
+            out.writeframes(frames[begin:begin + int(length * SAMPLE_RATE) * 2])
+        chunk.size = os.path.getsize(chunk.path)
+        chunks.append(chunk)
+    return chunks
+
+
+def run(minutes: float, work_dir: str, queries: int) -> dict:
+    import rag_processor
+    from transcription_scheduler import WHISPER_MAX_CONCURRENCY, whisper_scheduler
+
+    seconds = minutes * 60
+    audio = os.path.join(work_dir, f"audio_{minutes:g}m.wav")
+    synthesize_audio(audio, seconds)
+    stages = {}
+
+    chunk_dir = os.path.join(work_dir, f"chunks_{minutes:g}m")
+    os.makedirs(chunk_dir, exist_ok=True)
+    if shutil.which("ffmpeg") and shutil.which("ffprobe"):
+        started = time.perf_counter()
+        paths = rag_processor.split_audio_with_overlap(audio, chunk_dir)
+        stages["split"] = {"seconds": time.perf_counter() - started, "chunks": len(paths)}
+        chunks = rag_processor.split_audio_chunks(audio, chunk_dir)
+    else:
+        stages["split"] = {"skipped": "ffmpeg not found"}
+        chunks = slice_wav(audio, chunk_dir)
+
+    whisper_scheduler.metrics.clear()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=WHISPER_MAX_CONCURRENCY) as executor:
+        chunk_segments = list(executor.map(rag_processor.transcribe_chunk_segments, chunks))
+    elapsed = time.perf_counter() - started
+    stages["transcribe"] = {"seconds": elapsed, "chunks": len(chunks),
+                            "audio_seconds_per_second": seconds / elapsed,
+                            "scheduler": whisper_scheduler.summary()}
+
+    started = time.perf_counter()
+    segments = rag_processor.combine_transcripts(chunks, chunk_segments)
+    text = rag_processor.segments_to_text(segments)
+    stages["combine"] = {"seconds": time.perf_counter() - started, "segments": len(segments)}
+
+    started = time.perf_counter()
+    pipeline = rag_processor.build_rag_pipeline(text, persist=False)
+    elapsed = time.perf_counter() - started
+    nodes = len(pipeline["index"].docstore.docs)
+    stages["build_rag_pipeline"] = {"seconds": elapsed, "nodes": nodes, "nodes_per_second": nodes / elapsed}
+
+    for name, retriever in pipeline["retrievers"].items():
+        latencies = []
+        for i in range(queries):
+            started = time.perf_counter()
+            retriever.retrieve(QUESTIONS[i % len(QUESTIONS)] + f" ({i})")
+            latencies.append(time.perf_counter() - started)
+        stages[f"retrieve_{name}"] = {
+            "seconds": sum(latencies),
+            "ms_p50": statistics.median(latencies) * 1000,
+            "ms_p95": (statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]) * 1000,
+            "queries_per_second": len(latencies) / sum(latencies),
+        }
+    return {"minutes": minutes, "stages": _rounded(stages)}
+
+
+def _rounded(value):
+    if isinstance(value, float):
+        return round(value, 4)
+    if isinstance(value, dict):
+        return {key: _rounded(item) for key, item in value.items()}
+    return value
+
+
+def compare(results: list, baseline_path: str) -> None:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {run["minutes"]: run["stages"] for run in json.load(f)["runs"]}
+    print(f"\nAgainst {baseline_path}:")
+    for run in results:
+        old_stages = baseline.get(run["minutes"], {})
+        for stage, new in run["stages"].items():
+            old = old_stages.get(stage, {})
+            if "seconds" in new and old.get("seconds"):
+                change = new["seconds"] / old["seconds"] - 1
+                print(f"{run['minutes']:>6g} min  {stage:<22} {old['seconds']:>9.3f}s -> "
+                      f"{new['seconds']:>9.3f}s  {change:+.0%}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=float, nargs="+", default=[5, 30])
+    parser.add_argument("--latency", type=float, default=0.2, help="fake server latency per request")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--rpm", type=float, default=6000, help="Whisper requests per minute allowed by the scheduler")
+    parser.add_argument("--queries", type=int, default=20, help="retrieval queries per retriever")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="earlier --json output to compare against")
+    args = parser.parse_args()
+
+    behavior = Behavior(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                        rate_limit_rate=args.rate_limit_rate, retry_after=0.5)
+    with FakeOpenAI(transcriptions=behavior, embeddings=behavior, chat=behavior) as fake, \
+            tempfile.TemporaryDirectory() as work_dir:
+        # Settings are read at import, so the repo modules are imported after this
+        os.environ.update(OPENAI_API_KEY="sk-benchmark", OPENAI_BASE_URL=fake.base_url,
+                          RAG_CACHE_DIR=os.path.join(work_dir, "cache"),
+                          WHISPER_REQUESTS_PER_MINUTE=str(args.rpm))
+        import rag_processor  # noqa: F401
+        logging.getLogger().setLevel(logging.WARNING)
+        logging.getLogger("bm25s").setLevel(logging.WARNING)
+
+        results = []
+        for minutes in args.minutes:
+            result = run(minutes, work_dir, args.queries)
+            results.append(result)
+            for stage, timing in result["stages"].items():
+                detail = ", ".join(f"{key}={value}" for key, value in timing.items()
+                                   if key != "seconds" and not isinstance(value, dict))
+                elapsed = f"{timing['seconds']:>9.3f}s" if "seconds" in timing else f"{'-':>10}"
+                print(f"{minutes:>6g} min  {stage:<22} {elapsed}  {detail}")
+        server = fake.summary()
+
+    print(f"fake server: {server}")
+    if args.compare:
+        compare(results, args.compare)
+    if args.json:
+        config = {key: value for key, value in vars(args).items() if key not in ("json", "compare")}
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "server": server, "runs": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
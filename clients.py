@@ -0,0 +1,63 @@
+import threading
+from typing import TYPE_CHECKING, Dict, Optional
+
+if TYPE_CHECKING:
+    from llama_index.core.base.embeddings.base import BaseEmbedding
+
+    from llm_gateway import LLMGateway
+
+EMBED_MODEL = "text-embedding-3-large"
+# Matches embedding_cache.MAX_BATCH_INPUTS, so a cache batch is one request
+EMBED_BATCH_SIZE = 2048
+
+# Clients are built on first use and shared by the whole process, so importing
+# this module stays cheap and Streamlit reruns reuse the same connection pools
+_gateway: Optional["LLMGateway"] = None
+_embed_models: Dict[tuple, "BaseEmbedding"] = {}
+_lock = threading.Lock()
+
+
+def get_gateway() -> "LLMGateway":
+    global _gateway
+    with _lock:
+        if _gateway is None:
+            from llm_gateway import LLMGateway
+            from prompt_cache import PromptCache
+            _gateway = LLMGateway(prompt_cache=PromptCache())
+        return _gateway
+
+
+def gateway_started() -> bool:
+    return _gateway is not None
+
+
+def get_embed_model(model: Optional[str] = None, backend: Optional[str] = None) -> "BaseEmbedding":
+    """Shared embedding model for ``backend`` (default ``EMBED_BACKEND``: "openai" or "local").
+
+    Ingestion and querying both go through here, so an index is always
+    queried with the model that built it.
+    """
+    from embedding_backends import EMBED_BACKEND, EMBED_BACKENDS, LOCAL_EMBED_MODEL
+
+    backend = backend or EMBED_BACKEND
+    if backend not in EMBED_BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {backend} (choose from {', '.join(EMBED_BACKENDS)})")
+    if backend == "local":
+        key = (backend, model or LOCAL_EMBED_MODEL)
+        with _lock:
+            if key not in _embed_models:
+                from embedding_backends import LocalEmbedding
+                _embed_models[key] = LocalEmbedding(model_name=key[1])
+            return _embed_models[key]
+
+    key = (backend, model or EMBED_MODEL)
+    gateway = get_gateway()
+    with _lock:
+        if key not in _embed_models:
+            from llama_index.embeddings.openai import OpenAIEmbedding
+            _embed_models[key] = OpenAIEmbedding(
+                model=key[1], embed_batch_size=EMBED_BATCH_SIZE, api_key=gateway.api_key,
+                api_base=gateway.base_url, max_retries=gateway.max_retries,
+                http_client=gateway.http_client
+            )
+        return _embed_models[key]
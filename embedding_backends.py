@@ -0,0 +1,87 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+logger = logging.getLogger(__name__)
+
+EMBED_BACKENDS = ("openai", "local")
+EMBED_BACKEND = os.environ.get("EMBED_BACKEND", "openai")
+LOCAL_EMBED_MODEL = os.environ.get("LOCAL_EMBED_MODEL", "BAAI/bge-small-en-v1.5")
+LOCAL_EMBED_BATCH_SIZE = int(os.environ.get("LOCAL_EMBED_BATCH_SIZE", 64))
+LOCAL_EMBED_THREADS = int(os.environ.get("LOCAL_EMBED_THREADS", 0)) or os.cpu_count() or 1
+LOCAL_EMBED_WORKERS = int(os.environ.get("LOCAL_EMBED_WORKERS", 2))
+
+
+class LocalEmbedding(BaseEmbedding):
+    """Sentence-transformers model on the CPU, with no network round-trip.
+
+    Texts are encoded in batches of ``batch_size`` spread over ``workers``
+    threads (the model releases the GIL while encoding); ``threads`` caps the
+    CPU threads the model uses in total. Queries and documents are embedded
+    the same way, so the embedding cache serves both. The model is loaded on
+    first use.
+    """
+
+    batch_size: int = LOCAL_EMBED_BATCH_SIZE
+    threads: int = LOCAL_EMBED_THREADS
+    workers: int = LOCAL_EMBED_WORKERS
+
+    _model: Any = PrivateAttr(default=None)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    def __init__(self, model_name: str = LOCAL_EMBED_MODEL, **kwargs):
+        # One call from embed_texts covers a whole cache batch; batching happens here
+        kwargs.setdefault("embed_batch_size", 2048)
+        super().__init__(model_name=model_name, **kwargs)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "LocalEmbedding"
+
+    @staticmethod
+    def available() -> bool:
+        try:
+            import sentence_transformers  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def _load(self):
+        with self._lock:
+            if self._model is None:
+                try:
+                    import torch
+                    from sentence_transformers import SentenceTransformer
+                except ImportError as e:
+                    raise RuntimeError("The local embedding backend needs sentence-transformers "
+                                       "(pip install sentence-transformers)") from e
+                torch.set_num_threads(self.threads)
+                logger.info(f"Loading local embedding model {self.model_name} ({self.threads} threads)")
+                self._model = SentenceTransformer(self.model_name, device="cpu")
+            return self._model
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        return self._load().encode(texts, batch_size=self.batch_size, normalize_embeddings=True,
+                                   convert_to_numpy=True, show_progress_bar=False).tolist()
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) <= 1 or self.workers <= 1:
+            return self._encode(texts)
+        self._load()
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(batches))) as executor:
+            return [vector for batch in executor.map(self._encode, batches) for vector in batch]
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._encode([text])[0]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._encode([query])[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
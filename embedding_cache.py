@@ -0,0 +1,200 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.schema import BaseNode, MetadataMode, TransformComponent
+
+from tracing import current_span, tracer
+from transcript_cache import CACHE_ROOT
+
+logger = logging.getLogger(__name__)
+
+# OpenAI embeddings endpoint limits per request
+MAX_BATCH_INPUTS = 2048
+MAX_BATCH_TOKENS = 300_000
+# Embedding requests in flight per process, across every caller; ingest.py lowers it in
+# each worker to share a global cap
+MAX_CONCURRENT_BATCHES = 4
+_request_slots = threading.BoundedSemaphore(MAX_CONCURRENT_BATCHES)
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with tiktoken when its encoding is available, else estimate"""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            # tiktoken missing, or its encoding file cannot be downloaded
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return max(1, len(text) // 4)
+
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def model_key(embed_model: BaseEmbedding) -> str:
+    key = f"{type(embed_model).__name__}:{embed_model.model_name}"
+    dimensions = getattr(embed_model, "dimensions", None)
+    return f"{key}:{dimensions}" if dimensions else key
+
+
+class EmbeddingCache:
+    """SQLite store of embeddings keyed by (model, normalized text hash)"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(CACHE_ROOT, "embeddings.sqlite")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+        self.tokens_embedded = 0
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL,"
+                " PRIMARY KEY (model, text_hash))"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get_many(self, model: str, hashes: Sequence[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self._connect() as conn:
+            # Stay under SQLite's default host-parameter limit
+            for i in range(0, len(hashes), 500):
+                batch = list(hashes[i:i + 500])
+                rows = conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? "
+                    f"AND text_hash IN ({','.join('?' * len(batch))})",
+                    [model, *batch]
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = array("f", blob).tolist()
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, List[float]]) -> None:
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                [(model, h, array("f", v).tobytes()) for h, v in vectors.items()]
+            )
+
+    def record(self, hits: int, misses: int, tokens_saved: int, tokens_embedded: int) -> None:
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+            self.tokens_saved += tokens_saved
+            self.tokens_embedded += tokens_embedded
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "tokens_saved": self.tokens_saved,
+            "tokens_embedded": self.tokens_embedded,
+        }
+
+
+embedding_cache = EmbeddingCache()
+
+
+def configure(max_concurrency: int) -> None:
+    """Replace the cap on embedding requests in flight; call before any request is made"""
+    global MAX_CONCURRENT_BATCHES, _request_slots
+    MAX_CONCURRENT_BATCHES = max_concurrency
+    _request_slots = threading.BoundedSemaphore(max_concurrency)
+
+
+def _batches(items: List[tuple]) -> List[List[tuple]]:
+    """Group (hash, text, tokens) items under the per-request input and token limits"""
+    batches, current, tokens = [], [], 0
+    for item in items:
+        if current and (len(current) >= MAX_BATCH_INPUTS or tokens + item[2] > MAX_BATCH_TOKENS):
+            batches.append(current)
+            current, tokens = [], 0
+        current.append(item)
+        tokens += item[2]
+    if current:
+        batches.append(current)
+    return batches
+
+
+@tracer.traced("embed")
+def embed_texts(embed_model: BaseEmbedding, texts: List[str],
+                cache: EmbeddingCache = embedding_cache) -> List[List[float]]:
+    """Embed texts, requesting only cache misses, each distinct text once.
+
+    The embed model should have ``embed_batch_size`` >= MAX_BATCH_INPUTS so
+    each batch built here goes out as a single request. At most
+    MAX_CONCURRENT_BATCHES requests run at once, counting every concurrent
+    caller in the process.
+    """
+    model = model_key(embed_model)
+    hashes = [text_hash(t) for t in texts]
+    vectors = cache.get_many(model, list(set(hashes)))
+
+    missing = {}
+    for h, t in zip(hashes, texts):
+        if h not in vectors and h not in missing:
+            missing[h] = (h, t, count_tokens(t))
+
+    def embed_batch(batch: List[tuple]) -> Dict[str, List[float]]:
+        with _request_slots:
+            embeddings = embed_model.get_text_embedding_batch([t for _, t, _ in batch])
+        result = {h: e for (h, _, _), e in zip(batch, embeddings)}
+        cache.put_many(model, result)
+        return result
+
+    batches = _batches(list(missing.values()))
+    if batches:
+        with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_BATCHES, len(batches))) as executor:
+            for result in executor.map(embed_batch, batches):
+                vectors.update(result)
+
+    embedded_tokens = sum(tokens for _, _, tokens in missing.values())
+    current_span().set(texts=len(texts), misses=len(missing), batches=len(batches),
+                       embedding_tokens=embedded_tokens)
+    cache.record(
+        hits=len(texts) - len(missing),
+        misses=len(missing),
+        tokens_saved=sum(count_tokens(t) for t in texts) - embedded_tokens,
+        tokens_embedded=embedded_tokens
+    )
+    logger.info(f"Embedded {len(missing)} of {len(texts)} texts in {len(batches)} batches; "
+                f"cache stats: {cache.stats()}")
+    return [vectors[h] for h in hashes]
+
+
+class CachedEmbedding(TransformComponent):
+    """Ingestion step that embeds nodes through the persistent embedding cache"""
+
+    embed_model: BaseEmbedding
+
+    def __call__(self, nodes: Sequence[BaseNode], **kwargs) -> Sequence[BaseNode]:
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+        for node, vector in zip(nodes, embed_texts(self.embed_model, texts)):
+            node.embedding = vector
+        return nodes
@@ -0,0 +1,178 @@
+"""Transcribe and index many videos from the command line.
+
+Usage: python ingest.py [SOURCE ...] [--list urls.txt] [--workers 4] [--max-api-calls 8]
+       [--backend openai|local] [--preprocess] [--force] [--json report.json]
+
+A source is a URL, a local audio/video file, or a directory (searched
+recursively for media files); ``--list`` reads one source per line, skipping
+blank lines and ``#`` comments. Sources run in parallel worker processes and
+are written to the same transcript cache, index store and library as the app.
+Whisper requests from all workers together stay under ``--max-api-calls``
+concurrent calls and ``--rpm`` requests per minute, and embedding requests
+under ``--max-api-calls`` concurrent calls; ingestion makes no chat calls. Sources that are already
+transcribed, indexed and in the library are skipped unless ``--force``.
+Equivalent to ``python rag_processor.py ...``.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import as_completed
+from dataclasses import asdict, dataclass
+from typing import Iterable, List, Optional
+
+from jobs import JOB_WORKERS, process_pool
+from transcription_backends import BACKENDS, TRANSCRIPTION_BACKEND
+from transcription_scheduler import WHISPER_MAX_CONCURRENCY, WHISPER_REQUESTS_PER_MINUTE
+
+logger = logging.getLogger(__name__)
+
+MEDIA_EXTS = {".mp3", ".m4a", ".aac", ".wav", ".flac", ".ogg", ".opus", ".webm",
+              ".mp4", ".mkv", ".mov", ".avi"}
+
+
+@dataclass
+class IngestResult:
+    source: str
+    status: str
+    seconds: float = 0.0
+    video_id: Optional[str] = None
+    title: Optional[str] = None
+    duration: Optional[float] = None
+    error: Optional[str] = None
+
+
+def is_url(source: str) -> bool:
+    return "://" in source
+
+
+def expand_sources(sources: Iterable[str], lists: Iterable[str] = ()) -> List[str]:
+    """URLs and media files from arguments, directories and list files, without duplicates"""
+    items = list(sources)
+    for list_path in lists:
+        with open(list_path, encoding="utf-8") as f:
+            items.extend(line.strip() for line in f if line.strip() and not line.lstrip().startswith("#"))
+    expanded = []
+    for item in items:
+        if is_url(item):
+            expanded.append(item)
+        elif os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                expanded.extend(os.path.abspath(os.path.join(root, name)) for name in sorted(files)
+                                if os.path.splitext(name)[1].lower() in MEDIA_EXTS)
+        elif os.path.isfile(item):
+            expanded.append(os.path.abspath(item))
+        else:
+            logger.warning(f"Skipping {item}: not a URL, file or directory")
+    return list(dict.fromkeys(expanded))
+
+
+def _init_worker(max_concurrency: int, requests_per_minute: float) -> None:
+    import embedding_cache
+    from transcription_scheduler import whisper_scheduler
+
+    # Both caps are per process, so each worker gets its share of the budget
+    whisper_scheduler.configure(max_concurrency, requests_per_minute)
+    embedding_cache.configure(max_concurrency)
+    logging.basicConfig(level=logging.WARNING)
+
+
+def _ingest(source: str, preprocess: bool, force: bool, backend: str) -> IngestResult:
+    """``process_pool`` entry point for one source"""
+    started = time.perf_counter()
+    try:
+        from rag_processor import process_video, processed_entry
+
+        entry = None if force else processed_entry(source)
+        if entry:
+            return IngestResult(source, "skipped", time.perf_counter() - started, entry.get("video_id"),
+                                entry.get("title"), entry.get("duration"))
+        result = process_video(source, preprocess=preprocess, backend=backend)
+    except Exception as e:
+        return IngestResult(source, "failed", time.perf_counter() - started, error=f"{type(e).__name__}: {e}")
+    return IngestResult(source, "done", time.perf_counter() - started, result["video_id"],
+                        result["title"], result["duration"])
+
+
+def ingest(sources: List[str], workers: int = JOB_WORKERS, max_api_calls: int = WHISPER_MAX_CONCURRENCY,
+           requests_per_minute: float = WHISPER_REQUESTS_PER_MINUTE, preprocess: bool = False,
+           force: bool = False, backend: str = TRANSCRIPTION_BACKEND) -> Iterable[IngestResult]:
+    """Process sources across ``workers`` processes, yielding results as they finish.
+
+    The Whisper concurrency and request-rate budgets are split evenly over
+    the workers, so together they never exceed ``max_api_calls`` and
+    ``requests_per_minute``; there are never more workers than API slots.
+    Concurrent embedding requests are split the same way. The local
+    backend makes no Whisper requests, so only ``workers`` applies.
+    """
+    if backend != "local":
+        workers = min(workers, max_api_calls)
+    workers = max(1, min(workers, len(sources)))
+    with process_pool(workers, _init_worker,
+                      (max(1, max_api_calls // workers), requests_per_minute / workers)) as executor:
+        futures = [executor.submit(_ingest, source, preprocess, force, backend) for source in sources]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def summarize(results: List[IngestResult], elapsed: float) -> dict:
+    done = [r for r in results if r.status == "done"]
+    audio_seconds = sum(r.duration or 0 for r in done)
+    return {
+        "sources": len(results),
+        "done": len(done),
+        "skipped": sum(r.status == "skipped" for r in results),
+        "failed": sum(r.status == "failed" for r in results),
+        "wall_seconds": round(elapsed, 1),
+        "audio_hours": round(audio_seconds / 3600, 2),
+        "audio_seconds_per_second": round(audio_seconds / elapsed, 1) if elapsed else 0.0,
+        "videos_per_hour": round(len(done) * 3600 / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("sources", nargs="*", help="URLs, media files or directories")
+    parser.add_argument("--list", action="append", default=[], help="file with one source per line")
+    parser.add_argument("--workers", type=int, default=JOB_WORKERS, help="worker processes")
+    parser.add_argument("--max-api-calls", type=int, default=WHISPER_MAX_CONCURRENCY,
+                        help="concurrent Whisper requests, and concurrent embedding requests, "
+                             "across all workers")
+    parser.add_argument("--rpm", type=float, default=WHISPER_REQUESTS_PER_MINUTE,
+                        help="Whisper requests per minute across all workers")
+    parser.add_argument("--backend", choices=list(BACKENDS), default=TRANSCRIPTION_BACKEND,
+                        help="transcription backend (local runs Whisper on this machine's CPU)")
+    parser.add_argument("--preprocess", action="store_true", help="trim silence and downsample before upload")
+    parser.add_argument("--force", action="store_true", help="reprocess sources that are already indexed")
+    parser.add_argument("--json", help="write per-source results and the summary to this file")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    sources = expand_sources(args.sources, args.list)
+    if not sources:
+        parser.error("no URLs or media files to ingest")
+    print(f"Ingesting {len(sources)} sources")
+
+    results, started = [], time.perf_counter()
+    for result in ingest(sources, args.workers, args.max_api_calls, args.rpm, args.preprocess, args.force,
+                         args.backend):
+        results.append(result)
+        detail = result.error or result.title or result.video_id or ""
+        print(f"[{len(results)}/{len(sources)}] {result.status:<8} {result.seconds:>8.1f}s  "
+              f"{result.source}  {detail}", flush=True)
+    summary = summarize(results, time.perf_counter() - started)
+
+    print(f"{summary['done']} processed, {summary['skipped']} skipped, {summary['failed']} failed "
+          f"in {summary['wall_seconds']}s; {summary['audio_hours']} h of audio at "
+          f"{summary['audio_seconds_per_second']}x realtime, {summary['videos_per_hour']} videos/hour")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "results": [asdict(r) for r in results]}, f, indent=2)
+    if summary["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
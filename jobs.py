@@ -0,0 +1,337 @@
+import functools
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from transcript_cache import CACHE_ROOT
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.environ.get("RAG_JOB_WORKERS", 2))
+DUPLICATE_POLL_SECONDS = 1.0
+ACTIVE_STATUSES = ("queued", "running")
+STAGE_LABELS = {
+    "queued": "Waiting for a worker",
+    "duplicate": "Waiting for another job on this video",
+    "download": "Downloading audio",
+    "split": "Splitting audio",
+    "transcribe": "Transcribing",
+    "embed": "Embedding transcript",
+    "index": "Adding to library",
+    "done": "Done",
+}
+
+
+@dataclass
+class Job:
+    id: str
+    url: str
+    key: str
+    preprocess: bool
+    backend: Optional[str]
+    status: str
+    stage: str
+    done: int
+    total: int
+    error: Optional[str]
+    result: Optional[dict]
+    owner: Optional[int]
+    created: float
+    updated: float
+
+    @property
+    def fraction(self) -> float:
+        return self.done / self.total if self.total else 0.0
+
+    @property
+    def label(self) -> str:
+        label = STAGE_LABELS.get(self.stage, self.stage)
+        if self.stage in ("split", "transcribe") and self.total:
+            return f"{label} {self.done}/{self.total}"
+        if self.stage == "download" and self.total:
+            return f"{label} {self.done}%"
+        return label
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _update(path: str, job_id: str, **fields) -> None:
+    fields["updated"] = time.time()
+    with _connect(path) as conn:
+        conn.execute(
+            f"UPDATE jobs SET {', '.join(f'{name} = ?' for name in fields)} WHERE id = ?",
+            [*fields.values(), job_id]
+        )
+
+
+def process_pool(max_workers: int, initializer: Optional[Callable] = None,
+                 initargs: tuple = ()) -> ProcessPoolExecutor:
+    """Process pool for pipeline work, shared by background jobs and batch ingestion.
+
+    Workers are spawned rather than forked, since a fork would copy the
+    parent's threads and locks mid-use; their entry points import the
+    pipeline lazily so the parent stays light.
+    """
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=initializer, initargs=initargs)
+
+
+def _running_duplicate(path: str, job_id: str, key: str) -> Optional[sqlite3.Row]:
+    """An earlier job for the same video that a live worker is processing, if any"""
+    with _connect(path) as conn:
+        rows = conn.execute(
+            "SELECT other.id, other.owner FROM jobs AS other JOIN jobs AS this ON this.id = ? "
+            "WHERE other.key = ? AND other.preprocess = this.preprocess AND other.status = 'running' "
+            "AND (other.created < this.created OR (other.created = this.created AND other.id < this.id))",
+            (job_id, key)
+        ).fetchall()
+    return next((row for row in rows if _pid_alive(row["owner"])), None)
+
+
+def _wait_for_duplicate(path: str, job_id: str, key: str) -> None:
+    # Two URLs for one video only share a key once their workers resolve it, so both may
+    # have been queued; the later one waits and then finds the results cached
+    while _running_duplicate(path, job_id, key) is not None:
+        _update(path, job_id, stage="duplicate")
+        time.sleep(DUPLICATE_POLL_SECONDS)
+
+
+def _run_job(path: str, job_id: str, url: str, preprocess: bool, backend: Optional[str] = None) -> None:
+    """``process_pool`` entry point for one job"""
+    try:
+        # Before the import, so a worker that dies loading the pipeline fails this job instead of requeueing it
+        _update(path, job_id, status="running", stage="download", done=0, total=0, owner=os.getpid())
+        from rag_processor import process_video, resolve_video_id
+
+        # Resolved here rather than at submit time, since it is a network call
+        key = None if os.path.isfile(url) else resolve_video_id(url)
+        if key:
+            _update(path, job_id, key=key)
+            _wait_for_duplicate(path, job_id, key)
+
+        def progress(stage: str, done: int, total: int) -> None:
+            _update(path, job_id, stage=stage, done=done, total=total)
+
+        result = process_video(url, preprocess=preprocess, progress=progress, backend=backend)
+        _update(path, job_id, status="done", stage="done", done=1, total=1, result=json.dumps({
+            "video_id": result["video_id"], "title": result["title"]
+        }))
+    except Exception as e:
+        logger.error(f"Job {job_id} for {url} failed: {e}")
+        _update(path, job_id, status="failed", error=str(e))
+
+
+def _windows_pid_alive(pid: int) -> bool:
+    import ctypes
+    from ctypes import wintypes
+
+    process_query_limited_information, error_access_denied, still_active = 0x1000, 5, 259
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    handle = kernel32.OpenProcess(process_query_limited_information, False, pid)
+    if not handle:
+        # Exists but belongs to someone else
+        return ctypes.get_last_error() == error_access_denied
+    try:
+        exit_code = wintypes.DWORD()
+        if not kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code)):
+            return True
+        return exit_code.value == still_active
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    if os.name == "nt":
+        # os.kill(pid, 0) sends CTRL_C_EVENT on Windows instead of probing
+        return _windows_pid_alive(pid)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # Exists but belongs to someone else, or the platform cannot tell
+        return True
+    return True
+
+
+class JobQueue:
+    """Background video processing on a local process pool, tracked in SQLite.
+
+    Submitting a video that already has a queued or running job, or a
+    finished one whose transcript and index are still cached, returns that
+    job instead of starting another. Jobs left unfinished by a
+    server that exited are queued again when the next ``JobQueue`` starts;
+    a worker that crashes fails its own job and the pool is replaced.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_workers: int = JOB_WORKERS):
+        self.path = path or os.path.join(CACHE_ROOT, "jobs.sqlite")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.max_workers = max_workers
+        self._executor = self._new_executor()
+        self._lock = threading.RLock()
+        self._pools = {}
+        with _connect(self.path) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, url TEXT NOT NULL, key TEXT NOT NULL,"
+                " preprocess INTEGER NOT NULL, status TEXT NOT NULL, stage TEXT NOT NULL,"
+                " done INTEGER NOT NULL DEFAULT 0, total INTEGER NOT NULL DEFAULT 0,"
+                " error TEXT, result TEXT, owner INTEGER,"
+                " created REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, status)")
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "backend" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN backend TEXT")
+        self._resume()
+
+    def _active_rows(self) -> List[sqlite3.Row]:
+        with _connect(self.path) as conn:
+            return conn.execute(
+                f"SELECT * FROM jobs WHERE status IN ({','.join('?' * len(ACTIVE_STATUSES))})",
+                ACTIVE_STATUSES
+            ).fetchall()
+
+    def _resume(self) -> None:
+        for row in self._active_rows():
+            # Still owned by a live server or worker process
+            if row["owner"] != os.getpid() and _pid_alive(row["owner"]):
+                continue
+            logger.info(f"Resuming job {row['id']} for {row['url']}")
+            self._start(row["id"], row["url"], bool(row["preprocess"]), row["backend"])
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return process_pool(self.max_workers)
+
+    def _start(self, job_id: str, url: str, preprocess: bool, backend: Optional[str] = None) -> None:
+        _update(self.path, job_id, status="queued", stage="queued", done=0, total=0, owner=os.getpid())
+        with self._lock:
+            try:
+                future = self._executor.submit(_run_job, self.path, job_id, url, preprocess, backend)
+            except BrokenProcessPool:
+                self._replace_executor(self._executor)
+                future = self._executor.submit(_run_job, self.path, job_id, url, preprocess, backend)
+            self._pools[job_id] = self._executor
+        future.add_done_callback(functools.partial(self._finished, self._pools[job_id], job_id))
+
+    def _replace_executor(self, broken: ProcessPoolExecutor) -> None:
+        # A worker that dies (killed, out of memory) breaks the whole pool for good
+        with self._lock:
+            if broken is self._executor:
+                logger.error("A job worker exited unexpectedly; starting a new process pool")
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._new_executor()
+
+    def _finished(self, executor: ProcessPoolExecutor, job_id: str, future: Future) -> None:
+        """Fail a job whose worker died, or restart it if it never reached one"""
+        with self._lock:
+            # Otherwise already restarted on a newer pool
+            if self._pools.get(job_id) is not executor:
+                return
+            del self._pools[job_id]
+            if future.cancelled() or future.exception() is None:
+                return
+            error = future.exception()
+            job = self.get(job_id)
+            if job is None or job.status not in ACTIVE_STATUSES:
+                return
+            if isinstance(error, BrokenProcessPool):
+                self._replace_executor(executor)
+                if job.status == "queued":
+                    self._start(job.id, job.url, job.preprocess, job.backend)
+                    return
+                error = "Worker process exited unexpectedly"
+            logger.error(f"Job {job_id} for {job.url} failed: {error}")
+            _update(self.path, job_id, status="failed", error=str(error))
+
+    def submit(self, url: str, preprocess: bool = False, key: Optional[str] = None,
+               backend: Optional[str] = None) -> str:
+        """Queue a video and return its job id; ``key`` identifies duplicates (default: the URL,
+        which the worker replaces with the resolved video id). Another URL for a video whose
+        job has not resolved its key yet is queued too, and its worker waits for that job.
+
+        ``backend`` names the transcription backend; a job for the same video
+        with another backend is still treated as a duplicate, since either
+        transcript is cached under the same audio.
+        """
+        url = url.strip()
+        key = key or url
+        with self._lock:
+            with _connect(self.path) as conn:
+                # Workers replace a URL key with the resolved video id, so match either
+                row = conn.execute(
+                    "SELECT id, status FROM jobs WHERE (key = ? OR url = ?) AND preprocess = ? "
+                    "AND status IN (?, ?, ?) ORDER BY created DESC LIMIT 1",
+                    (key, url, int(preprocess), *ACTIVE_STATUSES, "done")
+                ).fetchone()
+                # A finished job only counts while its results are cached; otherwise the
+                # page would reprocess the video in the foreground
+                if row and (row["status"] != "done" or self._processed(url)):
+                    return row["id"]
+                job_id = uuid.uuid4().hex
+                now = time.time()
+                conn.execute(
+                    "INSERT INTO jobs (id, url, key, preprocess, backend, status, stage, created, updated)"
+                    " VALUES (?, ?, ?, ?, ?, 'queued', 'queued', ?, ?)",
+                    (job_id, url, key, int(preprocess), backend, now, now)
+                )
+            self._start(job_id, url, preprocess, backend)
+        return job_id
+
+    @staticmethod
+    def _processed(url: str) -> bool:
+        from rag_processor import processed_entry
+
+        return processed_entry(url) is not None
+
+    @staticmethod
+    def _job(row: sqlite3.Row) -> Job:
+        return Job(
+            id=row["id"], url=row["url"], key=row["key"], preprocess=bool(row["preprocess"]),
+            backend=row["backend"],
+            status=row["status"], stage=row["stage"], done=row["done"], total=row["total"],
+            error=row["error"], result=json.loads(row["result"]) if row["result"] else None,
+            owner=row["owner"], created=row["created"], updated=row["updated"]
+        )
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with _connect(self.path) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row else None
+
+    def jobs(self, limit: int = 20) -> List[Job]:
+        with _connect(self.path) as conn:
+            rows = conn.execute("SELECT * FROM jobs ORDER BY created DESC LIMIT ?", (limit,)).fetchall()
+        return [self._job(row) for row in rows]
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_job_queue: Optional[JobQueue] = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue()
+        return _job_queue
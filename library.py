@@ -0,0 +1,420 @@
+import bisect
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from llama_index.core import Document, QueryBundle
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore, TextNode
+
+from transcript_cache import CACHE_ROOT
+from vector_store import quantize, score, top_k
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+LIBRARY_ROOT = os.path.join(CACHE_ROOT, "library")
+NODE_METADATA_KEYS = ["video_id", "title", "start", "end"]
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have i in is it its of on or so that the "
+    "this to was we were what when where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in re.findall(r"\w+", text.lower()) if t not in STOPWORDS]
+
+
+@contextmanager
+def _file_lock(path: str):
+    """Exclusive lock shared by every process writing to the library"""
+    with open(path, "a+") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class IncrementalBM25:
+    """Okapi BM25 over append-only postings.
+
+    Adding a document only appends to the postings of its own terms; IDF and
+    average length are derived from running totals at query time, so nothing
+    is ever rebuilt when the corpus grows.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        self.doc_lengths: List[int] = []
+        self.total_length = 0
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._lengths = np.zeros(0, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, term_counts: Dict[str, int]) -> int:
+        doc = len(self.doc_lengths)
+        length = sum(term_counts.values())
+        for term, tf in term_counts.items():
+            docs, tfs = self.postings.setdefault(term, ([], []))
+            docs.append(doc)
+            tfs.append(tf)
+            self._arrays.pop(term, None)
+        self.doc_lengths.append(length)
+        self.total_length += length
+        return doc
+
+    def _posting_arrays(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        if term not in self._arrays:
+            docs, tfs = self.postings[term]
+            self._arrays[term] = (np.asarray(docs, dtype=np.int64), np.asarray(tfs, dtype=np.float32))
+        return self._arrays[term]
+
+    def idf(self, term: str) -> float:
+        n, df = len(self.doc_lengths), len(self.postings.get(term, ((), ()))[0])
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def _length_array(self) -> np.ndarray:
+        if self._lengths.shape[0] != len(self.doc_lengths):
+            self._lengths = np.asarray(self.doc_lengths, dtype=np.float32)
+        return self._lengths
+
+    def scores(self, query: str, ranges: Optional[Sequence[Tuple[int, int]]] = None) -> np.ndarray:
+        """Scores of the docs in ``ranges`` (default: all), concatenated in range order.
+
+        Postings are in doc order, so each range is a slice found by binary
+        search and docs outside the ranges are never scored.
+        """
+        n = len(self.doc_lengths)
+        ranges = [(0, n)] if ranges is None else [(a, min(b, n)) for a, b in ranges]
+        sizes = [max(0, b - a) for a, b in ranges]
+        out = np.zeros(sum(sizes), dtype=np.float32)
+        if not n or not out.shape[0]:
+            return out
+        lengths, average = self._length_array(), self.total_length / n
+        offsets = np.cumsum([0] + sizes[:-1])
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            docs, tfs = self._posting_arrays(term)
+            idf = self.idf(term)
+            for (a, b), offset in zip(ranges, offsets):
+                lo, hi = np.searchsorted(docs, (a, b))
+                if lo == hi:
+                    continue
+                d, tf = docs[lo:hi], tfs[lo:hi]
+                norm = self.k1 * (1 - self.b + self.b * lengths[d] / average)
+                out[offset + d - a] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return out
+
+
+def make_video_nodes(video_id: str, title: Optional[str], transcript: str, segments: List[dict],
+                     chunk_size: int, chunk_overlap: int) -> List[TextNode]:
+    """Split a transcript into nodes tagged with video and source timestamps"""
+    if segments:
+        # Rebuild the text from segments so character offsets map back to times
+        transcript = " ".join(segment["text"] for segment in segments)
+        starts, offset = [], 0
+        for segment in segments:
+            starts.append(offset)
+            offset += len(segment["text"]) + 1
+    splitter = SentenceSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    nodes = splitter.get_nodes_from_documents([Document(text=transcript, id_=video_id)])
+    for node in nodes:
+        start = end = None
+        if segments and node.start_char_idx is not None:
+            first = max(0, bisect.bisect_right(starts, node.start_char_idx) - 1)
+            last = max(0, bisect.bisect_right(starts, max(node.start_char_idx, node.end_char_idx - 1)) - 1)
+            start, end = segments[first]["start"], segments[last]["end"]
+        node.metadata.update(video_id=video_id, title=title or video_id, start=start, end=end)
+        node.excluded_embed_metadata_keys = list(NODE_METADATA_KEYS)
+        node.excluded_llm_metadata_keys = list(NODE_METADATA_KEYS)
+    return nodes
+
+
+class VideoLibrary:
+    """Persistent multi-video index with append-only vectors, nodes and BM25 stats.
+
+    Every file is append-only and a video only becomes visible once its line
+    is written to ``manifest.jsonl``, which records the end offset of each
+    file. Readers therefore never see a partial video, and a writer that
+    crashed midway is cleaned up by truncating to the last manifest entry.
+    Writers in other processes are picked up by ``refresh``.
+    """
+
+    def __init__(self, root: Optional[str] = None, dtype: str = "float16", dimensions: Optional[int] = None):
+        self.root = root or LIBRARY_ROOT
+        os.makedirs(self.root, exist_ok=True)
+        self.dtype = dtype
+        self.dimensions = dimensions
+        self.nodes: List[TextNode] = []
+        self.entries: List[dict] = []
+        self.bm25 = IncrementalBM25()
+        self.meta: Optional[dict] = None
+        self._video_rows: Dict[str, List[Tuple[int, int]]] = {}
+        self._vectors: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._manifest_offset = 0
+        self._lock = threading.RLock()
+        self.refresh()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def _committed(self) -> dict:
+        if self.entries:
+            return self.entries[-1]
+        return {"rows_end": 0, "nodes_end": 0, "bm25_end": 0}
+
+    def refresh(self) -> int:
+        """Load videos committed since the last refresh; returns how many rows were added"""
+        with self._lock:
+            if self.meta is None and os.path.exists(self._path("meta.json")):
+                with open(self._path("meta.json"), "r", encoding="utf-8") as f:
+                    self.meta = json.load(f)
+            if not os.path.exists(self._path("manifest.jsonl")):
+                return 0
+            with open(self._path("manifest.jsonl"), "rb") as f:
+                f.seek(self._manifest_offset)
+                data = f.read()
+            # Ignore a trailing line that is still being written
+            data = data[:data.rfind(b"\n") + 1]
+            if not data:
+                return 0
+            new_entries = [json.loads(line) for line in data.splitlines() if line.strip()]
+            before = self._committed()
+            after = new_entries[-1]
+
+            with open(self._path("nodes.jsonl"), "rb") as f:
+                f.seek(before["nodes_end"])
+                for line in f.read(after["nodes_end"] - before["nodes_end"]).splitlines():
+                    self.nodes.append(TextNode.from_json(line.decode("utf-8")))
+            with open(self._path("bm25.jsonl"), "rb") as f:
+                f.seek(before["bm25_end"])
+                for line in f.read(after["bm25_end"] - before["bm25_end"]).splitlines():
+                    self.bm25.add(json.loads(line))
+
+            rows, dim = after["rows_end"], self.meta["dim"]
+            self._vectors = np.memmap(self._path("vectors.bin"), dtype=self.meta["dtype"],
+                                      mode="r", shape=(rows, dim))
+            if self.meta["dtype"] == "int8":
+                self._scales = np.memmap(self._path("scales.bin"), dtype=np.float32, mode="r", shape=(rows,))
+            for entry in new_entries:
+                self._video_rows.setdefault(entry["video_id"], []).append(
+                    (entry["rows_end"] - entry["rows"], entry["rows_end"])
+                )
+            self.entries.extend(new_entries)
+            self._manifest_offset += len(data)
+            return after["rows_end"] - before["rows_end"]
+
+    def _commit(self, entry: dict) -> None:
+        # Call with the write lock held, right after refresh(), so the offset is the last full line
+        with open(self._path("manifest.jsonl"), "ab") as f:
+            # Drop a line a crashed writer left half written
+            f.truncate(self._manifest_offset)
+            f.write((json.dumps(entry) + "\n").encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        self.refresh()
+
+    def has_video(self, video_id: str) -> bool:
+        self.refresh()
+        return video_id in self._video_rows
+
+    def videos(self) -> List[dict]:
+        """One row per video; ``covered`` is the source time indexed so far, ``complete`` whether that is all"""
+        self.refresh()
+        videos: Dict[str, dict] = {}
+        for entry in self.entries:
+            video = videos.setdefault(entry["video_id"], {
+                "video_id": entry["video_id"], "title": entry["title"], "nodes": 0, "duration": 0.0,
+                "covered": 0.0, "complete": False
+            })
+            video["nodes"] += entry["rows"]
+            video["duration"] = max(video["duration"], entry.get("duration") or 0.0)
+            video["covered"] = max(video["covered"], entry.get("covered") or 0.0)
+            # Entries written before partial appends existed are whole videos
+            video["complete"] = video["complete"] or entry.get("complete", True)
+        return list(videos.values())
+
+    def coverage(self, video_id: str) -> Tuple[float, bool]:
+        """(source seconds indexed so far, whether the video is complete) for one video"""
+        for video in self.videos():
+            if video["video_id"] == video_id:
+                return video["covered"], video["complete"]
+        return 0.0, False
+
+    def mark_complete(self, video_id: str, duration: Optional[float] = None) -> None:
+        """Record that a partially appended video has no more rows to come"""
+        with self._lock, _file_lock(self._path("write.lock")):
+            self.refresh()
+            titles = [e["title"] for e in self.entries if e["video_id"] == video_id]
+            if not titles:
+                return
+            committed = self._committed()
+            entry = {"video_id": video_id, "title": titles[0], "rows": 0,
+                     **{key: committed[key] for key in ("rows_end", "nodes_end", "bm25_end")},
+                     "duration": duration, "covered": duration, "complete": True, "added": time.time()}
+            self._commit(entry)
+
+    def add_video(self, video_id: str, title: Optional[str], nodes: Sequence[TextNode],
+                  embed_model_key: str, duration: Optional[float] = None,
+                  covered: Optional[float] = None, complete: bool = True) -> int:
+        """Append embedded nodes for a video (or part of one) without touching existing data.
+
+        Pass ``complete=False`` while more of the video is still to come, with
+        ``covered`` the source time the video is indexed up to; the rows are
+        searchable as soon as this returns.
+        """
+        if not nodes:
+            return 0
+        embeddings = [node.get_embedding() for node in nodes]
+        with self._lock, _file_lock(self._path("write.lock")):
+            self.refresh()
+            # Rows are always stored the way the library was created, whatever this instance was given
+            meta = self.meta or {"dtype": self.dtype, "dimensions": self.dimensions}
+            quantized, scales = quantize(embeddings, meta["dtype"], meta["dimensions"])
+            if self.meta is None:
+                self.meta = {**meta, "dim": int(quantized.shape[1]), "embed_model": embed_model_key}
+                with open(self._path("meta.json"), "w", encoding="utf-8") as f:
+                    json.dump(self.meta, f)
+            elif self.meta["embed_model"] != embed_model_key or self.meta["dim"] != quantized.shape[1]:
+                raise ValueError(
+                    f"Library was built with {self.meta['embed_model']} ({self.meta['dim']}d); "
+                    f"cannot add vectors from {embed_model_key} ({quantized.shape[1]}d)"
+                )
+
+            committed = self._committed()
+            row_bytes = quantized.shape[1] * quantized.itemsize
+            files = [("vectors.bin", committed["rows_end"] * row_bytes, quantized.tobytes()),
+                     ("nodes.jsonl", committed["nodes_end"], b"".join(
+                         (node.model_copy(update={"embedding": None}).to_json() + "\n").encode("utf-8")
+                         for node in nodes)),
+                     ("bm25.jsonl", committed["bm25_end"], b"".join(
+                         (json.dumps(Counter(tokenize(node.get_content()))) + "\n").encode("utf-8")
+                         for node in nodes))]
+            if scales is not None:
+                files.append(("scales.bin", committed["rows_end"] * 4, scales.tobytes()))
+            ends = {}
+            for name, offset, payload in files:
+                with open(self._path(name), "ab") as f:
+                    # Drop anything a crashed writer left past the last commit
+                    f.truncate(offset)
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                ends[name] = offset + len(payload)
+
+            entry = {
+                "video_id": video_id,
+                "title": title or video_id,
+                "rows": len(nodes),
+                "rows_end": committed["rows_end"] + len(nodes),
+                "nodes_end": ends["nodes.jsonl"],
+                "bm25_end": ends["bm25.jsonl"],
+                "duration": duration,
+                "covered": duration if complete and covered is None else covered,
+                "complete": complete,
+                "added": time.time(),
+            }
+            self._commit(entry)
+        logger.info(f"Added {len(nodes)} nodes for {video_id} to the library ({entry['rows_end']} total)")
+        return len(nodes)
+
+    def _ranges(self, video_ids: Optional[Sequence[str]]) -> List[Tuple[int, int]]:
+        if video_ids is None:
+            return [(0, self._committed()["rows_end"])]
+        return [r for video_id in video_ids for r in self._video_rows.get(video_id, [])]
+
+    def search_vector(self, query_embedding: Sequence[float], k: int,
+                      video_ids: Optional[Sequence[str]] = None) -> List[Tuple[int, float]]:
+        """Top-k rows by cosine similarity, scoring only rows of the selected videos"""
+        # refresh() swaps the arrays and extends the row ranges under the same lock
+        with self._lock:
+            ranges = self._ranges(video_ids)
+            if self._vectors is None or not ranges:
+                return []
+            rows = np.concatenate([np.arange(a, b) for a, b in ranges])
+            scores = np.concatenate([
+                score(self._vectors[a:b], self._scales[a:b] if self._scales is not None else None,
+                      query_embedding, self.meta["dimensions"])
+                for a, b in ranges
+            ])
+        best = top_k(scores, k)
+        return [(int(rows[i]), float(scores[i])) for i in best]
+
+    def search_bm25(self, query: str, k: int,
+                    video_ids: Optional[Sequence[str]] = None) -> List[Tuple[int, float]]:
+        with self._lock:
+            ranges = self._ranges(video_ids)
+            if not ranges:
+                return []
+            scores = self.bm25.scores(query, ranges)
+        rows = np.concatenate([np.arange(a, b) for a, b in ranges])
+        scores = np.where(scores > 0, scores, -np.inf)
+        best = top_k(scores, k)
+        return [(int(rows[i]), float(scores[i])) for i in best]
+
+    def retriever(self, mode: str = "vector", video_ids: Optional[Sequence[str]] = None,
+                  similarity_top_k: int = 3, embed_model: Optional[BaseEmbedding] = None) -> "LibraryRetriever":
+        return LibraryRetriever(self, mode=mode, video_ids=video_ids,
+                                similarity_top_k=similarity_top_k, embed_model=embed_model)
+
+
+class LibraryRetriever(BaseRetriever):
+    """Vector or BM25 retrieval over the library, optionally limited to some videos"""
+
+    def __init__(self, library: VideoLibrary, mode: str = "vector",
+                 video_ids: Optional[Sequence[str]] = None, similarity_top_k: int = 3,
+                 embed_model: Optional[BaseEmbedding] = None):
+        if mode not in ("vector", "bm25"):
+            raise ValueError(f"Unknown retrieval mode: {mode}")
+        if mode == "vector" and embed_model is None:
+            raise ValueError("Vector retrieval needs the embed model the library was built with")
+        super().__init__()
+        self.library = library
+        self.mode = mode
+        self.video_ids = list(video_ids) if video_ids is not None else None
+        self.similarity_top_k = similarity_top_k
+        self.embed_model = embed_model
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        embedding = None
+        if self.mode == "vector":
+            # Embedded before taking the lock so a slow API call never holds up refresh()
+            embedding = query_bundle.embedding or self.embed_model.get_query_embedding(query_bundle.query_str)
+        with self.library._lock:
+            self.library.refresh()
+            if embedding is not None:
+                hits = self.library.search_vector(embedding, self.similarity_top_k, self.video_ids)
+            else:
+                hits = self.library.search_bm25(query_bundle.query_str, self.similarity_top_k, self.video_ids)
+            return [NodeWithScore(node=self.library.nodes[row], score=s) for row, s in hits]
@@ -0,0 +1,187 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+from openai import OpenAI
+from openai.types.chat import ChatCompletion
+
+from prompt_cache import PromptCache, prompt_key
+from tracing import percentile, current_span
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHAT_MODEL = "gpt-3.5-turbo"
+LLM_TIMEOUT_SECONDS = float(os.environ.get("LLM_TIMEOUT_SECONDS", 60))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", 2))
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", 20))
+
+
+@dataclass
+class CallMetrics:
+    name: str
+    model: Optional[str]
+    kind: str
+    started: float
+    latency: float = 0.0
+    first_token: Optional[float] = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    status: str = "ok"
+    error: Optional[str] = None
+
+
+class LLMGateway:
+    """Single entry point for OpenAI calls.
+
+    Owns one keep-alive connection pool shared by the client and the
+    embedding model, applies the same timeout and retry policy to every call, and records latency, time to first token,
+    token usage and errors per call name. Set ``metrics_file`` (or
+    ``LLM_METRICS_FILE``) to append every call as a JSON line. With a
+    ``prompt_cache``, chat calls it enables are answered from disk when the
+    model, messages and sampling params repeat exactly.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 timeout: float = LLM_TIMEOUT_SECONDS, max_retries: int = LLM_MAX_RETRIES,
+                 max_connections: int = LLM_MAX_CONNECTIONS, metrics_file: Optional[str] = None,
+                 history: int = 1000, prompt_cache: Optional[PromptCache] = None):
+        self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
+        self.base_url = base_url or os.environ.get("OPENAI_BASE_URL")
+        self.timeout = httpx.Timeout(timeout, connect=10.0)
+        self.max_retries = max_retries
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_connections)
+        self.http_client = httpx.Client(limits=self.limits, timeout=self.timeout)
+        self.client = OpenAI(api_key=self.api_key, base_url=self.base_url, http_client=self.http_client,
+                             timeout=self.timeout, max_retries=max_retries)
+        self.metrics_file = metrics_file or os.environ.get("LLM_METRICS_FILE")
+        self.calls = deque(maxlen=history)
+        self.prompt_cache = prompt_cache
+        self._lock = threading.Lock()
+
+    def _record(self, call: CallMetrics) -> None:
+        # Token usage also lands on the enclosing trace span, e.g. generate_answer
+        current_span().incr(api_calls=1, prompt_tokens=call.prompt_tokens,
+                            completion_tokens=call.completion_tokens)
+        with self._lock:
+            self.calls.append(call)
+            if self.metrics_file:
+                with open(self.metrics_file, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(asdict(call)) + "\n")
+        if call.status == "error":
+            logger.warning(f"{call.name} failed after {call.latency:.2f}s: {call.error}")
+
+    @contextmanager
+    def _track(self, name: str, model: Optional[str], kind: str) -> Iterator[CallMetrics]:
+        call = CallMetrics(name=name, model=model, kind=kind, started=time.time())
+        started = time.perf_counter()
+        try:
+            yield call
+        except GeneratorExit:
+            call.status = "cancelled"
+            raise
+        except BaseException as e:
+            call.status = "error"
+            call.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            call.latency = time.perf_counter() - started
+            self._record(call)
+
+    @staticmethod
+    def _usage(call: CallMetrics, usage: Any) -> None:
+        if usage is not None:
+            call.prompt_tokens = usage.prompt_tokens or 0
+            call.completion_tokens = usage.completion_tokens or 0
+
+    def chat(self, name: str, messages: List[dict], model: str = DEFAULT_CHAT_MODEL,
+             use_cache: Optional[bool] = None, **kwargs):
+        """Chat completion; ``use_cache`` overrides whether the prompt cache is enabled for ``name``"""
+        if use_cache is None:
+            use_cache = self.prompt_cache is not None and self.prompt_cache.enabled(name)
+        cache = self.prompt_cache if use_cache else None
+        key = prompt_key(model, messages, kwargs) if cache else None
+        with self._track(name, model, "chat") as call:
+            if cache:
+                cached = cache.get(key)
+                if cached is not None:
+                    call.status = "cached"
+                    return ChatCompletion.model_validate_json(cached)
+            response = self.client.chat.completions.create(model=model, messages=messages, **kwargs)
+            self._usage(call, response.usage)
+            if cache:
+                cache.put(key, name, model, response.model_dump_json())
+            return response
+
+    def forget(self, messages: List[dict], model: str = DEFAULT_CHAT_MODEL, **kwargs) -> None:
+        """Drop a cached completion for this exact request, e.g. one that failed validation"""
+        if self.prompt_cache is not None:
+            self.prompt_cache.discard(prompt_key(model, messages, kwargs))
+
+    def stream_chat(self, name: str, messages: List[dict], model: str = DEFAULT_CHAT_MODEL,
+                    cancel: Optional[threading.Event] = None, **kwargs) -> Iterator[str]:
+        """Yield completion text as it arrives; stops and closes the request once cancel is set"""
+        with self._track(name, model, "stream") as call:
+            started = time.perf_counter()
+            stream = self.client.chat.completions.create(
+                model=model, messages=messages, stream=True,
+                stream_options={"include_usage": True}, **kwargs
+            )
+            try:
+                for chunk in stream:
+                    if cancel is not None and cancel.is_set():
+                        call.status = "cancelled"
+                        break
+                    self._usage(call, chunk.usage)
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        if call.first_token is None:
+                            call.first_token = time.perf_counter() - started
+                        yield chunk.choices[0].delta.content
+            finally:
+                stream.close()
+
+    def transcribe(self, name: str, **kwargs):
+        """Audio transcription; retries are left to the caller (see transcription_scheduler)"""
+        with self._track(name, kwargs.get("model"), "transcription"):
+            return self.client.with_options(max_retries=0).audio.transcriptions.create(**kwargs)
+
+    def summary(self) -> Dict[str, dict]:
+        with self._lock:
+            calls = list(self.calls)
+        by_name: Dict[str, List[CallMetrics]] = {}
+        for call in calls:
+            by_name.setdefault(call.name, []).append(call)
+        summary = {}
+        for name, group in by_name.items():
+            latencies = [c.latency for c in group]
+            first_tokens = [c.first_token for c in group if c.first_token is not None]
+            summary[name] = {
+                "calls": len(group),
+                "errors": sum(c.status == "error" for c in group),
+                "cached": sum(c.status == "cached" for c in group),
+                "latency_p50": round(percentile(latencies, 50), 3),
+                "latency_p95": round(percentile(latencies, 95), 3),
+                "first_token_p50": round(percentile(first_tokens, 50), 3) if first_tokens else None,
+                "prompt_tokens": sum(c.prompt_tokens for c in group),
+                "completion_tokens": sum(c.completion_tokens for c in group),
+            }
+        return summary
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            calls = [asdict(call) for call in self.calls]
+        return {"summary": self.summary(), "calls": calls}
+
+    def export(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def close(self) -> None:
+        self.http_client.close()
@@ -1,16 +1,23 @@
 import streamlit as st
-from openai import OpenAI
-import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional
 import pyperclip
-from llama_index.core import Settings
-from rag_processor import process_video
-from llama_index.core.retrievers import QueryFusionRetriever
-from llama_index.embeddings.openai import OpenAIEmbedding
+from clients import gateway_started, get_embed_model, get_gateway
+from analyzer import analyze, analyze_batch, build_report, read_messages, to_sections
+from polisher import polish_batch, polish_message, read_requests, results_to_csv
+from prompt_cache import CACHEABLE_FUNCTIONS, DEFAULT_FUNCTIONS
+from tracing import propagate, summarize, traces, tracer
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# The RAG stack (yt-dlp, llama_index, BM25) is imported inside the RAG tab only and
+# the LLM gateway is built on the first request, so the page renders without either
 
-Settings.embed_model = OpenAIEmbedding(model="text-embedding-3-large")
+@st.cache_resource
+def background_executor() -> ThreadPoolExecutor:
+    """Runs suggestion requests while the answer streams"""
+    return ThreadPoolExecutor(max_workers=4)
 
 # Initialize each session state variable individually
 if "video_processed" not in st.session_state:
@@ -21,10 +28,20 @@ if "index" not in st.session_state:
     st.session_state.index = None
 if "retriever" not in st.session_state:
     st.session_state.retriever = None
+if "video_id" not in st.session_state:
+    st.session_state.video_id = None
+if "job_id" not in st.session_state:
+    st.session_state.job_id = None
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 if "question_input" not in st.session_state:
     st.session_state.question_input = ""
+# Prompt-cached call names for this browser session only; the cache itself is shared
+if "cached_functions" not in st.session_state:
+    st.session_state.cached_functions = list(DEFAULT_FUNCTIONS)
+
+def use_prompt_cache(name: str) -> bool:
+    return name in st.session_state.cached_functions
 
 # Function to update input when suggestion is clicked
 def use_suggestion(suggestion_text):
@@ -51,12 +68,13 @@ def generate_video_summary(transcript: str) -> str:
         SUMMARY:
         """
         
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
+        response = get_gateway().chat(
+            "generate_video_summary",
+            [
                 {"role": "system", "content": "You create concise, informative summaries of educational videos."},
                 {"role": "user", "content": prompt}
             ],
+            use_cache=use_prompt_cache("generate_video_summary"),
             temperature=0.3,
             max_tokens=250
         )
@@ -64,8 +82,8 @@ def generate_video_summary(transcript: str) -> str:
     except Exception as e:
         return f"Error generating summary: {str(e)}"
     
-def generate_answer(context: str, question: str) -> str:
-    """Generate LLM-based answer from retrieved context"""
+def stream_answer(context: str, question: str, cancel: Optional[threading.Event] = None) -> Iterator[str]:
+    """Stream an LLM-based answer from retrieved context"""
     try:
         prompt = f"""
         You are a student helper answering questions about a transcript of a educational video.
@@ -89,19 +107,24 @@ def generate_answer(context: str, question: str) -> str:
         Your response:
         """
         
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
+        yield from get_gateway().stream_chat(
+            "generate_answer",
+            [
                 {"role": "system", "content": "You are a helpful educational assistant who always provides answers based on available context or general knowledge when needed."},
                 {"role": "user", "content": prompt}
             ],
+            cancel=cancel,
             max_tokens=300
         )
-        return response.choices[0].message.content
     except Exception as e:
-        return f"Error generating answer: {str(e)}"
+        yield f"Error generating answer: {str(e)}"
+
+def generate_answer(context: str, question: str) -> str:
+    """Generate LLM-based answer from retrieved context"""
+    return "".join(stream_answer(context, question))
 
-def generate_suggestions(context: str, history: list) -> list:
+@tracer.traced("generate_suggestions")
+def generate_suggestions(context: str, history: list, cancel: Optional[threading.Event] = None) -> list:
     """Generate concise follow-up questions using LLM"""
     try:
         prompt = f"""
@@ -130,19 +153,22 @@ def generate_suggestions(context: str, history: list) -> list:
         THREE CONCISE FOLLOW-UP QUESTIONS:
         """
         
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
+        content = "".join(get_gateway().stream_chat(
+            "generate_suggestions",
+            [
                 {"role": "system", "content": "You create extremely concise but insightful educational questions."},
                 {"role": "user", "content": prompt}
             ],
+            cancel=cancel,
             temperature=0.7,  # Slightly higher temperature for creative but concise phrasing
             max_tokens=100    # Reduced token limit to encourage brevity
-        )
+        ))
+        if cancel is not None and cancel.is_set():
+            return []
         
         # Process and clean up questions
         questions = []
-        for q in response.choices[0].message.content.split("\n"):
+        for q in content.split("\n"):
             q = q.strip()
             if q and not q.isspace():
                 # Remove any numbering or bullet points
@@ -155,296 +181,326 @@ def generate_suggestions(context: str, history: list) -> list:
     
 def generate_polite_response(user_input, content_type, recipient_type, num_responses=1):
     """Generate responses based on recipient type and content type"""
-    format_rules = {
-        "Professor": {
-            "Text": """Microsoft Teams Message Rules (Professor):
-            1. Formal but friendly tone
-            2. Use proper salutations (Professor LastName)
-            3. Stay strictly relevant to the original query
-            5. 10-35 words maximum
-            6. Output FROM STUDENT TO PROFESSOR""",
-            
-            "Email": """Outlook Email Rules (Professor):
-            1. Subject line matching message intent
-            2. Formal salutation (Dear Professor LastName)
-            3. Mirror the user's original request style
-            4. Professional closing (Sincerely/Respectfully)
-            5. Signature: [Full Name]"""
-        },
-        "Classmate": {
-            "Text": """Microsoft Teams Message Rules (Classmate):
-            1. Casual friendly tone
-            2. Use first names only ([Name])
-            3. Match the user's message length/style
-            4. Can include emojis
-            5. 10-20 words maximum
-            Example: "Hey [Name], wanna grab coffee before class?""",
-            
-            "Email": """Email Rules (Classmate):
-            1. Simple subject line
-            2. Informal greeting (Hi [Name])
-            3. Mirror the user's original request
-            4. Direct request/question
-            5. Friendly sign-off (Cheers/Thanks)"""
-        }
-    }
-
-    system_prompt = f"""
-    You are a communication assistant helping craft messages for a student to his {recipient_type}.
-    Create {num_responses} variations that:
-    {format_rules[recipient_type][content_type]}
-    
-    KEY REQUIREMENTS:
-    1. PRESERVE the original message's intent exactly
-    2. MIRROR the user's writing style (formal/casual)
-    3. USE APPROPRIATE PLACEHOLDERS:
-       - Professor emails: [Full Name]
-       - Classmate texts: [Name]
-    
-    FORMAT FOR EACH VARIATION:
-    Variation [N]:
-    Subject: [Subject if email]
-    
-    [Message body]
-    
-    ---
-    
-    Original message: "{user_input}"
-    """
-
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": "Generate EXACT variations matching my message"}
-            ],
-            temperature=0.3,  # Lower temperature for more focused responses
-            max_tokens=500,
-            n=1
-        )
-        
-        # Process responses
-        clean_responses = []
-        raw_response = response.choices[0].message.content
-        
-        # Split variations using the delimiter
-        variations = [v.strip() for v in raw_response.split("---") if v.strip()]
-        
-        for variation in variations[:num_responses]:
-            lines = [line.strip() for line in variation.split("\n") if line.strip()]
-            
-            subject = ""
-            body = []
-            found_subject = False
-            
-            for line in lines:
-                if line.startswith("Subject:"):
-                    subject = line.replace("Subject:", "").strip()
-                    found_subject = True
-                elif found_subject or content_type == "Text":
-                    body.append(line)
-            
-            clean_body = "\n".join(body)
-            
-            # Fix placeholders for classmate texts
-            if recipient_type == "Classmate" and content_type == "Text":
-                clean_body = clean_body.replace("[Full Name]", "[Name]")
-                clean_body = clean_body.replace("Full Name", "Name")
-            
-            clean_responses.append((subject, clean_body))
-            
-        return clean_responses
-
+        return polish_message(user_input, content_type, recipient_type, num_responses,
+                              use_cache=use_prompt_cache("generate_polite_response"))
     except Exception as e:
         st.error(f"Error: {str(e)}")
         return []
-    
+
 # message analysis
 def analyze_message(message):
-    """Analyze received messages using LLM"""
-    analysis_prompt = f"""
-    Analyze this message from someone else:
-    "{message}"
-
-    Provide output in this EXACT format:
-    
-    ##EMOTION##
-    [primary emotion: happy/neutral/sad/angry/anxious]
-    
-    ##SOCIAL CUES##
-    - [cue 1: formality level]
-    - [cue 2: urgency level]
-    - [cue 3: relationship context]
-    
-    ##SUMMARY##
-    [1-sentence plain language summary]
-    
-    ##KEYWORDS##
-    [comma-separated important words]
-    
-    ##RESPONSES##
-    Positive: [positive response draft]
-    Neutral: [neutral response draft]
-    Negative: [negative response draft]
-    """
+    """Analyze received messages using LLM; returns the sections shown in the Analyzer tab"""
+    return to_sections(analyze(message, use_cache=use_prompt_cache("analyze_message")))
+
+def render_batch_polisher():
+    """Polish a list or CSV of messages concurrently, showing results as they complete"""
+    uploaded = st.file_uploader("📄 Upload messages (CSV with a `message` column, or one message per line):",
+                                type=["csv", "txt"])
+    pasted = st.text_area("…or paste messages, one per line:", height=100)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        content_type = st.radio("📝 Default format:", ["Text", "Email"], key="batch_format")
+    with col2:
+        recipient_type = st.radio("👤 Default recipient:", ["Professor", "Classmate"], key="batch_recipient")
+    with col3:
+        num_responses = st.slider("🔢 Variations:", 1, 5, 1, key="batch_variations")
+    st.caption("CSV columns `format`, `recipient` and `variations` override the defaults per row.")
+
+    data = uploaded.getvalue().decode("utf-8-sig") if uploaded else pasted
+    requests = read_requests(data, content_type, recipient_type, num_responses) if data else []
+
+    if st.button(f"✨ Polish {len(requests)} messages", use_container_width=True, disabled=not requests):
+        progress = st.progress(0.0)
+        table = st.empty()
+        results, started = [], time.perf_counter()
+        for result in polish_batch(requests, use_cache=use_prompt_cache("generate_polite_response")):
+            results.append(result)
+            progress.progress(len(results) / len(requests),
+                              text=f"{len(results)}/{len(requests)} polished "
+                                   f"in {time.perf_counter() - started:.1f}s")
+            table.dataframe([
+                {"row": r.request.row, "message": r.request.message,
+                 "polished": r.variations[0][1] if r.variations else "", "error": r.error or ""}
+                for r in sorted(results, key=lambda r: r.request.row)
+            ], hide_index=True)
+        st.session_state["batch_results"] = results
+
+    if st.session_state.get("batch_results"):
+        results = st.session_state["batch_results"]
+        failed = sum(1 for r in results if r.error)
+        if failed:
+            st.warning(f"{failed} of {len(results)} messages failed; see the error column.")
+        st.download_button(
+            label="💾 Download All Results",
+            data=results_to_csv(results),
+            file_name="polished_messages.csv",
+            mime="text/csv",
+            use_container_width=True
+        )
 
+def render_batch_analyzer():
+    """Analyze an exported inbox concurrently and summarise emotions and urgency"""
+    uploaded = st.file_uploader("📥 Upload an inbox export (JSONL or CSV with a message/text/body column):",
+                                type=["jsonl", "json", "csv", "txt"])
+    if not uploaded:
+        return
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a social communication assistant"},
-                {"role": "user", "content": analysis_prompt}
-            ],
-            temperature=0.2,
-            max_tokens=300
-        )
-        return response.choices[0].message.content
+        items = read_messages(uploaded.getvalue().decode("utf-8-sig"), uploaded.name)
     except Exception as e:
-        return f"Error: {str(e)}"
-
-def parse_analysis(raw_text):
-    """Parse LLM response into structured data"""
-    sections = {
-        "emotion": "",
-        "cues": [],
-        "summary": "",
-        "keywords": [],
-        "responses": {}
-    }
-    
-    current_section = None
-    for line in raw_text.split('\n'):
-        line = line.strip()
-        if line.startswith("##EMOTION##"):
-            current_section = "emotion"
-        elif line.startswith("##SOCIAL CUES##"):
-            current_section = "cues"
-        elif line.startswith("##SUMMARY##"):
-            current_section = "summary"
-        elif line.startswith("##KEYWORDS##"):
-            current_section = "keywords"
-        elif line.startswith("##RESPONSES##"):
-            current_section = "responses"
-        elif current_section == "emotion" and line:
-            sections["emotion"] = line.split(":")[-1].strip().lower()
-        elif current_section == "cues" and line.startswith("-"):
-            sections["cues"].append(line[1:].strip())
-        elif current_section == "summary" and line:
-            sections["summary"] = line
-        elif current_section == "keywords" and line:
-            sections["keywords"] = [kw.strip() for kw in line.split(",")]
-        elif current_section == "responses" and ":" in line:
-            tone, text = line.split(":", 1)
-            sections["responses"][tone.strip().lower()] = text.strip()
-    
-    return sections
+        st.error(f"Could not read {uploaded.name}: {str(e)}")
+        return
+
+    if st.button(f"🔮 Analyze {len(items)} messages", use_container_width=True, disabled=not items):
+        progress = st.progress(0.0)
+        results, started = [], time.perf_counter()
+        for result in analyze_batch(items, use_cache=use_prompt_cache("analyze_message")):
+            results.append(result)
+            progress.progress(len(results) / len(items),
+                              text=f"{len(results)}/{len(items)} analyzed "
+                                   f"in {time.perf_counter() - started:.1f}s")
+        st.session_state["inbox_report"] = build_report(results, time.perf_counter() - started)
+
+    report = st.session_state.get("inbox_report")
+    if not report:
+        return
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Analyzed", f"{report['analyzed']}/{report['messages']}")
+    col2.metric("Throughput", f"{report['messages_per_second']} msg/s")
+    col3.metric("Avg latency", f"{report['avg_latency_seconds']}s")
+    if report["failed"]:
+        st.warning(f"{report['failed']} messages could not be analyzed.")
+
+    st.markdown("### 🕵️‍♂️ Emotion Distribution")
+    st.bar_chart(report["emotions"])
+    st.markdown("### 🚨 Most Urgent")
+    st.dataframe(report["urgency_ranking"], hide_index=True)
+    st.download_button(
+        label="💾 Download Report",
+        data=json.dumps(report, indent=2),
+        file_name="inbox_report.json",
+        mime="application/json",
+        use_container_width=True
+    )
+
+def render_diagnostics():
+    """Summarise recorded trace spans per stage and show the most recent traces"""
+    if not tracer.enabled:
+        st.caption("Tracing is off. Set `TRACE_ENABLED=1` (or `TRACE_FILE`) before starting the app.")
+        return
+    spans = tracer.load()
+    if not spans:
+        st.write("No traces yet.")
+        return
+    st.dataframe(summarize(spans), hide_index=True)
+
+    recent = sorted((group for group in traces(spans).values() if group[0]["parent_id"] is None),
+                    key=lambda group: group[0]["started"], reverse=True)[:20]
+    if recent:
+        chosen = st.selectbox(
+            "Trace:", range(len(recent)),
+            format_func=lambda i: f"{recent[i][0]['name']} · {recent[i][0]['duration']:.1f}s · "
+                                  f"{time.strftime('%H:%M:%S', time.localtime(recent[i][0]['started']))}"
+        )
+        root = recent[chosen][0]
+        st.dataframe([
+            {"stage": span["name"], "offset_s": round(span["started"] - root["started"], 3),
+             "duration_s": round(span["duration"], 3), "status": span["status"], **span["attrs"]}
+            for span in recent[chosen]
+        ], hide_index=True)
+    st.download_button("Export traces", "\n".join(json.dumps(span) for span in spans),
+                       file_name="traces.jsonl", mime="application/jsonl")
+    if st.button("Clear traces"):
+        tracer.clear()
+        st.rerun()
 
 # Streamlit UI
-tab1, tab2, tab3 = st.tabs(["Polisher", "Analyzer", "RAG"])
+with st.sidebar:
+    # Per-call latency and token usage from the shared gateway, once it has been used
+    if gateway_started() and st.toggle("📈 API metrics"):
+        metrics = get_gateway().snapshot()
+        if metrics["summary"]:
+            st.dataframe([{"call": name, **stats} for name, stats in metrics["summary"].items()],
+                         hide_index=True)
+            st.download_button("Export metrics", json.dumps(metrics, indent=2),
+                               file_name="llm_metrics.json", mime="application/json")
+        else:
+            st.write("No API calls yet.")
+
+    # Stage timings from process_video workers and the RAG question flow
+    if st.toggle("🔬 Pipeline traces"):
+        render_diagnostics()
+
+    # Exact-repeat completions served from disk instead of the API
+    if st.toggle("🗄️ Prompt cache"):
+        prompt_cache = get_gateway().prompt_cache
+        # A widget's own key is dropped while it is hidden, so the choice is kept under another
+        st.multiselect("Cache calls from:", sorted(set(CACHEABLE_FUNCTIONS) | set(DEFAULT_FUNCTIONS)),
+                       default=st.session_state.cached_functions, key="cached_functions_choice",
+                       on_change=lambda: st.session_state.update(
+                           cached_functions=st.session_state.cached_functions_choice),
+                       help="Applies to this browser session only")
+        stats = prompt_cache.stats()
+        st.caption(f"{stats['hits']} hits, {stats['misses']} misses since the server started "
+                   f"({stats['hit_ratio']:.0%} hit ratio)")
+        entries = prompt_cache.entries()
+        if entries:
+            st.dataframe(entries, hide_index=True)
+            if st.button("Clear prompt cache"):
+                prompt_cache.clear()
+                st.rerun()
+        else:
+            st.write("Nothing cached yet.")
+
+# Rerunning on tab change lets the RAG tab run only while it is open
+tab1, tab2, tab3 = st.tabs(["Polisher", "Analyzer", "RAG"], key="active_tab", on_change="rerun")
 
 with tab1:
     st.title("📩 Commnucation Assistant")
+    batch_mode = st.toggle("📚 Batch mode", help="Polish many messages at once from a CSV or a list")
 
-    # Input Section
-    user_input = st.text_area("✏️ Polish Your message:", height=100)
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        content_type = st.radio("📝 Format:", ["Text", "Email"])
-    with col2:
-        recipient_type = st.radio("👤 Recipient:", ["Professor", "Classmate"])
-    with col3:
-        num_responses = st.slider("🔢 Variations:", 1, 5, 2)
-
-    # Generate Section
-    if st.button("✨ Generate Messages", use_container_width=True) and user_input:
-        with st.spinner(f"Creating {recipient_type} messages..."):
-            responses = generate_polite_response(user_input, content_type, recipient_type, num_responses)
-            st.session_state["responses"] = responses
-
-    # Display Results
-    if "responses" in st.session_state:
-        st.markdown("---")
+    if batch_mode:
+        render_batch_polisher()
+    else:
+        # Input Section
+        user_input = st.text_area("✏️ Polish Your message:", height=100)
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            content_type = st.radio("📝 Format:", ["Text", "Email"])
+        with col2:
+            recipient_type = st.radio("👤 Recipient:", ["Professor", "Classmate"])
+        with col3:
+            num_responses = st.slider("🔢 Variations:", 1, 5, 2)
+
+        # Generate Section
+        if st.button("✨ Generate Messages", use_container_width=True) and user_input:
+            with st.spinner(f"Creating {recipient_type} messages..."):
+                responses = generate_polite_response(user_input, content_type, recipient_type, num_responses)
+                st.session_state["responses"] = responses
+
+        # Display Results
+        if "responses" in st.session_state:
+            st.markdown("---")
         
-        for i, (subject, body) in enumerate(st.session_state["responses"], 1):
-            st.markdown(f"#### 📄 Variation {i}")
-            if content_type == "Email" and subject:
-                st.markdown(f"**Subject:** {subject}")
-            st.text_area(label="", 
-                        value=body,
-                        height=200,
-                        key=f"response_{i}")
-            if st.button(f"Copy Response", key=f"copy_button_{i}"):
-                pyperclip.copy(body)
-                st.success(f"Response {i} copied to clipboard!")
-
-        # Download functionality
-        all_responses = "\n\n".join([
-            f"Version {i}:\n{resp}" 
-            for i, resp in enumerate(st.session_state["responses"], 1)
-        ])
+            for i, (subject, body) in enumerate(st.session_state["responses"], 1):
+                st.markdown(f"#### 📄 Variation {i}")
+                if content_type == "Email" and subject:
+                    st.markdown(f"**Subject:** {subject}")
+                st.text_area(label="", 
+                            value=body,
+                            height=200,
+                            key=f"response_{i}")
+                if st.button(f"Copy Response", key=f"copy_button_{i}"):
+                    pyperclip.copy(body)
+                    st.success(f"Response {i} copied to clipboard!")
+
+            # Download functionality
+            all_responses = "\n\n".join([
+                f"Version {i}:\n{resp}" 
+                for i, resp in enumerate(st.session_state["responses"], 1)
+            ])
         
-        st.download_button(
-            label="💾 Download All Versions",
-            data=all_responses,
-            file_name="professional_responses.txt",
-            mime="text/plain",
-            use_container_width=True
-        )
+            st.download_button(
+                label="💾 Download All Versions",
+                data=all_responses,
+                file_name="professional_responses.txt",
+                mime="text/plain",
+                use_container_width=True
+            )
 
 with tab2:
     st.title("🤖 Analyze Messages")
+    batch_analysis = st.toggle("📥 Batch mode", help="Analyze an exported inbox (JSONL or CSV) at once",
+                               key="batch_analysis")
 
-    if "analysis" not in st.session_state:
-        st.session_state.analysis = None
-
-    received_message = st.text_area("🏅 Paste a message:", height=150)
-
-    if st.button("🔮 Analyze Message"):
-        if len(received_message) < 10:
-            st.warning("Please enter a longer message to analyze")
-        else:
-            with st.spinner("Analyzing social cues..."):
-                raw_analysis = analyze_message(received_message)
-                if "Error:" in raw_analysis:
-                    st.error(raw_analysis)
-                else:
-                    st.session_state.analysis = parse_analysis(raw_analysis)
-
-    # Display analysis results
-    if st.session_state.analysis:
-        col1, col2 = st.columns(2)
-        with col1:
-            st.markdown("### 🕵️‍♂️ Emotion Detection")
-            st.write(f"👁‍🗨 Primary emotion: **{st.session_state.analysis['emotion'].capitalize()}**")
-            st.markdown("### 👓 Social Cues")
-            for cue in st.session_state.analysis["cues"]:
-                st.write(f"- {cue}")
-            st.markdown("### 📌 Key Words")
-            st.write(", ".join(st.session_state.analysis["keywords"]))
-
-        with col2:
-            st.markdown("### 💌 Message Summary")
-            st.info(st.session_state.analysis["summary"])
-            st.markdown("### 🎉 Response Suggestions")
-            selected_tone_with_emoji = st.radio("Choose response tone:", ["😁 Positive", "😐 Neutral", "🙁 Negative"], index=1)
-
-            # Extract just the word part (remove emoji)
-            selected_tone = selected_tone_with_emoji.split(" ")[-1].lower()
-            response_text = st.session_state.analysis["responses"].get(selected_tone, "")
+    if batch_analysis:
+        render_batch_analyzer()
+    else:
+        if "analysis" not in st.session_state:
+            st.session_state.analysis = None
 
-            # Debug information - uncomment to see what keys are available
-            # st.write("Debug - Available keys:", list(st.session_state.analysis["responses"].keys()))
-            # st.write("Debug - Selected key:", selected_tone)
+        received_message = st.text_area("🏅 Paste a message:", height=150)
 
-            finalized_response = st.text_area("Suggestion response:", value=response_text, height=150)
+        if st.button("🔮 Analyze Message"):
+            if len(received_message) < 10:
+                st.warning("Please enter a longer message to analyze")
+            else:
+                with st.spinner("Analyzing social cues..."):
+                    try:
+                        st.session_state.analysis = analyze_message(received_message)
+                    except Exception as e:
+                        st.error(f"Error: {str(e)}")
+
+        # Display analysis results
+        if st.session_state.analysis:
+            col1, col2 = st.columns(2)
+            with col1:
+                st.markdown("### 🕵️‍♂️ Emotion Detection")
+                st.write(f"👁‍🗨 Primary emotion: **{st.session_state.analysis['emotion'].capitalize()}**")
+                st.markdown("### 👓 Social Cues")
+                for cue in st.session_state.analysis["cues"]:
+                    st.write(f"- {cue}")
+                st.markdown("### 📌 Key Words")
+                st.write(", ".join(st.session_state.analysis["keywords"]))
+
+            with col2:
+                st.markdown("### 💌 Message Summary")
+                st.info(st.session_state.analysis["summary"])
+                st.markdown("### 🎉 Response Suggestions")
+                selected_tone_with_emoji = st.radio("Choose response tone:", ["😁 Positive", "😐 Neutral", "🙁 Negative"], index=1)
+
+                # Extract just the word part (remove emoji)
+                selected_tone = selected_tone_with_emoji.split(" ")[-1].lower()
+                response_text = st.session_state.analysis["responses"].get(selected_tone, "")
+
+                # Debug information - uncomment to see what keys are available
+                # st.write("Debug - Available keys:", list(st.session_state.analysis["responses"].keys()))
+                # st.write("Debug - Selected key:", selected_tone)
+
+                finalized_response = st.text_area("Suggestion response:", value=response_text, height=150)
             
-            if st.button("Copy Response"):
-                pyperclip.copy(finalized_response)
-                st.success("Response copied to clipboard!")
-
-# Video chat
-with tab3:
+                if st.button("Copy Response"):
+                    pyperclip.copy(finalized_response)
+                    st.success("Response copied to clipboard!")
+
+def format_seconds(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes // 60}:{minutes % 60:02d}:{seconds:02d}" if minutes >= 60 else f"{minutes}:{seconds:02d}"
+
+def show_coverage(video: dict) -> None:
+    """Progress bar for how much of a partially indexed video can be searched"""
+    label = f"🟡 {video['title']} is searchable up to {format_seconds(video['covered'])}"
+    if video["duration"]:
+        label += f" of {format_seconds(video['duration'])}"
+    st.progress(min(1.0, video["covered"] / video["duration"]) if video["duration"] else 0.0, text=label)
+
+@st.fragment(run_every=1.0)
+def show_job_progress():
+    """Poll the background job, rerun the page once it finishes or its first chunks are searchable"""
+    from jobs import get_job_queue
+    from rag_processor import get_library
+
+    job = get_job_queue().get(st.session_state.job_id)
+    if job is None or job.status in ("done", "failed"):
+        st.rerun()
+    st.progress(job.fraction, text=job.label)
+    video = next((v for v in get_library().videos() if v["video_id"] == job.key), None)
+    if video and not video["complete"]:
+        show_coverage(video)
+        if st.session_state.get("live_video") != job.key:
+            # Open the question box on the partial index
+            st.session_state.live_video = job.key
+            st.rerun()
+
+def render_video_chat():
+    from answer_cache import answer_cache
+    from embedding_cache import embed_texts, model_key
+    from jobs import get_job_queue
+    from query_expansion import ExpandingFusionRetriever
+    from rag_processor import get_library, library_retrievers, process_video
+    from transcription_backends import BACKENDS, TRANSCRIPTION_BACKEND, LocalWhisperBackend
+
+    embed_model = get_embed_model()
     st.title("Ask your videos! 🎥💬")
     col1, col2 = st.columns([3, 1])
     with col1:
@@ -453,10 +509,40 @@ with tab3:
         st.write("")
         st.write("")
         process_button = st.button("Process Video 🚀", use_container_width=True)
+    col1, col2 = st.columns(2)
+    with col1:
+        trim_silence = st.checkbox("✂️ Trim silence before transcribing", value=False,
+                                   help="Uploads 16 kHz mono audio with long silences removed")
+    with col2:
+        backend = st.radio("🎙️ Transcription:", list(BACKENDS),
+                           index=list(BACKENDS).index(TRANSCRIPTION_BACKEND), horizontal=True,
+                           format_func={"openai": "OpenAI Whisper", "local": "Local CPU"}.get,
+                           help="Local CPU runs a quantized Whisper model on this machine, "
+                                "with no upload or API latency")
+    if backend == "local" and not LocalWhisperBackend.available():
+        st.warning("Local transcription needs `pip install faster-whisper`.")
+
+    if process_button and video_url:
+        # Processing runs in a background worker so reruns and disconnects don't lose it
+        st.session_state.job_id = get_job_queue().submit(
+            video_url, preprocess=trim_silence, backend=backend
+        )
 
-    if process_button:
-        with st.spinner("Processing video..."):
-            result = process_video(video_url)
+    job = get_job_queue().get(st.session_state.job_id) if st.session_state.job_id else None
+    if job and job.status in ("done", "failed"):
+        st.session_state.pop("live_video", None)
+    if job and job.status == "failed":
+        st.error(f"Error processing video: {job.error}")
+        st.session_state.job_id = None
+    elif job and job.status == "done":
+        st.session_state.job_id = None
+        with st.spinner("Loading video..."):
+            try:
+                # Transcript and index are cached by the worker, so this is fast
+                result = process_video(job.url, preprocess=job.preprocess, backend=job.backend)
+            except Exception as e:
+                st.error(f"Error processing video: {str(e)}")
+                st.stop()
 
             summary = generate_video_summary(result["transcript"])
             
@@ -465,28 +551,62 @@ with tab3:
             auto_merging_retriever = result["retrievers"]["auto_merging"]
             
             # Create fusion retriever
-            fusion_retriever = QueryFusionRetriever(
+            fusion_retriever = ExpandingFusionRetriever(
                 [bm25_retriever, auto_merging_retriever],
+                scope=result["video_id"],
+                embed_model=embed_model,
+                idf=get_library().bm25.idf,
                 similarity_top_k=5,
                 num_queries=4,  # Generate 4 queries for each search
                 mode="reciprocal_rerank",  # Fusion method
-                use_async=True,
                 verbose=True,  # For debugging
             )
             
             st.session_state.update({
                 "video_processed": True,
+                "video_id": result["video_id"],
                 "transcript": result["transcript"],
                 "retriever": fusion_retriever,
+                "video_retriever": fusion_retriever,
                 "index": result["index"],
                 "video_summary": summary
             })
         st.success("✅ Video processed! Ask away!")
+    elif job:
+        show_job_progress()
+
+    # Search any combination of previously processed videos, including one still processing
+    videos = {v["video_id"]: v for v in get_library().videos()}
+    library_videos = {video_id: v["title"] for video_id, v in videos.items()}
+    live_video = st.session_state.get("live_video")
+    current_id = live_video or st.session_state.video_id
+    current = [current_id] if current_id in library_videos else []
+    selected_videos = st.multiselect("📚 Videos to search:", list(library_videos),
+                                     default=current, format_func=library_videos.get)
+    partial = [videos[video_id] for video_id in selected_videos if not videos[video_id]["complete"]]
+    for video in partial:
+        # The job's fragment shows the live video's coverage; others were interrupted midway
+        if video["video_id"] != live_video:
+            show_coverage(video)
+    if selected_videos and (selected_videos != current or partial):
+        library = library_retrievers(selected_videos)
+        st.session_state.retriever = ExpandingFusionRetriever(
+            [library["bm25"], library["vector"]],
+            # Growing indexes get a new scope as they grow, so cached answers never go stale
+            scope=",".join(sorted(selected_videos)) + "".join(f"@{v['covered']:.0f}s" for v in partial),
+            embed_model=embed_model,
+            idf=get_library().bm25.idf,
+            similarity_top_k=5,
+            num_queries=4,
+            mode="reciprocal_rerank",
+        )
+    elif "video_retriever" in st.session_state:
+        st.session_state.retriever = st.session_state.video_retriever
 
-    if st.session_state.video_processed:
+    if st.session_state.video_processed or selected_videos:
         st.markdown("---")
 
-        if "video_summary" in st.session_state:
+        if "video_summary" in st.session_state and not live_video:
             st.subheader("📝 Video Summary")
             st.info(st.session_state.video_summary)
             st.markdown("---")
@@ -497,6 +617,13 @@ with tab3:
         user_input = st.text_input("Your question about the video:", 
                                 key="question_input")
         
+        expansion = st.radio("Query expansion:", ["llm", "keywords", "none"], horizontal=True,
+                             format_func={"llm": "LLM (best recall)", "keywords": "Keywords (fast)",
+                                          "none": "Off (fastest)"}.get)
+        use_answer_cache = st.checkbox("♻️ Reuse answers to similar questions", value=True,
+                                       help="Skips retrieval and generation when a near-identical "
+                                            "question about these videos was already answered")
+
         generate_button = st.button("✨ Get Answer", use_container_width=True)
 
         # Make sure we have a place to store the current answer
@@ -505,28 +632,62 @@ with tab3:
         if "current_suggestions" not in st.session_state:
             st.session_state.current_suggestions = []
         
+        answer_streamed = False
+        cached = None
         if generate_button and user_input:
-            with st.spinner("Finding the best answer..."):
-                nodes = st.session_state.retriever.retrieve(user_input)
-                context = "\n".join([node.text for node in nodes])
-                
-                # Generate answer
-                answer = generate_answer(context, user_input)
-                
-                # Generate suggestions
-                suggestions = generate_suggestions(context, st.session_state.chat_history)
-                
-                # Update history
-                st.session_state.chat_history.append((user_input, answer))
-
-                # Save current answer and suggestions in session state
-                st.session_state.current_answer = answer
-                st.session_state.current_suggestions = suggestions
+            scope = st.session_state.retriever.scope
+            embed_key = model_key(embed_model)
+            with tracer.span("answer_cache_lookup") as span:
+                question_embedding = embed_texts(embed_model, [user_input])[0]
+                if use_answer_cache:
+                    cached = answer_cache.lookup(scope, embed_key, question_embedding)
+                span.set(hit=bool(cached))
+            if cached:
+                st.session_state.chat_history.append((user_input, cached["answer"]))
+                st.session_state.current_answer = cached["answer"]
+                st.session_state.current_suggestions = cached["suggestions"]
+                st.caption(f"♻️ Cached answer to a similar question: \"{cached['question']}\" "
+                           f"({cached['similarity']:.0%} similar)")
+
+        if generate_button and user_input and not cached:
+            with tracer.span("answer_question", expansion=expansion):
+                with st.spinner("Finding the best answer..."), tracer.span("retrieve") as span:
+                    st.session_state.retriever.expansion = expansion
+                    nodes = st.session_state.retriever.retrieve(user_input)
+                    context = "\n".join([node.text for node in nodes])
+                    span.set(nodes=len(nodes), context_chars=len(context))
+
+                # Suggestions are generated on the same context while the answer streams;
+                # a rerun (e.g. the user clicking elsewhere) cancels both requests
+                cancel = threading.Event()
+                suggestions_future = background_executor().submit(
+                    propagate(generate_suggestions), context, list(st.session_state.chat_history), cancel
+                )
+                try:
+                    st.subheader("💡 Answer")
+                    with tracer.span("generate_answer") as span:
+                        answer = st.write_stream(stream_answer(context, user_input, cancel))
+                        span.set(chars=len(answer))
+                    suggestions = suggestions_future.result()
+                finally:
+                    cancel.set()
+                    suggestions_future.cancel()
+            answer_streamed = True
+
+            # Update history
+            st.session_state.chat_history.append((user_input, answer))
+
+            # Save current answer and suggestions in session state
+            st.session_state.current_answer = answer
+            st.session_state.current_suggestions = suggestions
+            if not answer.startswith("Error generating answer"):
+                answer_cache.store(scope, embed_key, user_input, question_embedding, answer, suggestions)
 
         # Display results
         if st.session_state.current_answer:
-            st.subheader("💡 Answer")
-            st.write(st.session_state.current_answer)
+            if not answer_streamed:
+                st.subheader("💡 Answer")
+                st.write(st.session_state.current_answer)
             
             st.subheader("🤔 Suggested Questions")
             cols = st.columns(3)
@@ -536,6 +697,11 @@ with tab3:
                     if st.button(q, key=f"suggestion_{i}", on_click=use_suggestion, args=(q,), use_container_width=True):
                         pass
 
+        stats = answer_cache.stats()
+        if stats["hits"] + stats["misses"]:
+            st.caption(f"Answer cache: {stats['hits']} hits, {stats['misses']} misses "
+                       f"({stats['hit_ratio']:.0%} hit rate)")
+
         # Collapsible chat history
         with st.expander("📚 View Conversation History"):
             if st.session_state.chat_history:
@@ -546,4 +712,9 @@ with tab3:
             else:
                 st.write("No conversation history yet.")
     else:
-        st.info("👆 Enter an URL to start asking questions.")
\ No newline at end of file
+        st.info("👆 Enter an URL to start asking questions.")
+
+# Video chat
+with tab3:
+    if tab3.open:
+        render_video_chat()
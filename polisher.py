@@ -0,0 +1,203 @@
+import csv
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from clients import get_gateway
+
+POLISH_MAX_CONCURRENCY = int(os.environ.get("POLISH_MAX_CONCURRENCY", 8))
+CONTENT_TYPES = ("Text", "Email")
+RECIPIENT_TYPES = ("Professor", "Classmate")
+
+FORMAT_RULES = {
+    "Professor": {
+        "Text": """Microsoft Teams Message Rules (Professor):
+        1. Formal but friendly tone
+        2. Use proper salutations (Professor LastName)
+        3. Stay strictly relevant to the original query
+        5. 10-35 words maximum
+        6. Output FROM STUDENT TO PROFESSOR""",
+
+        "Email": """Outlook Email Rules (Professor):
+        1. Subject line matching message intent
+        2. Formal salutation (Dear Professor LastName)
+        3. Mirror the user's original request style
+        4. Professional closing (Sincerely/Respectfully)
+        5. Signature: [Full Name]"""
+    },
+    "Classmate": {
+        "Text": """Microsoft Teams Message Rules (Classmate):
+        1. Casual friendly tone
+        2. Use first names only ([Name])
+        3. Match the user's message length/style
+        4. Can include emojis
+        5. 10-20 words maximum
+        Example: "Hey [Name], wanna grab coffee before class?""",
+
+        "Email": """Email Rules (Classmate):
+        1. Simple subject line
+        2. Informal greeting (Hi [Name])
+        3. Mirror the user's original request
+        4. Direct request/question
+        5. Friendly sign-off (Cheers/Thanks)"""
+    }
+}
+
+
+@dataclass
+class PolishRequest:
+    row: int
+    message: str
+    content_type: str = "Text"
+    recipient_type: str = "Professor"
+    variations: int = 1
+
+
+@dataclass
+class PolishResult:
+    request: PolishRequest
+    variations: List[Tuple[str, str]] = field(default_factory=list)
+    error: Optional[str] = None
+    latency: float = 0.0
+
+
+def build_messages(message: str, content_type: str, recipient_type: str) -> List[dict]:
+    # One variation per completion; the API's ``n`` produces the others
+    system_prompt = f"""
+    You are a communication assistant helping craft messages for a student to his {recipient_type}.
+    Rewrite the student's message so that it follows:
+    {FORMAT_RULES[recipient_type][content_type]}
+
+    KEY REQUIREMENTS:
+    1. PRESERVE the original message's intent exactly
+    2. MIRROR the user's writing style (formal/casual)
+    3. USE APPROPRIATE PLACEHOLDERS:
+       - Professor emails: [Full Name]
+       - Classmate texts: [Name]
+
+    OUTPUT FORMAT:
+    Subject: [Subject if email]
+
+    [Message body]
+
+    Original message: "{message}"
+    """
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": "Generate the message matching my original"}
+    ]
+
+
+def parse_variation(text: str, content_type: str, recipient_type: str) -> Tuple[str, str]:
+    lines = [line.strip() for line in text.split("\n") if line.strip()]
+    subject = ""
+    body = []
+    for line in lines:
+        if line.startswith("Subject:"):
+            subject = line.replace("Subject:", "").strip()
+        elif not line.startswith("Variation"):
+            body.append(line)
+    clean_body = "\n".join(body)
+
+    # Fix placeholders for classmate texts
+    if recipient_type == "Classmate" and content_type == "Text":
+        clean_body = clean_body.replace("[Full Name]", "[Name]")
+        clean_body = clean_body.replace("Full Name", "Name")
+    return subject, clean_body
+
+
+def polish_message(message: str, content_type: str, recipient_type: str,
+                   num_variations: int = 1, use_cache: Optional[bool] = None) -> List[Tuple[str, str]]:
+    """Return (subject, body) variations, generated as ``n`` choices of one request"""
+    response = get_gateway().chat(
+        "generate_polite_response",
+        build_messages(message, content_type, recipient_type),
+        use_cache=use_cache,
+        temperature=0.3,  # Lower temperature for more focused responses
+        max_tokens=300,
+        n=num_variations
+    )
+    return [parse_variation(choice.message.content or "", content_type, recipient_type)
+            for choice in response.choices]
+
+
+def _polish(request: PolishRequest, use_cache: Optional[bool] = None) -> PolishResult:
+    started = time.perf_counter()
+    result = PolishResult(request=request)
+    try:
+        result.variations = polish_message(request.message, request.content_type,
+                                           request.recipient_type, request.variations, use_cache)
+    except Exception as e:
+        result.error = str(e)
+    result.latency = time.perf_counter() - started
+    return result
+
+
+def polish_batch(requests: Iterable[PolishRequest], max_workers: int = POLISH_MAX_CONCURRENCY,
+                 use_cache: Optional[bool] = None) -> Iterator[PolishResult]:
+    """Polish messages concurrently, yielding each result as soon as it completes.
+
+    Closing the generator early (e.g. on a Streamlit rerun) cancels the
+    requests that have not started instead of waiting for them.
+    """
+    requests = list(requests)
+    if not requests:
+        return
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(requests)))
+    try:
+        futures = [executor.submit(_polish, request, use_cache) for request in requests]
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _pick(value: Optional[str], choices: Tuple[str, ...], default: str) -> str:
+    for choice in choices:
+        if value and value.strip().lower() == choice.lower():
+            return choice
+    return default
+
+
+def read_requests(data: str, content_type: str = "Text", recipient_type: str = "Professor",
+                  variations: int = 1) -> List[PolishRequest]:
+    """Parse a CSV with a ``message`` column (and optional ``format``, ``recipient``,
+    ``variations`` columns overriding the defaults), or plain text with one message per line"""
+    first_line = data.lstrip().split("\n", 1)[0].lower()
+    if "message" not in [column.strip() for column in first_line.split(",")]:
+        return [PolishRequest(row=i, message=line.strip(), content_type=content_type,
+                              recipient_type=recipient_type, variations=variations)
+                for i, line in enumerate(data.splitlines(), 1) if line.strip()]
+    requests = []
+    for i, row in enumerate(csv.DictReader(io.StringIO(data.lstrip())), 1):
+        row = {(key or "").strip().lower(): (value or "").strip() for key, value in row.items()}
+        if not row.get("message"):
+            continue
+        try:
+            count = int(row.get("variations") or variations)
+        except ValueError:
+            count = variations
+        requests.append(PolishRequest(
+            row=i, message=row["message"],
+            content_type=_pick(row.get("format"), CONTENT_TYPES, content_type),
+            recipient_type=_pick(row.get("recipient"), RECIPIENT_TYPES, recipient_type),
+            variations=max(1, min(count, 5))
+        ))
+    return requests
+
+
+def results_to_csv(results: Iterable[PolishResult]) -> str:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["row", "message", "format", "recipient", "variation", "subject", "body", "error"])
+    for result in sorted(results, key=lambda r: r.request.row):
+        request = result.request
+        base = [request.row, request.message, request.content_type, request.recipient_type]
+        if result.error:
+            writer.writerow(base + ["", "", "", result.error])
+        for i, (subject, body) in enumerate(result.variations, 1):
+            writer.writerow(base + [i, subject, body, ""])
+    return out.getvalue()
@@ -0,0 +1,129 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Optional
+
+from transcript_cache import CACHE_ROOT
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = float(os.environ.get("PROMPT_CACHE_TTL", 24 * 3600))
+DEFAULT_MAX_BYTES = int(os.environ.get("PROMPT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+# Chat call names that can be cached; each is opted in through PROMPT_CACHE_FUNCTIONS
+# or per call, and anything not opted in always hits the API
+CACHEABLE_FUNCTIONS = ("generate_polite_response", "analyze_message", "generate_video_summary")
+DEFAULT_FUNCTIONS = tuple(
+    name.strip() for name in os.environ.get("PROMPT_CACHE_FUNCTIONS", "").split(",") if name.strip()
+)
+
+
+def prompt_key(model: str, messages: List[dict], params: dict) -> str:
+    """Hash of everything that determines a completion: model, full message list and sampling params"""
+    payload = json.dumps({"model": model, "messages": messages, "params": params},
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PromptCache:
+    """SQLite store of chat completions for exact repeats of a request.
+
+    Only call names in ``functions`` are cached, unless a caller says
+    otherwise per call (see ``LLMGateway.chat``). Entries expire after ``ttl``
+    seconds and the least recently used ones are evicted once the stored
+    responses exceed ``max_bytes``.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = DEFAULT_TTL_SECONDS,
+                 max_bytes: int = DEFAULT_MAX_BYTES, functions: Iterable[str] = DEFAULT_FUNCTIONS):
+        self.path = path or os.path.join(CACHE_ROOT, "prompts.sqlite")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.functions = set(functions)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS prompts ("
+                " key TEXT PRIMARY KEY, name TEXT NOT NULL, model TEXT NOT NULL,"
+                " response TEXT NOT NULL, size INTEGER NOT NULL, hits INTEGER NOT NULL DEFAULT 0,"
+                " created REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def enabled(self, name: str) -> bool:
+        return name in self.functions
+
+    def get(self, key: str) -> Optional[str]:
+        """Stored response JSON for this key, if present and not expired"""
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT response FROM prompts WHERE key = ? AND created >= ?",
+                               (key, now - self.ttl)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE prompts SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return row[0] if row else None
+
+    def put(self, key: str, name: str, model: str, response: str) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO prompts (key, name, model, response, size, created, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, name, model, response, len(response.encode("utf-8")), now, now)
+            )
+            self._evict(conn, now)
+
+    def discard(self, key: str) -> None:
+        """Drop one entry, e.g. a completion the caller found unusable"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM prompts WHERE key = ?", (key,))
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM prompts WHERE created < ?", (now - self.ttl,))
+        total = 0
+        stale = []
+        for key, size in conn.execute("SELECT key, size FROM prompts ORDER BY last_used DESC"):
+            total += size
+            if total > self.max_bytes:
+                stale.append((key,))
+        if stale:
+            conn.executemany("DELETE FROM prompts WHERE key = ?", stale)
+            logger.info(f"Evicted {len(stale)} cached prompts over {self.max_bytes} bytes")
+
+    def clear(self, name: Optional[str] = None) -> None:
+        with self._connect() as conn:
+            if name is None:
+                conn.execute("DELETE FROM prompts")
+            else:
+                conn.execute("DELETE FROM prompts WHERE name = ?", (name,))
+
+    def entries(self) -> List[dict]:
+        """Per call name: stored entries, bytes and hits served, for the cache inspector"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT name, COUNT(*), SUM(size), SUM(hits), MAX(last_used) FROM prompts "
+                "WHERE created >= ? GROUP BY name ORDER BY name",
+                (time.time() - self.ttl,)
+            ).fetchall()
+        return [{"function": name, "enabled": self.enabled(name), "entries": count, "bytes": size,
+                 "hits": hits, "last_used": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(last_used))}
+                for name, count, size, hits, last_used in rows]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0}
@@ -0,0 +1,146 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.retrievers import BaseRetriever, QueryFusionRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle
+
+from embedding_cache import embed_texts, normalize_text, text_hash
+from library import tokenize
+from transcript_cache import CACHE_ROOT
+
+logger = logging.getLogger(__name__)
+
+EXPANSION_MODES = ("llm", "keywords", "none")
+DEFAULT_EXPANSION = os.environ.get("RAG_QUERY_EXPANSION", "llm")
+MAX_RETRIEVAL_WORKERS = 8
+
+
+class QueryExpansionCache:
+    """SQLite store of generated sub-queries keyed by (scope, mode, count, normalized question)"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(CACHE_ROOT, "query_expansions.sqlite")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS expansions ("
+                " key TEXT PRIMARY KEY, queries TEXT NOT NULL, created REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    @staticmethod
+    def key(scope: str, mode: str, num_queries: int, question: str) -> str:
+        return f"{scope}|{mode}|{num_queries}|{text_hash(normalize_text(question).lower())}"
+
+    def get(self, key: str) -> Optional[List[str]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT queries FROM expansions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, queries: List[str]) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO expansions (key, queries, created) VALUES (?, ?, ?)",
+                (key, json.dumps(queries), time.time())
+            )
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0}
+
+
+expansion_cache = QueryExpansionCache()
+
+
+def keyword_queries(question: str, count: int,
+                    idf: Optional[Callable[[str], float]] = None) -> List[str]:
+    """Cheap lexical variants of a question, rarest terms first, without an LLM call"""
+    terms = list(dict.fromkeys(tokenize(question)))
+    if not terms or count <= 0:
+        return []
+    # Without corpus statistics, longer words are a fair proxy for rarer ones
+    weight = idf or len
+    ranked = sorted(terms, key=weight, reverse=True)
+    variants = [" ".join(terms), " ".join(ranked[:max(1, len(ranked) // 2)])]
+    # Dropping one common term at a time lets BM25 match passages missing it
+    variants += [" ".join(t for t in terms if t != common) for common in reversed(ranked)]
+    original = normalize_text(question).lower()
+    queries = []
+    for variant in variants:
+        if variant and variant != original and variant not in queries:
+            queries.append(variant)
+    return queries[:count]
+
+
+class ExpandingFusionRetriever(QueryFusionRetriever):
+    """QueryFusionRetriever with cached or keyword-based expansion and parallel retrieval.
+
+    Generated sub-queries are cached per (scope, question), where scope is
+    normally the video id(s) being searched, so repeated questions skip the
+    LLM round-trip. With ``expansion="keywords"`` no LLM is called at all.
+    All queries are embedded in one batched, cached request when
+    ``embed_model`` is given, and every (query, retriever) pair then runs in
+    a thread pool.
+    """
+
+    def __init__(self, retrievers: List[BaseRetriever], scope: str = "",
+                 expansion: str = DEFAULT_EXPANSION,
+                 embed_model: Optional[BaseEmbedding] = None,
+                 idf: Optional[Callable[[str], float]] = None,
+                 cache: QueryExpansionCache = expansion_cache,
+                 max_workers: int = MAX_RETRIEVAL_WORKERS, **kwargs):
+        if expansion not in EXPANSION_MODES:
+            raise ValueError(f"Unknown query expansion mode: {expansion}")
+        kwargs["use_async"] = False
+        super().__init__(retrievers, **kwargs)
+        self.scope = scope
+        self.expansion = expansion
+        self.embed_model = embed_model
+        self.idf = idf
+        self.cache = cache
+        self.max_workers = max_workers
+
+    def _get_queries(self, original_query: str) -> List[QueryBundle]:
+        count = self.num_queries - 1
+        if self.expansion == "none" or count <= 0:
+            return []
+        key = self.cache.key(self.scope, self.expansion, count, original_query)
+        queries = self.cache.get(key)
+        if queries is None:
+            if self.expansion == "keywords":
+                queries = keyword_queries(original_query, count, self.idf)
+            else:
+                queries = [q.query_str for q in super()._get_queries(original_query)]
+            self.cache.put(key, queries)
+        return [QueryBundle(q) for q in queries]
+
+    def _embed_queries(self, queries: Sequence[QueryBundle]) -> None:
+        pending = [q for q in queries if q.embedding is None]
+        if self.embed_model is None or not pending:
+            return
+        # Query and document embeddings are the same for OpenAI's models and LocalEmbedding
+        for query, embedding in zip(pending, embed_texts(self.embed_model, [q.query_str for q in pending])):
+            query.embedding = embedding
+
+    def _run_sync_queries(self, queries: List[QueryBundle]) -> Dict[Tuple[str, int], List[NodeWithScore]]:
+        self._embed_queries(queries)
+        tasks = [(query, i, retriever) for query in queries for i, retriever in enumerate(self._retrievers)]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(tasks))) as executor:
+            results = executor.map(lambda task: task[2].retrieve(task[0]), tasks)
+            return {(query.query_str, i): nodes for (query, i, _), nodes in zip(tasks, results)}
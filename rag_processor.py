@@ -1,41 +1,88 @@
 import yt_dlp
 import os
+import hashlib
+import json
+import shutil
 import tempfile
 import subprocess
-from openai import OpenAI
-from concurrent.futures import ThreadPoolExecutor
 import logging
-from typing import List, Optional
-from llama_index.core import Document, VectorStoreIndex
+import functools
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Optional
+from llama_index.core import Document, Settings, VectorStoreIndex, load_index_from_storage
 from llama_index.core.node_parser import SentenceSplitter
 from llama_index.core.ingestion import IngestionPipeline
 from llama_index.core.retrievers import AutoMergingRetriever
 from llama_index.retrievers.bm25 import BM25Retriever
 from llama_index.core.storage import StorageContext
-from llama_index.embeddings.openai import OpenAIEmbedding
+from llama_index.core.schema import MetadataMode
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from clients import get_embed_model, get_gateway
+from audio_processing import MAX_CHUNK_OVERLAP_SECONDS, ChunkInfo, PreprocessReport, probe_audio, segment_audio
+from video_pipeline import PipelineCancelled, info_video_id, run_pipeline
+from transcription_scheduler import whisper_scheduler
+from transcription_backends import TRANSCRIPTION_BACKEND, TranscriptionBackend, get_backend
+from embedding_cache import CachedEmbedding, embed_texts, model_key
+from embedding_backends import EMBED_BACKEND
+from library import LIBRARY_ROOT, VideoLibrary, make_video_nodes
+from vector_store import NumpyVectorStore
+from transcript_cache import CACHE_ROOT, TranscriptCache, file_sha256, new_entry
+from tracing import current_span, propagate, tracer
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-if not client.api_key:
+gateway = get_gateway()
+# Local transcription and embedding backends can ingest without a key
+if not gateway.api_key and "openai" in (EMBED_BACKEND, TRANSCRIPTION_BACKEND):
     raise ValueError("OPENAI_API_KEY environment variable not set")
 
+transcript_cache = TranscriptCache()
+# Downmix, resample and trim silence before upload (see audio_processing.segment_audio)
+PREPROCESS_AUDIO = os.environ.get("RAG_PREPROCESS_AUDIO", "0") == "1"
+_video_id_memo = {}
+
+CHUNK_SIZE = 256
+CHUNK_OVERLAP = 32
+# Stored vector precision ("float16", "int8" or "float32") and optional Matryoshka truncation
+VECTOR_DTYPE = os.environ.get("RAG_VECTOR_DTYPE", "float16")
+VECTOR_DIMENSIONS = int(os.environ["RAG_VECTOR_DIMENSIONS"]) if os.environ.get("RAG_VECTOR_DIMENSIONS") else None
+INDEX_ROOT = os.path.join(CACHE_ROOT, "indexes")
+# Written next to each persisted index: which embedding backend and model built it
+INDEX_EMBEDDING_FNAME = "embedding.json"
+os.makedirs(INDEX_ROOT, exist_ok=True)
+# Indexes already loaded in this process, shared by every Streamlit session
+_loaded_pipelines = OrderedDict()
+# Sessions, job threads and benchmark pools all read and evict it
+_loaded_pipelines_lock = threading.Lock()
+MAX_LOADED_PIPELINES = 8
+_library = None
+
 def get_audio_duration(input_file: str) -> float:
     try:
-        result = subprocess.run(
-            ["ffprobe", "-v", "error", "-show_entries", "format=duration",
-             "-of", "default=noprint_wrappers=1:nokey=1", input_file],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            check=True
-        )
-        return float(result.stdout.strip())
+        with tracer.span("get_audio_duration"):
+            return probe_audio(input_file).duration
     except subprocess.CalledProcessError as e:
         logger.error(f"Error getting audio duration: {e.stderr}")
         raise
 
+def resolve_video_id(video_url: str) -> Optional[str]:
+    """Resolve a URL to its canonical "<extractor>:<id>" without downloading"""
+    if video_url in _video_id_memo:
+        return _video_id_memo[video_url]
+    try:
+        with tracer.span("resolve_video_id"), yt_dlp.YoutubeDL({'quiet': True, 'skip_download': True}) as ydl:
+            info = ydl.extract_info(video_url, download=False, process=False)
+        video_id = info_video_id(info)
+    except Exception as e:
+        logger.warning(f"Could not resolve video ID for {video_url}: {e}")
+        return None
+    _video_id_memo[video_url] = video_id
+    return video_id
+
 def extract_audio(video_url: str) -> Optional[str]:
     with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as temp_file:
         temp_path = temp_file.name
@@ -49,8 +96,9 @@ def extract_audio(video_url: str) -> Optional[str]:
         }],
     }
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        with tracer.span("download") as span, yt_dlp.YoutubeDL(ydl_opts) as ydl:
             ydl.download([video_url])
+            span.set(bytes=os.path.getsize(temp_path))
         return temp_path
     except Exception as e:
         logger.error(f"Error extracting audio: {e}")
@@ -59,124 +107,539 @@ def extract_audio(video_url: str) -> Optional[str]:
         return None
 
 def split_audio_with_overlap(input_file: str, output_dir: str) -> List[str]:
+    return [chunk.path for chunk in split_audio_chunks(input_file, output_dir)]
+
+def split_audio_chunks(input_file: str, output_dir: str, **kwargs) -> List[ChunkInfo]:
     try:
-        duration = get_audio_duration(input_file)
+        with tracer.span("get_audio_duration"):
+            info = probe_audio(input_file)
     except Exception as e:
         logger.error(f"Failed to get audio duration: {e}")
         return []
-    
-    chunks = []
-    start = 0.0
-    index = 0
-    os.makedirs(output_dir, exist_ok=True)
-    
-    while start < duration:
-        chunk_path = os.path.join(output_dir, f"chunk_{index:03d}.mp3")
-        ffmpeg_cmd = [
-            "ffmpeg",
-            "-ss", str(start),
-            "-i", input_file,
-            "-t", "600",
-            "-c:a", "libmp3lame",
-            "-y",
-            chunk_path
-        ]
-        try:
-            subprocess.run(ffmpeg_cmd, check=True, capture_output=True)
-            chunks.append(chunk_path)
-            index += 1
-            start += 590  # 600s chunk with 10s overlap
-        except subprocess.CalledProcessError as e:
-            logger.error(f"Error creating chunk {index}: {e.stderr.decode()}")
-            break
+    with tracer.span("split", audio_seconds=info.duration) as span:
+        chunks = segment_audio(input_file, output_dir, info=info, **kwargs)
+        span.set(chunks=len(chunks), bytes=sum(chunk.size for chunk in chunks))
     return chunks
 
-def transcribe_chunk(chunk_file: str) -> str:
-    for attempt in range(3):
+def transcribe_chunk(chunk_file: str, backend: Optional[str] = None) -> str:
+    transcriber = get_backend(backend)
+    with tracer.span("transcribe_chunk", backend=transcriber.name):
+        return " ".join(segment["text"].strip() for segment in transcriber.transcribe(chunk_file))
+
+def transcribe_chunk_segments(chunk: ChunkInfo, backend: Optional[str] = None) -> List[dict]:
+    """Transcribe a chunk and return its segments in source-audio time"""
+    transcriber = get_backend(backend)
+    with tracer.span("transcribe_chunk", backend=transcriber.name, bytes=chunk.size,
+                     audio_seconds=chunk.duration) as span:
+        segments = transcriber.transcribe(chunk.path)
+        span.set(segments=len(segments))
+    return [
+        {
+            "start": round(chunk.to_absolute(segment["start"]), 2),
+            "end": round(chunk.to_absolute(segment["end"]), 2),
+            "text": segment["text"].strip()
+        }
+        for segment in segments
+    ]
+
+def _overlap_cutoff(prev: ChunkInfo, nxt: ChunkInfo) -> float:
+    # Split the shared region down the middle; chunks cut at silences share none
+    if nxt.start < prev.end:
+        return (nxt.start + min(prev.end, nxt.end)) / 2
+    return nxt.start
+
+def combine_transcripts(chunks: List[ChunkInfo], chunk_segments: List[List[dict]]) -> List[dict]:
+    """Stitch per-chunk segments by absolute time.
+
+    A chunk contributes the segments that start before the middle of its
+    overlap with the next chunk; the next chunk then resumes with the first
+    segment that is mostly past what has already been kept. Every segment is
+    looked at once, so merging is linear in transcript length.
+    """
+    merger = TranscriptMerger()
+    merged = []
+    for chunk, segments in zip(chunks, chunk_segments):
+        merged += merger.add(chunk, segments)
+    return merged + merger.finish()
+
+class TranscriptMerger:
+    """combine_transcripts for chunks that arrive one at a time, in any order.
+
+    A chunk's segments are released once every earlier chunk and the next
+    one are in, since the next chunk's start decides the cutoff; ``finish``
+    releases the last chunk. With ``max_overlap`` (how far any chunk can
+    start before the previous one ends) a chunk's segments up to that far
+    from its end are released as soon as the chunk itself is in. The output
+    is the same as combine_transcripts either way.
+    """
+
+    def __init__(self, max_overlap: float = float("inf")):
+        self.max_overlap = max_overlap
+        self._pending = {}
+        self._next = 0
+        self._position = 0
+        self.kept_until = float("-inf")
+
+    def add(self, chunk: ChunkInfo, segments: List[dict]) -> List[dict]:
+        self._pending[chunk.index] = (chunk, segments)
+        return self._release(final=False)
+
+    def finish(self) -> List[dict]:
+        return self._release(final=True)
+
+    def _release(self, final: bool) -> List[dict]:
+        merged = []
+        while self._next in self._pending:
+            chunk, segments = self._pending[self._next]
+            nxt = self._pending.get(self._next + 1)
+            if not nxt and not final:
+                # Whatever the next chunk is, its cutoff is no earlier than this
+                merged += self._take(segments, chunk.end - self.max_overlap)
+                break
+            merged += self._take(segments, _overlap_cutoff(chunk, nxt[0]) if nxt else float("inf"))
+            del self._pending[self._next]
+            self._next += 1
+            self._position = 0
+        return merged
+
+    def _take(self, segments: List[dict], upper: float) -> List[dict]:
+        kept = []
+        while self._position < len(segments) and segments[self._position]["start"] < upper:
+            segment = segments[self._position]
+            self._position += 1
+            midpoint = (segment["start"] + segment["end"]) / 2
+            if midpoint >= self.kept_until and segment["text"]:
+                kept.append(segment)
+                self.kept_until = segment["end"]
+        return kept
+
+def segments_to_text(segments: List[dict]) -> str:
+    return " ".join(segment["text"] for segment in segments)
+
+def rag_index_key(transcript_text: str) -> str:
+    """Key an index by its transcript and every setting that changes its nodes or vectors"""
+    settings = {
+        "transcript_sha256": hashlib.sha256(transcript_text.encode("utf-8")).hexdigest(),
+        "embed_model": model_key(get_embed_model()),
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "vector_dtype": VECTOR_DTYPE,
+        "vector_dimensions": VECTOR_DIMENSIONS,
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()
+
+def _make_retrievers(index: VectorStoreIndex, bm25_retriever: BM25Retriever) -> dict:
+    auto_merging_retriever = AutoMergingRetriever(
+        vector_retriever=index.as_retriever(similarity_top_k=3),
+        storage_context=index.storage_context  # No chunk_size needed
+    )
+    return {
+        "index": index,
+        "retrievers": {
+            "bm25": bm25_retriever,
+            "auto_merging": auto_merging_retriever
+        }
+    }
+
+def _index_embedding(embed_model: BaseEmbedding) -> dict:
+    return {"backend": EMBED_BACKEND, "embed_model": model_key(embed_model)}
+
+def load_rag_pipeline(persist_dir: str) -> dict:
+    embed_model = get_embed_model()
+    with open(os.path.join(persist_dir, INDEX_EMBEDDING_FNAME), "r", encoding="utf-8") as f:
+        built_with = json.load(f)
+    if built_with["embed_model"] != model_key(embed_model):
+        raise ValueError(f"index was embedded with {built_with['embed_model']}, "
+                         f"queries would use {model_key(embed_model)}")
+    storage_context = StorageContext.from_defaults(
+        persist_dir=persist_dir,
+        vector_store=NumpyVectorStore.from_persist_dir(persist_dir)
+    )
+    index = load_index_from_storage(storage_context, embed_model=embed_model)
+    bm25_retriever = BM25Retriever.from_persist_dir(os.path.join(persist_dir, "bm25"))
+    return _make_retrievers(index, bm25_retriever)
+
+def _persist_rag_pipeline(index: VectorStoreIndex, bm25_retriever: BM25Retriever, persist_dir: str,
+                          embed_model: BaseEmbedding) -> None:
+    # Write next to the final location and rename, so a crash never leaves a half index
+    tmp_dir = tempfile.mkdtemp(dir=INDEX_ROOT, prefix=".tmp-")
+    index.storage_context.persist(persist_dir=tmp_dir)
+    bm25_retriever.persist(os.path.join(tmp_dir, "bm25"))
+    with open(os.path.join(tmp_dir, INDEX_EMBEDDING_FNAME), "w", encoding="utf-8") as f:
+        json.dump(_index_embedding(embed_model), f)
+    try:
+        os.replace(tmp_dir, persist_dir)
+    except OSError:
+        # Another process persisted the same index first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def _remember_pipeline(key: str, pipeline: dict) -> None:
+    with _loaded_pipelines_lock:
+        _loaded_pipelines[key] = pipeline
+        while len(_loaded_pipelines) > MAX_LOADED_PIPELINES:
+            _loaded_pipelines.popitem(last=False)
+
+def _loaded_pipeline(key: str) -> Optional[dict]:
+    with _loaded_pipelines_lock:
+        pipeline = _loaded_pipelines.get(key)
+        if pipeline is not None:
+            _loaded_pipelines.move_to_end(key)
+        return pipeline
+
+@tracer.traced("build_rag_pipeline")
+def build_rag_pipeline(transcript_text: str, persist: bool = True):
+    key = rag_index_key(transcript_text)
+    pipeline = _loaded_pipeline(key)
+    if pipeline is not None:
+        current_span().set(source="memory")
+        return pipeline
+    persist_dir = os.path.join(INDEX_ROOT, key)
+    if persist and os.path.isdir(persist_dir):
         try:
-            with open(chunk_file, "rb") as audio_file:
-                return client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    response_format="text"
-                )
+            pipeline = load_rag_pipeline(persist_dir)
+            _remember_pipeline(key, pipeline)
+            current_span().set(source="disk")
+            logger.info(f"Loaded persisted RAG index {key[:12]}")
+            return pipeline
         except Exception as e:
-            if attempt == 2:
-                logger.error(f"Failed to transcribe {chunk_file}: {e}")
-                return ""
-            logger.warning(f"Retrying {chunk_file} (attempt {attempt + 1})")
-
-def combine_transcripts(transcripts: List[str]) -> str:
-    final = transcripts[0]
-    for next_transcript in transcripts[1:]:
-        overlap_point = find_overlap(final, next_transcript)
-        final = final[:-overlap_point] + next_transcript if overlap_point else final + " " + next_transcript
-    return final
-
-def find_overlap(a: str, b: str) -> int:
-    a_words = a.split()
-    b_words = b.split()
-    max_possible = min(len(a_words), len(b_words))
-    for overlap in range(min(50, max_possible), 0, -1):
-        if a_words[-overlap:] == b_words[:overlap]:
-            return overlap
-    return 0
-
-def build_rag_pipeline(transcript_text: str):
+            logger.warning(f"Rebuilding unreadable RAG index {key[:12]}: {e}")
+            shutil.rmtree(persist_dir, ignore_errors=True)
+
     doc = Document(text=transcript_text)
-    embed_model = OpenAIEmbedding(model="text-embedding-3-large")
+    embed_model = get_embed_model()
     
     # Configure settings for consistent parameters
-    from llama_index.core import Settings
     Settings.embed_model = embed_model
     Settings.node_parser = SentenceSplitter(
-        chunk_size=256, 
-        chunk_overlap=32
+        chunk_size=CHUNK_SIZE, 
+        chunk_overlap=CHUNK_OVERLAP
     )
     
     # Create pipeline with proper configuration
     pipeline = IngestionPipeline(
         transformations=[
             Settings.node_parser,
-            embed_model
+            CachedEmbedding(embed_model=embed_model)
         ]
     )
     nodes = pipeline.run(documents=[doc])
+    current_span().set(source="built", nodes=len(nodes), chars=len(transcript_text))
     
     # Create index with both vector and BM25 stores
-    index = VectorStoreIndex(nodes)
+    storage_context = StorageContext.from_defaults(
+        vector_store=NumpyVectorStore(dtype=VECTOR_DTYPE, dimensions=VECTOR_DIMENSIONS)
+    )
+    index = VectorStoreIndex(nodes, storage_context=storage_context)
     
     # Create retrievers
     bm25_retriever = BM25Retriever.from_defaults(
         nodes=nodes, 
         similarity_top_k=2
     )
+
+    if persist:
+        with tracer.span("persist_index"):
+            _persist_rag_pipeline(index, bm25_retriever, persist_dir, embed_model)
     
-    # Correct AutoMergingRetriever initialization
-    auto_merging_retriever = AutoMergingRetriever(
-        vector_retriever=index.as_retriever(similarity_top_k=3),
-        storage_context=index.storage_context  # No chunk_size needed
-    )
-    
+    result = _make_retrievers(index, bm25_retriever)
+    _remember_pipeline(key, result)
+    return result
+
+def transcribe_video(video_url: str, preprocess: bool = PREPROCESS_AUDIO,
+                     progress: Optional[Callable[[str, int, int], None]] = None,
+                     backend: Optional[str] = None) -> dict:
+    url_key = f"url:{video_url.strip()}"
+    cached = transcript_cache.get(url_key, count_miss=False)
+    if cached:
+        logger.info(f"Transcript cache hit for {video_url}")
+        current_span().set(transcript_cache="url")
+        return cached
+
+    video_id = resolve_video_id(video_url)
+    video_key = f"video:{video_id}" if video_id else None
+    cached = transcript_cache.get(video_key, count_miss=False)
+    if cached:
+        transcript_cache.add_aliases(f"audio:{cached['audio_sha256']}", [url_key])
+        current_span().set(transcript_cache="video")
+        return cached
+
+    transcriber = get_backend(backend)
+
+    def cached_by_audio(audio_sha256: str) -> bool:
+        return transcript_cache.get(f"audio:{audio_sha256}") is not None
+
+    live, live_lock = {}, threading.Lock()
+
+    def index_chunk(info: dict, chunk: ChunkInfo, segments: List[dict]) -> None:
+        # The pipeline's yt-dlp info names the video, so the indexer starts with the first chunk
+        with live_lock:
+            if "indexer" not in live:
+                live["indexer"] = LiveIndexer(video_id or info_video_id(info), info.get("title"),
+                                              info.get("duration"))
+        live["indexer"].add(chunk, segments)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        try:
+            result = run_pipeline(
+                video_url, work_dir,
+                max_workers=transcriber.max_concurrency,
+                transcribe=functools.partial(transcribe_chunk_segments, backend=transcriber.name),
+                should_cancel=cached_by_audio,
+                preprocess=preprocess,
+                on_progress=progress,
+                on_chunk=index_chunk
+            )
+        except PipelineCancelled as e:
+            # Same audio was already transcribed under another URL or video ID
+            audio_key = f"audio:{e.audio_sha256}"
+            transcript_cache.add_aliases(audio_key, [video_key, url_key])
+            current_span().set(transcript_cache="audio")
+            return transcript_cache.get(audio_key)
+
+    video_id = video_id or result.video_id
+    video_key = f"video:{video_id}"
+    audio_sha256 = result.audio_sha256
+    audio_key = f"audio:{audio_sha256}"
+    with tracer.span("combine_transcripts", chunks=len(result.chunks)) as span:
+        segments = combine_transcripts(result.chunks, result.transcripts)
+        final_transcript = segments_to_text(segments)
+        span.set(segments=len(segments), chars=len(final_transcript))
+
+    entry = new_entry(video_id, audio_sha256, final_transcript, result.transcripts, segments)
+    entry["preprocess_report"] = result.preprocess_report
+    entry["title"] = result.title
+    entry["duration"] = result.duration
+    entry["transcription"] = transcriber.describe()
+    transcript_cache.put(audio_key, entry, aliases=[video_key, url_key])
+    logger.info(f"Transcript cache stats: {transcript_cache.stats()}")
+    _log_transcriber_stats(transcriber)
+    return entry
+
+def _log_transcriber_stats(transcriber: TranscriptionBackend) -> None:
+    if transcriber.name == "openai":
+        logger.info(f"Whisper scheduler stats: {whisper_scheduler.summary()}")
+
+def transcribe_file(path: str, preprocess: bool = PREPROCESS_AUDIO,
+                    progress: Optional[Callable[[str, int, int], None]] = None,
+                    backend: Optional[str] = None) -> dict:
+    """Transcribe a local audio or video file, cached by its content hash"""
+    progress = progress or (lambda stage, done, total: None)
+    path = os.path.abspath(path)
+    with tracer.span("hash_file", bytes=os.path.getsize(path)):
+        audio_sha256 = file_sha256(path)
+    audio_key = f"audio:{audio_sha256}"
+    cached = transcript_cache.get(audio_key)
+    if cached:
+        current_span().set(transcript_cache="audio")
+        return cached
+
+    transcriber = get_backend(backend)
+    with tracer.span("get_audio_duration"):
+        info = probe_audio(path)
+    with tempfile.TemporaryDirectory() as work_dir:
+        progress("split", 0, 1)
+        with tracer.span("split", audio_seconds=info.duration) as span:
+            chunks = segment_audio(path, work_dir, info=info, preprocess=preprocess)
+            span.set(chunks=len(chunks), bytes=sum(chunk.size for chunk in chunks))
+        # segment_audio stops at the first ffmpeg failure, leaving the tail uncovered
+        if not chunks or chunks[-1].end < info.duration - 1:
+            raise RuntimeError(f"Could not split {path} into chunks")
+        progress("split", len(chunks), len(chunks))
+
+        transcripts = [None] * len(chunks)
+        indexer = LiveIndexer(f"file:{audio_sha256[:16]}", os.path.splitext(os.path.basename(path))[0],
+                              info.duration)
+        with ThreadPoolExecutor(max_workers=transcriber.max_concurrency) as executor:
+            futures = {executor.submit(propagate(transcribe_chunk_segments), chunk, transcriber.name): i
+                       for i, chunk in enumerate(chunks)}
+            for done, future in enumerate(as_completed(futures), 1):
+                transcripts[futures[future]] = future.result()
+                indexer.add(chunks[futures[future]], transcripts[futures[future]])
+                progress("transcribe", done, len(chunks))
+
+    with tracer.span("combine_transcripts", chunks=len(chunks)) as span:
+        segments = combine_transcripts(chunks, transcripts)
+        final_transcript = segments_to_text(segments)
+        span.set(segments=len(segments), chars=len(final_transcript))
+
+    entry = new_entry(indexer.video_id, audio_sha256, final_transcript, transcripts, segments)
+    entry["preprocess_report"] = PreprocessReport.from_chunks(info, chunks).as_dict() if preprocess else None
+    entry["title"] = indexer.title
+    entry["duration"] = info.duration
+    entry["transcription"] = transcriber.describe()
+    transcript_cache.put(audio_key, entry)
+    _log_transcriber_stats(transcriber)
+    return entry
+
+def library_root() -> str:
+    """One library per embedding model, since vectors from different models can't be mixed"""
+    if EMBED_BACKEND == "openai":
+        return LIBRARY_ROOT
+    slug = re.sub(r"[^a-z0-9]+", "-", model_key(get_embed_model()).lower()).strip("-")
+    return f"{LIBRARY_ROOT}-{slug}"
+
+def get_library() -> VideoLibrary:
+    global _library
+    if _library is None:
+        _library = VideoLibrary(root=library_root(), dtype=VECTOR_DTYPE, dimensions=VECTOR_DIMENSIONS)
+    return _library
+
+def _after(segments: List[dict], covered: float) -> List[dict]:
+    # Merged segments are kept by midpoint, so this resumes exactly after the last one appended
+    return [segment for segment in segments if (segment["start"] + segment["end"]) / 2 >= covered]
+
+def _embedded_nodes(video_id: str, title: Optional[str], transcript: str, segments: List[dict]) -> list:
+    embed_model = get_embed_model()
+    nodes = make_video_nodes(video_id, title, transcript, segments, CHUNK_SIZE, CHUNK_OVERLAP)
+    # Same splitter settings as build_rag_pipeline, so whole transcripts are embedding cache hits
+    embeddings = embed_texts(embed_model, [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes])
+    for node, embedding in zip(nodes, embeddings):
+        node.embedding = embedding
+    return nodes
+
+@tracer.traced("add_to_library")
+def add_to_library(entry: dict) -> None:
+    """Append a transcribed video to the library, finishing one that was indexed live, unless it is complete"""
+    library = get_library()
+    video_id = entry.get("video_id") or f"audio:{entry['audio_sha256']}"
+    covered, complete = library.coverage(video_id)
+    if complete:
+        return
+    segments = entry.get("segments", [])
+    if library.has_video(video_id):
+        current_span().set(resumed_from=covered)
+        segments = _after(segments, covered)
+        if not segments:
+            library.mark_complete(video_id, entry.get("duration"))
+            return
+    nodes = _embedded_nodes(video_id, entry.get("title"), entry["transcript"], segments)
+    library.add_video(video_id, entry.get("title"), nodes, model_key(get_embed_model()),
+                      duration=entry.get("duration"), complete=True)
+
+class LiveIndexer:
+    """Appends a video to the library chunk by chunk while it is still being transcribed.
+
+    Chunk transcripts go through a TranscriptMerger, and whatever it releases
+    is split, embedded and added to the library as a partial video, so it can
+    be searched long before the whole video is done. Most of a chunk is
+    released as soon as it is transcribed, the few seconds it may share with
+    the next chunk once that one is in; add_to_library appends the rest and
+    marks the video complete. Only merging holds the lock: batches are
+    embedded concurrently and appended in the order they were merged.
+    Segments a previous, interrupted run already appended are skipped.
+    Indexing errors are logged and stop live indexing without failing the
+    transcription.
+    """
+
+    def __init__(self, video_id: str, title: Optional[str], duration: Optional[float]):
+        self.video_id = video_id
+        self.title = title
+        self.duration = duration
+        self.library = get_library()
+        self.covered, complete = self.library.coverage(video_id)
+        self.enabled = not complete
+        self.merger = TranscriptMerger(max_overlap=MAX_CHUNK_OVERLAP_SECONDS)
+        self._lock = threading.Lock()
+        self._appended = threading.Condition()
+        self._merged_batches = 0
+        self._appended_batches = 0
+
+    def add(self, chunk: ChunkInfo, segments: List[dict]) -> None:
+        with self._lock:
+            if not self.enabled:
+                return
+            merged = _after(self.merger.add(chunk, segments), self.covered)
+            if not merged:
+                return
+            self.covered = merged[-1]["end"]
+            sequence = self._merged_batches
+            self._merged_batches += 1
+
+        with tracer.span("live_index", chunk=chunk.index, segments=len(merged)) as span:
+            nodes, error = None, None
+            try:
+                nodes = _embedded_nodes(self.video_id, self.title, "", merged)
+                span.set(nodes=len(nodes))
+            except Exception as e:
+                error = e
+            with self._appended:
+                self._appended.wait_for(lambda: self._appended_batches == sequence)
+                try:
+                    # After a failed batch, appending later ones would leave a gap
+                    if error is None and self.enabled:
+                        self.library.add_video(self.video_id, self.title, nodes, model_key(get_embed_model()),
+                                               duration=self.duration, covered=merged[-1]["end"],
+                                               complete=False)
+                except Exception as e:
+                    error = e
+                finally:
+                    if error is not None:
+                        self.enabled = False
+                    # Later batches wait for this one whether or not it was appended
+                    self._appended_batches += 1
+                    self._appended.notify_all()
+        if error is not None:
+            logger.error(f"Live indexing of {self.video_id} stopped: {error}")
+        elif self.enabled:
+            logger.info(f"{self.video_id} searchable up to {merged[-1]['end']:.0f}s")
+
+def library_retrievers(video_ids: Optional[List[str]] = None) -> dict:
+    library = get_library()
+    embed_model = get_embed_model()
     return {
-        "index": index,
-        "retrievers": {
-            "bm25": bm25_retriever,
-            "auto_merging": auto_merging_retriever
-        }
+        "bm25": library.retriever("bm25", video_ids, similarity_top_k=2),
+        "vector": library.retriever("vector", video_ids, similarity_top_k=3, embed_model=embed_model)
     }
 
-def process_video(video_url: str) -> dict:
-    with tempfile.TemporaryDirectory() as chunk_dir:
-        audio_path = extract_audio(video_url)
-        chunks = split_audio_with_overlap(audio_path, chunk_dir)
-        with ThreadPoolExecutor() as executor:
-            transcripts = list(executor.map(transcribe_chunk, chunks))
-        final_transcript = combine_transcripts([t for t in transcripts if t.strip()])
-        
+def processed_entry(source: str) -> Optional[dict]:
+    """The cached transcript for a URL or local file if it is also indexed and in the library"""
+    if os.path.isfile(source):
+        entry = transcript_cache.get(f"audio:{file_sha256(source)}", count_miss=False)
+    else:
+        entry = transcript_cache.get(f"url:{source.strip()}", count_miss=False)
+    if not entry:
+        return None
+    video_id = entry.get("video_id") or f"audio:{entry['audio_sha256']}"
+    indexed = os.path.isdir(os.path.join(INDEX_ROOT, rag_index_key(entry["transcript"])))
+    return entry if indexed and get_library().coverage(video_id)[1] else None
+
+@tracer.traced("process_video")
+def process_video(video_url: str, preprocess: bool = PREPROCESS_AUDIO,
+                  progress: Optional[Callable[[str, int, int], None]] = None,
+                  backend: Optional[str] = None) -> dict:
+    """Transcribe and index a video URL or local file; ``progress(stage, done, total)`` reports each stage.
+
+    ``backend`` picks the transcription backend (see transcription_backends);
+    a cached transcript is reused whichever backend produced it.
+    """
+    progress = progress or (lambda stage, done, total: None)
+    current_span().set(url=video_url, preprocess=preprocess, backend=backend or get_backend().name)
+    if os.path.isfile(video_url):
+        entry = transcribe_file(video_url, preprocess=preprocess, progress=progress, backend=backend)
+    else:
+        entry = transcribe_video(video_url, preprocess=preprocess, progress=progress, backend=backend)
+    final_transcript = entry["transcript"]
+    current_span().set(video_id=entry["video_id"], chars=len(final_transcript))
+
+    progress("embed", 0, 1)
     rag_pipeline = build_rag_pipeline(final_transcript)
+    progress("embed", 1, 1)
+    progress("index", 0, 1)
+    try:
+        add_to_library(entry)
+    except Exception as e:
+        logger.error(f"Could not add {entry.get('video_id')} to the library: {e}")
+    progress("index", 1, 1)
     return {
         "transcript": final_transcript,
+        "video_id": entry["video_id"],
+        "title": entry.get("title"),
+        "duration": entry.get("duration"),
+        "segments": entry.get("segments", []),
         "index": rag_pipeline["index"],
         "retrievers": rag_pipeline["retrievers"]
-    }
\ No newline at end of file
+    }
+
+if __name__ == "__main__":
+    from ingest import main
+    main()
@@ -0,0 +1,48 @@
+"""Test doubles shared by several test modules; import ``support`` first."""
+import threading
+import time
+from typing import Any, List
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+
+class FakeEmbedding(BaseEmbedding):
+    """Embeds a text as its length, recording requests and how many overlap"""
+
+    delay: float = 0.0
+
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _in_flight: int = PrivateAttr(default=0)
+    _requests: List[List[str]] = PrivateAttr(default_factory=list)
+    _peak: int = PrivateAttr(default=0)
+
+    def __init__(self, model_name: str = "fake", **kwargs):
+        super().__init__(model_name=model_name, embed_batch_size=2048, **kwargs)
+
+    @property
+    def requests(self) -> List[List[str]]:
+        return self._requests
+
+    @property
+    def peak(self) -> int:
+        return self._peak
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            self._requests.append(texts)
+            self._in_flight += 1
+            self._peak = max(self._peak, self._in_flight)
+        time.sleep(self.delay)
+        with self._lock:
+            self._in_flight -= 1
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._get_text_embedding(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
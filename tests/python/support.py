@@ -0,0 +1,21 @@
+"""Shared setup for the Python tests; import it before any app module.
+
+App modules read their cache directory and API key when imported, so this
+points them at a throwaway directory and a dummy key first. Run the suite
+from the repository root with ``python -m unittest discover -s tests/python``
+(as tests/run-python-tests.js does) or ``python -m pytest tests/python``.
+"""
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+CACHE_DIR = tempfile.mkdtemp(prefix="polish_bot_tests_")
+atexit.register(shutil.rmtree, CACHE_DIR, ignore_errors=True)
+os.environ["RAG_CACHE_DIR"] = CACHE_DIR
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
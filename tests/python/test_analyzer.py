@@ -0,0 +1,129 @@
+import copy
+import json
+import threading
+import time
+import unittest
+from unittest import mock
+
+import support  # noqa: F401
+
+import analyzer
+from analyzer import AnalysisError, InboxMessage, analyze_batch, read_messages, validate_analysis
+
+VALID = {
+    "emotion": "Anxious",
+    "formality": " HIGH ",
+    "urgency": "medium",
+    "urgency_score": 4.0,
+    "relationship": "student to professor",
+    "summary": "Asks for an extension.",
+    "keywords": ["extension", "deadline"],
+    "responses": {"positive": "Sure.", "neutral": "Let me check.", "negative": "Sorry, no."},
+}
+
+
+def with_change(path, value):
+    data = copy.deepcopy(VALID)
+    *parents, key = path
+    target = data
+    for parent in parents:
+        target = target[parent]
+    if value is None:
+        del target[key]
+    else:
+        target[key] = value
+    return data
+
+
+class ValidateAnalysisTest(unittest.TestCase):
+    def test_normalizes_enum_case_and_integers(self):
+        analysis = validate_analysis(dict(VALID, extra="ignored"))
+        self.assertEqual((analysis["emotion"], analysis["formality"]), ("anxious", "high"))
+        self.assertEqual(analysis["urgency_score"], 4)
+        self.assertIsInstance(analysis["urgency_score"], int)
+        self.assertNotIn("extra", analysis)
+        self.assertEqual(analysis["keywords"], ["extension", "deadline"])
+
+    def test_rejects_invalid_analyses(self):
+        cases = {
+            "missing key": (("summary",), None),
+            "missing response tone": (("responses", "negative"), None),
+            "unknown emotion": (("emotion",), "bored"),
+            "boolean score": (("urgency_score",), True),
+            "fractional score": (("urgency_score",), 2.5),
+            "score too low": (("urgency_score",), 0),
+            "score too high": (("urgency_score",), 6),
+            "keywords not a list": (("keywords",), "extension"),
+            "keyword not a string": (("keywords",), ["ok", 3]),
+            "responses not an object": (("responses",), "Sure."),
+        }
+        for name, (path, value) in cases.items():
+            with self.subTest(name), self.assertRaises(AnalysisError):
+                validate_analysis(with_change(path, value))
+        with self.assertRaises(AnalysisError):
+            validate_analysis([VALID])
+
+    def test_error_names_the_field(self):
+        with self.assertRaisesRegex(AnalysisError, "responses is missing positive"):
+            validate_analysis(with_change(("responses", "positive"), None))
+
+
+class ReadMessagesTest(unittest.TestCase):
+    def test_jsonl(self):
+        data = "\n".join(json.dumps(record) for record in [
+            {"id": 7, "from": "Ana", "text": "Are we meeting?"},
+            {"id": 8, "message": "   "},
+            {"Body": "Report attached", "sender": "Ben"},
+        ])
+        self.assertEqual(read_messages(data, "inbox.jsonl"), [
+            InboxMessage(row=1, message="Are we meeting?", id="7", sender="Ana"),
+            InboxMessage(row=3, message="Report attached", id=None, sender="Ben"),
+        ])
+
+    def test_json_array(self):
+        data = json.dumps([{"id": 1, "text": "Are we meeting?"}, {"message": ""}, {"body": "Thanks!"}], indent=2)
+        for filename in ("inbox.json", ""):
+            with self.subTest(filename=filename):
+                messages = read_messages("\ufeff" + data, filename)
+                self.assertEqual([(m.row, m.id, m.message) for m in messages],
+                                 [(1, "1", "Are we meeting?"), (3, None, "Thanks!")])
+
+    def test_csv_with_any_message_column(self):
+        for column in ("message", "Text", "body"):
+            with self.subTest(column=column):
+                messages = read_messages(f"\ufeffid,{column}\n1,hello\n2,\n3,bye\n")
+                self.assertEqual([(m.row, m.id, m.message) for m in messages], [(1, "1", "hello"), (3, "3", "bye")])
+
+    def test_plain_text(self):
+        messages = read_messages("\ufefffirst message\n\nsecond, with a comma\n", "inbox.txt")
+        self.assertEqual([(m.row, m.message) for m in messages], [(1, "first message"), (3, "second, with a comma")])
+
+
+class AnalyzeBatchTest(unittest.TestCase):
+    def test_closing_early_cancels_messages_that_have_not_started(self):
+        slow_started, release = threading.Event(), threading.Event()
+        self.addCleanup(release.set)
+        analyzed = []
+
+        def analyze(message, *args, **kwargs):
+            analyzed.append(message)
+            if message == "slow":
+                slow_started.set()
+                release.wait(5)
+            return VALID
+
+        items = [InboxMessage(row=i, message=m) for i, m in enumerate(["fast", "slow", "never"], 1)]
+        with mock.patch.object(analyzer, "analyze", analyze):
+            results = analyze_batch(items, max_workers=1)
+            self.assertEqual(next(results).item.message, "fast")
+            self.assertTrue(slow_started.wait(5))
+            started = time.perf_counter()
+            results.close()
+            self.assertLess(time.perf_counter() - started, 1)
+            release.set()
+            time.sleep(0.05)
+        self.assertEqual(analyzed, ["fast", "slow"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import support
+
+import answer_cache
+from answer_cache import SemanticAnswerCache
+
+
+class SemanticAnswerCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch.object(answer_cache.time, "time", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        path = os.path.join(tempfile.mkdtemp(dir=support.CACHE_DIR), "answers.sqlite")
+        self.cache = SemanticAnswerCache(path, threshold=0.9, ttl=60, max_entries=2)
+
+    def store(self, question, embedding, scope="video-a", model="model"):
+        self.cache.store(scope, model, question, embedding, f"answer to {question}", ["next?"])
+
+    def test_similar_question_hits_above_the_threshold(self):
+        self.store("what is a gradient", [1.0, 0.0, 0.0])
+        hit = self.cache.lookup("video-a", "model", [0.95, 0.2, 0.0])
+        self.assertEqual((hit["answer"], hit["suggestions"]), ("answer to what is a gradient", ["next?"]))
+        self.assertGreaterEqual(hit["similarity"], 0.9)
+        self.assertIsNone(self.cache.lookup("video-a", "model", [0.7, 0.7, 0.0]))
+        self.assertEqual(self.cache.stats(), {"hits": 1, "misses": 1, "hit_ratio": 0.5})
+
+    def test_scope_and_model_must_match(self):
+        self.store("q", [1.0, 0.0])
+        self.assertIsNone(self.cache.lookup("video-b", "model", [1.0, 0.0]))
+        self.assertIsNone(self.cache.lookup("video-a", "other-model", [1.0, 0.0]))
+
+    def test_entries_expire_after_ttl(self):
+        self.store("q", [1.0, 0.0])
+        self.now += 59
+        self.assertIsNotNone(self.cache.lookup("video-a", "model", [1.0, 0.0]))
+        self.now += 2
+        self.assertIsNone(self.cache.lookup("video-a", "model", [1.0, 0.0]))
+
+    def test_least_recently_used_is_evicted(self):
+        self.store("first", [1.0, 0.0, 0.0])
+        self.now += 1
+        self.store("second", [0.0, 1.0, 0.0])
+        self.now += 1
+        self.assertIsNotNone(self.cache.lookup("video-a", "model", [1.0, 0.0, 0.0]))
+        self.now += 1
+        self.store("third", [0.0, 0.0, 1.0])
+        self.assertIsNotNone(self.cache.lookup("video-a", "model", [1.0, 0.0, 0.0]))
+        self.assertIsNone(self.cache.lookup("video-a", "model", [0.0, 1.0, 0.0]))
+        self.assertIsNotNone(self.cache.lookup("video-a", "model", [0.0, 0.0, 1.0]))
+
+    def test_zero_vectors_do_not_divide_by_zero(self):
+        self.store("q", [0.0, 0.0])
+        self.assertIsNone(self.cache.lookup("video-a", "model", [0.0, 0.0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+import support  # noqa: F401
+
+from audio_processing import SILENCE_PADDING, plan_chunks, plan_chunks_at_silence
+
+
+class PlanChunksTest(unittest.TestCase):
+    def test_covers_duration_with_fixed_overlap(self):
+        spans = plan_chunks(1500, chunk_seconds=600, overlap_seconds=10)
+        self.assertEqual(spans, [(0.0, 600), (590.0, 600), (1180.0, 320.0)])
+
+    def test_short_audio_is_one_chunk(self):
+        self.assertEqual(plan_chunks(42, chunk_seconds=600, overlap_seconds=10), [(0.0, 42)])
+
+
+class PlanChunksAtSilenceTest(unittest.TestCase):
+    def assertCoversSpeech(self, plan, duration, silences):
+        kept = [span for _, _, spans in plan for span in spans]
+        for t in [x / 4 for x in range(int(duration * 4))]:
+            if not any(start <= t < end for start, end in silences):
+                self.assertTrue(any(start <= t <= end for start, end in kept), f"{t}s of speech dropped")
+
+    def test_all_silence_plans_nothing(self):
+        self.assertEqual(plan_chunks_at_silence(100, [(0, 100)], chunk_seconds=40), [])
+
+    def test_no_silence_is_one_untrimmed_chunk(self):
+        self.assertEqual(plan_chunks_at_silence(100, [], chunk_seconds=600), [(0.0, 100.0, [(0.0, 100)])])
+
+    def test_packs_speech_spans_and_cuts_inside_silences(self):
+        silences = [(10, 20), (50, 60), (70, 75)]
+        plan = plan_chunks_at_silence(100, silences, chunk_seconds=45, overlap_seconds=5)
+        for start, length, spans in plan:
+            self.assertLessEqual(length, 45)
+            self.assertEqual((start, start + length), (spans[0][0], spans[-1][1]))
+        for (_, _, spans), (next_start, _, _) in zip(plan, plan[1:]):
+            self.assertTrue(any(s <= spans[-1][1] - SILENCE_PADDING and next_start + SILENCE_PADDING <= e
+                                for s, e in silences), "chunk boundary outside a silence")
+        self.assertCoversSpeech(plan, 100, silences)
+
+    def test_silences_are_dropped_but_padded(self):
+        plan = plan_chunks_at_silence(60, [(20, 40)], chunk_seconds=600)
+        self.assertEqual(len(plan), 1)
+        self.assertEqual(plan[0][2], [(0.0, 20 + SILENCE_PADDING), (40 - SILENCE_PADDING, 60)])
+
+    def test_span_longer_than_a_chunk_falls_back_to_overlapping_cuts(self):
+        plan = plan_chunks_at_silence(1500, [(10, 20)], chunk_seconds=600, overlap_seconds=10)
+        long_chunks = [(start, length) for start, length, _ in plan if start >= 20 - SILENCE_PADDING]
+        self.assertTrue(all(length <= 600 for _, length in long_chunks))
+        for (start, length), (next_start, _) in zip(long_chunks, long_chunks[1:]):
+            self.assertAlmostEqual(start + length - next_start, 10)
+        self.assertAlmostEqual(sum(length for _, length in long_chunks) - 10 * (len(long_chunks) - 1),
+                               1500 - (20 - SILENCE_PADDING))
+        self.assertCoversSpeech(plan, 1500, [(10, 20)])
+
+
+if __name__ == "__main__":
+    unittest.main()
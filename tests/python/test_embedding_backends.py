@@ -0,0 +1,83 @@
+import sys
+import threading
+import unittest
+from unittest import mock
+
+import support  # noqa: F401
+
+import numpy as np
+
+import clients
+import embedding_backends
+from clients import get_embed_model, get_gateway
+from embedding_backends import LocalEmbedding
+from embedding_cache import model_key
+
+
+class FakeSentenceTransformer:
+    """Encodes a text as [length, 1], recording each batch"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.batches = []
+
+    def encode(self, texts, batch_size, **kwargs):
+        with self.lock:
+            self.batches.append(list(texts))
+        return np.array([[float(len(text)), 1.0] for text in texts])
+
+
+class GetEmbedModelTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(clients._embed_models, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_local_models_are_shared_per_name(self):
+        model = get_embed_model(backend="local")
+        self.assertIsInstance(model, LocalEmbedding)
+        self.assertEqual(model.model_name, embedding_backends.LOCAL_EMBED_MODEL)
+        self.assertIs(get_embed_model(backend="local"), model)
+        other = get_embed_model("BAAI/bge-base-en-v1.5", backend="local")
+        self.assertIsNot(other, model)
+        self.assertEqual(model_key(other), "LocalEmbedding:BAAI/bge-base-en-v1.5")
+
+    def test_openai_models_use_the_gateway_connection_pool(self):
+        model = get_embed_model(backend="openai")
+        self.assertEqual(model.model_name, clients.EMBED_MODEL)
+        self.assertEqual(model.embed_batch_size, clients.EMBED_BATCH_SIZE)
+        self.assertIs(model._http_client, get_gateway().http_client)
+        self.assertIs(get_embed_model(clients.EMBED_MODEL, backend="openai"), model)
+
+    def test_default_backend_comes_from_the_environment_setting(self):
+        with mock.patch.object(embedding_backends, "EMBED_BACKEND", "local"):
+            self.assertIsInstance(get_embed_model(), LocalEmbedding)
+        with self.assertRaisesRegex(ValueError, "choose from openai, local"):
+            get_embed_model(backend="cohere")
+
+
+class LocalEmbeddingTest(unittest.TestCase):
+    def test_batches_are_spread_over_workers_and_keep_their_order(self):
+        model = LocalEmbedding(batch_size=2, workers=2)
+        model._model = FakeSentenceTransformer()
+        texts = ["a", "bb", "ccc", "dddd", "eeeee"]
+        self.assertEqual(model.get_text_embedding_batch(texts), [[float(len(t)), 1.0] for t in texts])
+        self.assertEqual(sorted(model._model.batches), [["a", "bb"], ["ccc", "dddd"], ["eeeee"]])
+        self.assertEqual(model.get_query_embedding("query"), [5.0, 1.0])
+
+    def test_one_worker_encodes_everything_in_one_call(self):
+        model = LocalEmbedding(batch_size=2, workers=1)
+        model._model = FakeSentenceTransformer()
+        model.get_text_embedding_batch(["a", "bb", "ccc"])
+        self.assertEqual(model._model.batches, [["a", "bb", "ccc"]])
+
+    def test_missing_dependency_is_reported_on_first_use(self):
+        model = LocalEmbedding()
+        with mock.patch.dict(sys.modules, {"sentence_transformers": None}):
+            self.assertFalse(model.available())
+            with self.assertRaisesRegex(RuntimeError, "pip install sentence-transformers"):
+                model.get_query_embedding("query")
+
+
+if __name__ == "__main__":
+    unittest.main()
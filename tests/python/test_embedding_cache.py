@@ -0,0 +1,70 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import support
+
+from llama_index.core.schema import TextNode
+
+import embedding_cache
+from embedding_cache import CachedEmbedding, EmbeddingCache, embed_texts, text_hash
+from fakes import FakeEmbedding
+
+
+class EmbedTextsTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = EmbeddingCache(os.path.join(tempfile.mkdtemp(dir=support.CACHE_DIR), "embeddings.sqlite"))
+        self.addCleanup(embedding_cache.configure, embedding_cache.MAX_CONCURRENT_BATCHES)
+
+    def test_only_distinct_misses_are_requested(self):
+        model = FakeEmbedding()
+        vectors = embed_texts(model, ["a  b", "a b\n", "abc"], self.cache)
+        self.assertEqual(vectors, [[4.0, 1.0], [4.0, 1.0], [3.0, 1.0]])
+        self.assertEqual(model.requests, [["a  b", "abc"]])
+        self.assertEqual(embed_texts(model, ["abc", "new"], self.cache), [[3.0, 1.0], [3.0, 1.0]])
+        self.assertEqual(model.requests[1:], [["new"]])
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 3))
+        self.assertGreater(stats["tokens_saved"], 0)
+
+    def test_vectors_persist_and_are_keyed_by_model(self):
+        embed_texts(FakeEmbedding(), ["hello"], self.cache)
+        reopened = EmbeddingCache(self.cache.path)
+        self.assertEqual(reopened.get_many("FakeEmbedding:fake", [text_hash("hello")]),
+                         {text_hash("hello"): [5.0, 1.0]})
+        other = FakeEmbedding(model_name="other")
+        embed_texts(other, ["hello"], reopened)
+        self.assertEqual(other.requests, [["hello"]])
+
+    def test_misses_are_split_into_batches_under_the_input_limit(self):
+        model = FakeEmbedding()
+        with mock.patch.object(embedding_cache, "MAX_BATCH_INPUTS", 2):
+            vectors = embed_texts(model, ["a", "bb", "ccc", "dddd", "eeeee"], self.cache)
+        self.assertEqual([v[0] for v in vectors], [1.0, 2.0, 3.0, 4.0, 5.0])
+        self.assertEqual(sorted(len(request) for request in model.requests), [1, 2, 2])
+
+    def test_cached_embedding_sets_node_embeddings(self):
+        nodes = [TextNode(text="first node"), TextNode(text="second")]
+        with mock.patch.object(embedding_cache, "embed_texts",
+                               lambda model, texts: embed_texts(model, texts, self.cache)):
+            CachedEmbedding(embed_model=FakeEmbedding())(nodes)
+        self.assertEqual([node.embedding for node in nodes], [[10.0, 1.0], [6.0, 1.0]])
+
+    def test_requests_are_capped_across_concurrent_callers(self):
+        embedding_cache.configure(2)
+        model = FakeEmbedding(delay=0.05)
+        with mock.patch.object(embedding_cache, "MAX_BATCH_INPUTS", 1):
+            threads = [threading.Thread(target=embed_texts, args=(model, [f"{i} {j}" for j in range(3)], self.cache))
+                       for i in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(model.requests), 12)
+        self.assertEqual(model.peak, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import support
+
+import rag_processor
+from fakes import FakeEmbedding
+from ingest import IngestResult, _ingest, expand_sources, summarize
+from transcript_cache import TranscriptCache, new_entry
+
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"audio")
+    return path
+
+
+class ExpandSourcesTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(dir=support.CACHE_DIR)
+
+    def test_directories_are_searched_for_media_files(self):
+        lecture = touch(os.path.join(self.dir, "course", "b.MP4"))
+        nested = touch(os.path.join(self.dir, "course", "week1", "a.m4a"))
+        touch(os.path.join(self.dir, "course", "notes.txt"))
+        self.assertEqual(sorted(expand_sources([os.path.join(self.dir, "course")])), sorted([lecture, nested]))
+
+    def test_list_files_skip_comments_and_duplicates_are_dropped(self):
+        audio = touch(os.path.join(self.dir, "talk.mp3"))
+        list_path = os.path.join(self.dir, "urls.txt")
+        with open(list_path, "w", encoding="utf-8") as f:
+            f.write("# lectures\nhttps://youtu.be/a\n\n  https://youtu.be/b  \n   # done\n" + audio + "\n")
+        sources = expand_sources(["https://youtu.be/a", os.path.join(self.dir, "missing.mp3")], [list_path])
+        self.assertEqual(sources, ["https://youtu.be/a", "https://youtu.be/b", audio])
+
+
+class IngestSourceTest(unittest.TestCase):
+    def setUp(self):
+        self.entry = {"video_id": "Youtube:a", "title": "Lecture", "duration": 60.0}
+        self.process_video = mock.Mock(return_value=dict(self.entry, video_id="Youtube:new"))
+        self.processed_entry = mock.Mock(return_value=self.entry)
+        patchers = [
+            mock.patch.object(rag_processor, "process_video", self.process_video),
+            mock.patch.object(rag_processor, "processed_entry", self.processed_entry),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_processed_sources_are_skipped_unless_forced(self):
+        result = _ingest("https://youtu.be/a", False, False, "openai")
+        self.assertEqual((result.status, result.video_id, result.title), ("skipped", "Youtube:a", "Lecture"))
+        self.process_video.assert_not_called()
+
+        result = _ingest("https://youtu.be/a", True, True, "local")
+        self.assertEqual((result.status, result.video_id), ("done", "Youtube:new"))
+        self.process_video.assert_called_once_with("https://youtu.be/a", preprocess=True, backend="local")
+
+    def test_errors_become_a_failed_result(self):
+        self.processed_entry.return_value = None
+        self.process_video.side_effect = RuntimeError("download failed")
+        result = _ingest("https://youtu.be/a", False, False, "openai")
+        self.assertEqual((result.status, result.error), ("failed", "RuntimeError: download failed"))
+
+
+class ProcessedEntryTest(unittest.TestCase):
+    def setUp(self):
+        self.index_root = tempfile.mkdtemp(dir=support.CACHE_DIR)
+        self.cache = TranscriptCache(tempfile.mkdtemp(dir=support.CACHE_DIR))
+        self.library = mock.Mock()
+        self.library.coverage.return_value = (60.0, True)
+        embed_model = FakeEmbedding()
+        patchers = [
+            mock.patch.object(rag_processor, "transcript_cache", self.cache),
+            mock.patch.object(rag_processor, "INDEX_ROOT", self.index_root),
+            mock.patch.object(rag_processor, "get_library", lambda: self.library),
+            mock.patch.object(rag_processor, "get_embed_model", lambda: embed_model),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.cache.put("sha-1", new_entry("Youtube:a", "sha-1", "the transcript", []),
+                       aliases=["url:https://youtu.be/a"])
+
+    def index(self):
+        os.makedirs(os.path.join(self.index_root, rag_processor.rag_index_key("the transcript")))
+
+    def test_needs_a_transcript_an_index_and_a_complete_library_entry(self):
+        self.assertIsNone(rag_processor.processed_entry("https://youtu.be/a"))
+        self.index()
+        self.assertEqual(rag_processor.processed_entry(" https://youtu.be/a ")["video_id"], "Youtube:a")
+        self.library.coverage.assert_called_with("Youtube:a")
+        self.assertIsNone(rag_processor.processed_entry("https://youtu.be/other"))
+        self.library.coverage.return_value = (30.0, False)
+        self.assertIsNone(rag_processor.processed_entry("https://youtu.be/a"))
+
+    def test_local_files_are_found_by_content_hash(self):
+        path = touch(os.path.join(tempfile.mkdtemp(dir=support.CACHE_DIR), "talk.mp3"))
+        self.cache.add_aliases("sha-1", [f"audio:{rag_processor.file_sha256(path)}"])
+        self.index()
+        self.assertEqual(rag_processor.processed_entry(path)["audio_sha256"], "sha-1")
+
+
+class SummarizeTest(unittest.TestCase):
+    def test_throughput_counts_only_processed_audio(self):
+        results = [IngestResult("a", "done", duration=1800.0), IngestResult("b", "done", duration=1800.0),
+                   IngestResult("c", "skipped", duration=3600.0), IngestResult("d", "failed")]
+        summary = summarize(results, 360.0)
+        self.assertEqual((summary["done"], summary["skipped"], summary["failed"]), (2, 1, 1))
+        self.assertEqual((summary["audio_hours"], summary["audio_seconds_per_second"], summary["videos_per_hour"]),
+                         (1.0, 10.0, 20.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
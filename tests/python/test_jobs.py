@@ -0,0 +1,224 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import types
+import unittest
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
+
+import support
+
+import jobs
+from jobs import JobQueue, _connect, _pid_alive, _run_job, _update
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+class JobQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(dir=support.CACHE_DIR), "jobs.sqlite")
+        self.started = []
+        self.processed = False
+        patchers = [
+            mock.patch.object(JobQueue, "_start", lambda queue, job_id, *args: self.started.append(job_id)),
+            mock.patch.object(JobQueue, "_processed", staticmethod(lambda url: self.processed)),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def queue(self):
+        queue = JobQueue(self.path, max_workers=1)
+        self.addCleanup(queue.shutdown)
+        return queue
+
+    def test_active_job_is_returned_instead_of_a_duplicate(self):
+        queue = self.queue()
+        job_id = queue.submit(" https://youtu.be/abc ")
+        self.assertEqual(queue.submit("https://youtu.be/abc"), job_id)
+        self.assertNotEqual(queue.submit("https://youtu.be/abc", preprocess=True), job_id)
+        self.assertEqual(len(self.started), 2)
+        job = queue.get(job_id)
+        self.assertEqual((job.url, job.key), ("https://youtu.be/abc", "https://youtu.be/abc"))
+        self.assertEqual((job.status, job.label), ("queued", "Waiting for a worker"))
+
+    def test_resolved_key_matches_another_url_for_the_same_video(self):
+        queue = self.queue()
+        job_id = queue.submit("https://youtu.be/abc")
+        _update(self.path, job_id, key="abc", status="running")
+        self.assertEqual(queue.submit("https://www.youtube.com/watch?v=abc", key="abc"), job_id)
+        self.assertEqual(queue.submit("https://youtu.be/abc"), job_id)
+
+    def test_done_job_counts_only_while_its_results_are_cached(self):
+        queue = self.queue()
+        job_id = queue.submit("https://youtu.be/abc")
+        _update(self.path, job_id, status="done", stage="done")
+        again = queue.submit("https://youtu.be/abc")
+        self.assertNotEqual(again, job_id)
+
+        _update(self.path, again, status="done", stage="done")
+        self.processed = True
+        self.assertEqual(queue.submit("https://youtu.be/abc"), again)
+
+    def test_failed_job_is_retried(self):
+        queue = self.queue()
+        job_id = queue.submit("https://youtu.be/abc")
+        _update(self.path, job_id, status="failed", error="boom")
+        self.assertNotEqual(queue.submit("https://youtu.be/abc"), job_id)
+
+    def test_unfinished_jobs_of_dead_owners_are_resumed(self):
+        self.queue()
+        now = time.time()
+        with _connect(self.path) as conn:
+            for job_id, status, owner in [("orphaned", "running", dead_pid()), ("never-started", "queued", None),
+                                          ("live", "running", os.getppid()), ("finished", "done", None)]:
+                conn.execute(
+                    "INSERT INTO jobs (id, url, key, preprocess, status, stage, owner, created, updated)"
+                    " VALUES (?, ?, ?, 0, ?, ?, ?, ?, ?)",
+                    (job_id, f"https://youtu.be/{job_id}", job_id, status, status, owner, now, now)
+                )
+        self.started.clear()
+        self.queue()
+        self.assertEqual(sorted(self.started), ["never-started", "orphaned"])
+
+    def test_jobs_lists_newest_first(self):
+        queue = self.queue()
+        first = queue.submit("https://youtu.be/one")
+        with mock.patch.object(jobs.time, "time", return_value=time.time() + 10):
+            second = queue.submit("https://youtu.be/two")
+        self.assertEqual([job.id for job in queue.jobs()], [second, first])
+
+
+class FakeExecutor:
+    def __init__(self, broken=False):
+        self.broken = broken
+        self.submitted = {}
+        self.submissions = []
+        self.shut_down = False
+
+    def submit(self, fn, path, job_id, *args):
+        if self.broken:
+            raise BrokenProcessPool("pool is broken")
+        self.submissions.append(job_id)
+        self.submitted[job_id] = Future()
+        return self.submitted[job_id]
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+class BrokenPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(dir=support.CACHE_DIR), "jobs.sqlite")
+        self.executors = []
+
+        def new_executor(queue):
+            self.executors.append(FakeExecutor())
+            return self.executors[-1]
+
+        patcher = mock.patch.object(JobQueue, "_new_executor", new_executor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.queue = JobQueue(self.path)
+
+    def test_crashed_worker_fails_its_job_and_restarts_waiting_ones(self):
+        running, waiting = self.queue.submit("https://youtu.be/one"), self.queue.submit("https://youtu.be/two")
+        _update(self.path, running, status="running", owner=dead_pid())
+        old = self.executors[0]
+        for future in old.submitted.values():
+            future.set_exception(BrokenProcessPool("worker died"))
+
+        self.assertTrue(old.shut_down)
+        self.assertEqual(len(self.executors), 2)
+        self.assertEqual(list(self.executors[1].submitted), [waiting])
+        self.assertEqual(self.queue.get(waiting).status, "queued")
+        job = self.queue.get(running)
+        self.assertEqual((job.status, job.error), ("failed", "Worker process exited unexpectedly"))
+
+    def test_submit_replaces_a_pool_that_is_already_broken(self):
+        self.executors[0].broken = True
+        job_id = self.queue.submit("https://youtu.be/one")
+        self.assertEqual(list(self.executors[1].submitted), [job_id])
+
+    def test_results_from_a_replaced_pool_are_ignored(self):
+        job_id = self.queue.submit("https://youtu.be/one")
+        stale = self.executors[0].submitted[job_id]
+        self.executors[0].broken = True
+        second = self.queue.submit("https://youtu.be/two")
+        self.queue._start(job_id, "https://youtu.be/one", False)
+        stale.set_exception(BrokenProcessPool("worker died"))
+        self.assertEqual(len(self.executors), 2)
+        self.assertEqual(self.executors[1].submissions, [second, job_id])
+        self.assertEqual(self.queue.get(job_id).status, "queued")
+
+
+class RunJobTest(unittest.TestCase):
+    def test_failures_before_processing_fail_the_job(self):
+        path = os.path.join(tempfile.mkdtemp(dir=support.CACHE_DIR), "jobs.sqlite")
+        with mock.patch.object(JobQueue, "_start"):
+            queue = JobQueue(path, max_workers=1)
+            self.addCleanup(queue.shutdown)
+            job_id = queue.submit("https://youtu.be/abc")
+
+        def resolve_video_id(url):
+            raise RuntimeError("metadata unavailable")
+
+        pipeline = types.SimpleNamespace(resolve_video_id=resolve_video_id, process_video=mock.Mock())
+        with mock.patch.dict(sys.modules, rag_processor=pipeline):
+            _run_job(path, job_id, "https://youtu.be/abc", False)
+        job = queue.get(job_id)
+        self.assertEqual((job.status, job.error), ("failed", "metadata unavailable"))
+        pipeline.process_video.assert_not_called()
+
+
+class DuplicateWaitTest(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(dir=support.CACHE_DIR), "jobs.sqlite")
+        with mock.patch.object(JobQueue, "_start"):
+            queue = JobQueue(self.path, max_workers=1)
+            self.addCleanup(queue.shutdown)
+            with mock.patch.object(jobs.time, "time", return_value=time.time() - 10):
+                self.first = queue.submit("https://youtu.be/abc")
+            self.second = queue.submit("https://www.youtube.com/watch?v=abc")
+        self.queue = queue
+
+    def test_later_job_waits_for_a_running_one_on_the_same_video(self):
+        _update(self.path, self.first, key="youtube:abc", status="running", owner=os.getpid())
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            self.assertEqual(self.queue.get(self.second).label, "Waiting for another job on this video")
+            _update(self.path, self.first, status="done")
+
+        with mock.patch.object(jobs.time, "sleep", sleep):
+            jobs._wait_for_duplicate(self.path, self.second, "youtube:abc")
+        self.assertEqual(sleeps, [jobs.DUPLICATE_POLL_SECONDS])
+
+    def test_no_wait_for_later_dead_or_other_jobs(self):
+        cases = [(self.second, self.first, os.getpid(), "youtube:abc"),
+                 (self.first, self.second, dead_pid(), "youtube:abc"),
+                 (self.first, self.second, os.getpid(), "youtube:other")]
+        for running, waiting, owner, key in cases:
+            with self.subTest(running=running, owner=owner, key=key):
+                _update(self.path, running, key=key, status="running", owner=owner)
+                self.assertIsNone(jobs._running_duplicate(self.path, waiting, "youtube:abc"))
+                _update(self.path, running, status="queued")
+
+
+class PidAliveTest(unittest.TestCase):
+    def test_pid_alive(self):
+        self.assertTrue(_pid_alive(os.getpid()))
+        self.assertFalse(_pid_alive(dead_pid()))
+        self.assertFalse(_pid_alive(None))
+
+
+if __name__ == "__main__":
+    unittest.main()
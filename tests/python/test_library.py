@@ -0,0 +1,166 @@
+import math
+import os
+import random
+import tempfile
+import unittest
+from collections import Counter
+
+import support
+
+import numpy as np
+from llama_index.core.schema import TextNode
+
+from library import IncrementalBM25, VideoLibrary, tokenize
+
+WORDS = ["lecture", "gradient", "descent", "matrix", "vector", "proof", "theorem", "loss",
+         "network", "layer", "python", "array", "memory", "cache", "index", "query"]
+
+
+def reference_bm25(docs, query, k1=1.5, b=0.75):
+    """Textbook Okapi BM25 recomputed from scratch"""
+    tokenized = [tokenize(doc) for doc in docs]
+    n, average = len(tokenized), sum(map(len, tokenized)) / len(tokenized)
+    scores = []
+    for tokens in tokenized:
+        counts, total = Counter(tokens), 0.0
+        for term in set(tokenize(query)):
+            df = sum(term in other for other in tokenized)
+            if not df:
+                continue
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            tf = counts[term]
+            total += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(tokens) / average))
+        scores.append(total)
+    return scores
+
+
+def random_docs(count, seed=0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 30))) for _ in range(count)]
+
+
+def make_nodes(video_id, texts, seed=0, dim=8):
+    rng = np.random.default_rng(seed)
+    return [TextNode(text=text, metadata={"video_id": video_id}, embedding=rng.normal(size=dim).tolist())
+            for text in texts]
+
+
+class IncrementalBM25Test(unittest.TestCase):
+    def test_matches_reference_as_the_corpus_grows(self):
+        docs = random_docs(120)
+        bm25 = IncrementalBM25()
+        for end in (1, 40, 120):
+            for doc in docs[len(bm25):end]:
+                bm25.add(Counter(tokenize(doc)))
+            for query in ("gradient descent", "matrix vector index", "nothing matches"):
+                np.testing.assert_allclose(bm25.scores(query), reference_bm25(docs[:end], query),
+                                           rtol=1e-5, atol=1e-6)
+
+    def test_scores_only_the_requested_ranges(self):
+        docs = random_docs(80, seed=3)
+        bm25 = IncrementalBM25()
+        for doc in docs:
+            bm25.add(Counter(tokenize(doc)))
+        full = bm25.scores("cache memory layer")
+        ranges = [(5, 12), (40, 41), (70, 200)]
+        np.testing.assert_allclose(bm25.scores("cache memory layer", ranges),
+                                   np.concatenate([full[5:12], full[40:41], full[70:80]]))
+        self.assertEqual(bm25.scores("cache", [(10, 10)]).shape, (0,))
+
+    def test_empty(self):
+        self.assertEqual(IncrementalBM25().scores("anything").shape, (0,))
+
+
+class VideoLibraryTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(dir=support.CACHE_DIR)
+        self.library = VideoLibrary(root=self.root)
+
+    def add(self, library, video_id, texts, seed=0, **kwargs):
+        return library.add_video(video_id, video_id.title(), make_nodes(video_id, texts, seed), "test-model",
+                                 **kwargs)
+
+    def test_append_and_search_with_video_filters(self):
+        self.add(self.library, "a", ["gradient descent on the loss", "matrix and vector basics"])
+        b_nodes = make_nodes("b", ["memory cache and index", "gradient of a neural network"], seed=1)
+        self.library.add_video("b", "B", b_nodes, "test-model")
+        self.assertEqual(len(self.library.nodes), 4)
+        self.assertEqual([v["video_id"] for v in self.library.videos()], ["a", "b"])
+
+        hits = self.library.search_bm25("gradient", 5)
+        self.assertEqual(sorted(self.library.nodes[row].metadata["video_id"] for row, _ in hits), ["a", "b"])
+        hits = self.library.search_bm25("gradient", 5, ["b"])
+        self.assertEqual([self.library.nodes[row].text for row, _ in hits], ["gradient of a neural network"])
+
+        # Stored float16 vectors, so the match is near but not exactly 1
+        row, similarity = self.library.search_vector(b_nodes[0].embedding, 1)[0]
+        self.assertEqual(row, 2)
+        self.assertAlmostEqual(similarity, 1.0, places=2)
+        self.assertEqual(sorted(row for row, _ in self.library.search_vector(b_nodes[0].embedding, 4, ["b"])),
+                         [2, 3])
+        self.assertIsNone(self.library.nodes[2].embedding)
+
+    def test_rejects_vectors_from_another_model(self):
+        self.add(self.library, "a", ["one"])
+        with self.assertRaises(ValueError):
+            self.library.add_video("b", "B", make_nodes("b", ["two"]), "other-model")
+        with self.assertRaises(ValueError):
+            self.library.add_video("b", "B", make_nodes("b", ["two"], dim=4), "test-model")
+
+    def test_reopening_with_other_storage_settings_keeps_the_original(self):
+        self.library = VideoLibrary(root=self.root, dimensions=4)
+        self.add(self.library, "a", ["first video"])
+        reopened = VideoLibrary(root=self.root, dtype="int8", dimensions=None)
+        b_nodes = make_nodes("b", ["second video"], seed=1)
+        self.assertEqual(reopened.add_video("b", "B", b_nodes, "test-model"), 1)
+
+        fresh = VideoLibrary(root=self.root)
+        self.assertEqual((fresh.meta["dtype"], fresh.meta["dimensions"], fresh.meta["dim"]), ("float16", 4, 4))
+        self.assertEqual(os.path.getsize(os.path.join(self.root, "vectors.bin")), 2 * 4 * 2)
+        self.assertFalse(os.path.exists(os.path.join(self.root, "scales.bin")))
+        self.assertEqual(fresh.search_vector(b_nodes[0].embedding, 1)[0][0], 1)
+
+    def test_refresh_picks_up_other_writers(self):
+        reader = VideoLibrary(root=self.root)
+        self.add(self.library, "a", ["first video"])
+        self.assertEqual(reader.refresh(), 1)
+        self.add(self.library, "b", ["second video", "more of it"])
+        self.assertEqual(reader.refresh(), 2)
+        self.assertEqual(reader.refresh(), 0)
+        self.assertTrue(reader.has_video("b"))
+        self.assertEqual(reader.search_bm25("second", 1, ["b"])[0][0], 1)
+
+    def test_partial_appends_until_marked_complete(self):
+        self.add(self.library, "a", ["opening minutes"], covered=120.0, complete=False)
+        self.assertEqual(self.library.coverage("a"), (120.0, False))
+        self.add(self.library, "a", ["later on"], seed=1, covered=300.0, complete=False)
+        self.assertEqual(self.library.coverage("a"), (300.0, False))
+        self.assertEqual(self.library.search_bm25("later", 1, ["a"])[0][0], 1)
+
+        self.library.mark_complete("a", duration=320.0)
+        [video] = self.library.videos()
+        self.assertEqual((video["nodes"], video["covered"], video["complete"]), (2, 320.0, True))
+        self.library.mark_complete("missing")
+        self.assertEqual(self.library.coverage("missing"), (0.0, False))
+
+    def test_crashed_writer_is_truncated_on_next_append(self):
+        self.add(self.library, "a", ["kept video"])
+        # A writer that died after writing data but before committing its manifest line
+        for name in ("vectors.bin", "nodes.jsonl", "bm25.jsonl"):
+            with open(os.path.join(self.root, name), "ab") as f:
+                f.write(b"partial garbage\n")
+        with open(os.path.join(self.root, "manifest.jsonl"), "ab") as f:
+            f.write(b'{"video_id": "lost"')
+
+        reopened = VideoLibrary(root=self.root)
+        self.assertEqual([v["video_id"] for v in reopened.videos()], ["a"])
+        self.add(reopened, "b", ["new video"], seed=1)
+
+        fresh = VideoLibrary(root=self.root)
+        self.assertEqual([node.text for node in fresh.nodes], ["kept video", "new video"])
+        self.assertEqual(fresh.search_bm25("new", 1)[0][0], 1)
+        self.assertEqual(os.path.getsize(os.path.join(self.root, "vectors.bin")), 2 * 8 * 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
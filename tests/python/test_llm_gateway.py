@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import support
+
+from openai.types.chat import ChatCompletion
+
+from llm_gateway import LLMGateway
+from prompt_cache import PromptCache
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+def completion(text):
+    return ChatCompletion.model_validate({
+        "id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": "gpt-test",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}],
+        "usage": {"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5},
+    })
+
+
+class GatewayChatTest(unittest.TestCase):
+    def setUp(self):
+        path = os.path.join(tempfile.mkdtemp(dir=support.CACHE_DIR), "prompts.sqlite")
+        self.gateway = LLMGateway(prompt_cache=PromptCache(path, functions=["enabled_call"]))
+        self.addCleanup(self.gateway.close)
+        self.create = mock.Mock(side_effect=lambda **kwargs: completion(f"reply {self.create.call_count}"))
+        self.gateway.client = mock.Mock()
+        self.gateway.client.chat.completions.create = self.create
+
+    def reply(self, name, **kwargs):
+        return self.gateway.chat(name, MESSAGES, model="gpt-test", **kwargs).choices[0].message.content
+
+    def test_enabled_functions_are_served_from_the_cache(self):
+        self.assertEqual(self.reply("enabled_call"), "reply 1")
+        self.assertEqual(self.reply("enabled_call"), "reply 1")
+        self.assertEqual(self.create.call_count, 1)
+        summary = self.gateway.summary()["enabled_call"]
+        self.assertEqual((summary["calls"], summary["cached"], summary["prompt_tokens"]), (2, 1, 3))
+
+    def test_use_cache_overrides_the_shared_setting_per_call(self):
+        self.assertEqual(self.reply("other_call"), "reply 1")
+        self.assertEqual(self.reply("other_call"), "reply 2")
+        self.assertEqual(self.reply("other_call", use_cache=True), "reply 3")
+        self.assertEqual(self.reply("other_call", use_cache=True), "reply 3")
+        self.assertEqual(self.reply("enabled_call", use_cache=False), "reply 4")
+        self.assertEqual(self.reply("enabled_call", use_cache=False), "reply 5")
+        self.assertNotIn("use_cache", self.create.call_args.kwargs)
+
+    def test_forget_drops_a_cached_reply(self):
+        self.reply("enabled_call", temperature=0.2)
+        self.gateway.forget(MESSAGES, model="gpt-test", temperature=0.2)
+        self.assertEqual(self.reply("enabled_call", temperature=0.2), "reply 2")
+
+
+if __name__ == "__main__":
+    unittest.main()
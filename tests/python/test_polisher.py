@@ -0,0 +1,98 @@
+import csv
+import io
+import threading
+import time
+import unittest
+from unittest import mock
+
+import support  # noqa: F401
+
+import polisher
+from polisher import PolishRequest, PolishResult, polish_batch, read_requests, results_to_csv
+
+
+class ReadRequestsTest(unittest.TestCase):
+    def test_plain_text_is_one_message_per_line(self):
+        requests = read_requests("can I get an extension\n\n  see you in lab  \n", "Email", "Classmate", 2)
+        self.assertEqual(requests, [
+            PolishRequest(row=1, message="can I get an extension", content_type="Email",
+                          recipient_type="Classmate", variations=2),
+            PolishRequest(row=3, message="see you in lab", content_type="Email",
+                          recipient_type="Classmate", variations=2),
+        ])
+
+    def test_csv_columns_override_the_defaults(self):
+        data = ("Message, Format, Recipient, Variations\n"
+                "office hours?,email,CLASSMATE,3\n"
+                "thanks,,,\n"
+                "typo,Letter,Dean,lots\n")
+        requests = read_requests(data, variations=2)
+        self.assertEqual([(r.row, r.message, r.content_type, r.recipient_type, r.variations) for r in requests], [
+            (1, "office hours?", "Email", "Classmate", 3),
+            (2, "thanks", "Text", "Professor", 2),
+            (3, "typo", "Text", "Professor", 2),
+        ])
+
+    def test_variations_are_clamped(self):
+        requests = read_requests("message,variations\na,0\nb,9\nc,-2\n")
+        self.assertEqual([r.variations for r in requests], [1, 5, 1])
+
+    def test_rows_without_a_message_are_skipped(self):
+        requests = read_requests("\nmessage,format\n,Email\nhello,Email\n")
+        self.assertEqual([(r.row, r.message) for r in requests], [(2, "hello")])
+
+    def test_message_inside_a_sentence_is_not_a_header(self):
+        requests = read_requests("this message, please polish it\n")
+        self.assertEqual([r.message for r in requests], ["this message, please polish it"])
+
+
+class ResultsToCsvTest(unittest.TestCase):
+    def test_rows_are_ordered_with_one_line_per_variation_or_error(self):
+        first, second = PolishRequest(row=1, message="a"), PolishRequest(row=2, message="b", variations=2)
+        results = [PolishResult(request=second, variations=[("", "b1"), ("", "b2")]),
+                   PolishResult(request=first, error="rate limited")]
+        rows = list(csv.reader(io.StringIO(results_to_csv(results))))
+        self.assertEqual(rows[0], ["row", "message", "format", "recipient", "variation", "subject", "body", "error"])
+        self.assertEqual([(row[0], row[4], row[6], row[7]) for row in rows[1:]],
+                         [("1", "", "", "rate limited"), ("2", "1", "b1", ""), ("2", "2", "b2", "")])
+
+
+class PolishBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.slow_started, self.release = threading.Event(), threading.Event()
+        self.addCleanup(self.release.set)
+        self.polished = []
+
+        def polish_message(message, *args):
+            self.polished.append(message)
+            if message == "slow":
+                self.slow_started.set()
+                self.release.wait(5)
+            if message == "broken":
+                raise RuntimeError("rate limited")
+            return [("", message.upper())]
+
+        patcher = mock.patch.object(polisher, "polish_message", polish_message)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_results_and_errors_are_collected_per_request(self):
+        requests = [PolishRequest(row=1, message="hi"), PolishRequest(row=2, message="broken")]
+        results = sorted(polish_batch(requests), key=lambda r: r.request.row)
+        self.assertEqual([(r.variations, r.error) for r in results], [([("", "HI")], None), ([], "rate limited")])
+
+    def test_closing_early_cancels_requests_that_have_not_started(self):
+        requests = [PolishRequest(row=i, message=m) for i, m in enumerate(["fast", "slow", "never"], 1)]
+        results = polish_batch(requests, max_workers=1)
+        self.assertEqual(next(results).request.message, "fast")
+        self.assertTrue(self.slow_started.wait(5))
+        started = time.perf_counter()
+        results.close()
+        self.assertLess(time.perf_counter() - started, 1)
+        self.release.set()
+        time.sleep(0.05)
+        self.assertEqual(self.polished, ["fast", "slow"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import support
+
+import prompt_cache
+from prompt_cache import CACHEABLE_FUNCTIONS, PromptCache, prompt_key
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+class PromptKeyTest(unittest.TestCase):
+    def test_depends_on_model_messages_and_params_but_not_their_order(self):
+        key = prompt_key("gpt", MESSAGES, {"temperature": 0.2, "max_tokens": 50})
+        self.assertEqual(key, prompt_key("gpt", MESSAGES, {"max_tokens": 50, "temperature": 0.2}))
+        self.assertNotEqual(key, prompt_key("other", MESSAGES, {"temperature": 0.2, "max_tokens": 50}))
+        self.assertNotEqual(key, prompt_key("gpt", MESSAGES, {"temperature": 0.3, "max_tokens": 50}))
+        self.assertNotEqual(key, prompt_key("gpt", MESSAGES + MESSAGES, {"temperature": 0.2, "max_tokens": 50}))
+
+
+class PromptCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch.object(prompt_cache.time, "time", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        path = os.path.join(tempfile.mkdtemp(dir=support.CACHE_DIR), "prompts.sqlite")
+        self.cache = PromptCache(path, ttl=60, max_bytes=10, functions=["polish"])
+
+    def test_get_returns_what_was_put(self):
+        self.cache.put("k", "polish", "gpt", "1234")
+        self.assertEqual(self.cache.get("k"), "1234")
+        self.assertIsNone(self.cache.get("missing"))
+        self.assertEqual(self.cache.stats(), {"hits": 1, "misses": 1, "hit_ratio": 0.5})
+        [entry] = self.cache.entries()
+        self.assertEqual((entry["function"], entry["enabled"], entry["entries"], entry["bytes"], entry["hits"]),
+                         ("polish", True, 1, 4, 1))
+
+    def test_entries_expire_after_ttl(self):
+        self.cache.put("k", "polish", "gpt", "1234")
+        self.now += 60
+        self.assertEqual(self.cache.get("k"), "1234")
+        self.now += 1
+        self.assertIsNone(self.cache.get("k"))
+        self.assertEqual(self.cache.entries(), [])
+
+    def test_least_recently_used_is_evicted_over_max_bytes(self):
+        self.cache.put("a", "polish", "gpt", "aaaa")
+        self.now += 1
+        self.cache.put("b", "polish", "gpt", "bbbb")
+        self.now += 1
+        self.cache.get("a")
+        self.now += 1
+        self.cache.put("c", "polish", "gpt", "cccc")
+        self.assertEqual((self.cache.get("a"), self.cache.get("b"), self.cache.get("c")), ("aaaa", None, "cccc"))
+
+    def test_sizes_are_counted_in_utf8_bytes(self):
+        self.cache.put("wide", "polish", "gpt", "é" * 6)
+        self.assertIsNone(self.cache.get("wide"))
+
+    def test_discard_and_clear(self):
+        self.cache.put("a", "polish", "gpt", "a")
+        self.cache.put("b", "analyze", "gpt", "b")
+        self.cache.put("c", "analyze", "gpt", "c")
+        self.cache.discard("a")
+        self.assertIsNone(self.cache.get("a"))
+        self.cache.clear("analyze")
+        self.assertEqual(self.cache.entries(), [])
+
+    def test_only_listed_functions_are_enabled(self):
+        self.assertTrue(self.cache.enabled("polish"))
+        self.assertFalse(self.cache.enabled("analyze"))
+
+    @unittest.skipIf(os.environ.get("PROMPT_CACHE_FUNCTIONS"), "caching opted in from the environment")
+    def test_nothing_is_cached_unless_opted_in(self):
+        cache = PromptCache(os.path.join(tempfile.mkdtemp(dir=support.CACHE_DIR), "prompts.sqlite"))
+        self.assertFalse(any(cache.enabled(name) for name in CACHEABLE_FUNCTIONS))
+
+
+if __name__ == "__main__":
+    unittest.main()
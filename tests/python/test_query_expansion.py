@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+from typing import List
+from unittest import mock
+
+import support
+
+from llama_index.core.llms import MockLLM
+from llama_index.core.retrievers import BaseRetriever, QueryFusionRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+
+from fakes import FakeEmbedding
+from query_expansion import ExpandingFusionRetriever, QueryExpansionCache, keyword_queries
+
+
+class EchoRetriever(BaseRetriever):
+    """Returns one node per query, recording the queries and their embeddings"""
+
+    def __init__(self):
+        super().__init__()
+        self.queries = []
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        self.queries.append((query_bundle.query_str, query_bundle.embedding))
+        return [NodeWithScore(node=TextNode(text=query_bundle.query_str, id_=query_bundle.query_str), score=1.0)]
+
+
+class QueryExpansionCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = QueryExpansionCache(os.path.join(tempfile.mkdtemp(dir=support.CACHE_DIR), "expansions.sqlite"))
+
+    def test_key_ignores_case_and_whitespace_but_not_scope_mode_or_count(self):
+        key = QueryExpansionCache.key("video-a", "llm", 3, "What is  a Gradient?")
+        self.assertEqual(key, QueryExpansionCache.key("video-a", "llm", 3, " what is a gradient? "))
+        self.assertNotEqual(key, QueryExpansionCache.key("video-b", "llm", 3, "What is a Gradient?"))
+        self.assertNotEqual(key, QueryExpansionCache.key("video-a", "keywords", 3, "What is a Gradient?"))
+        self.assertNotEqual(key, QueryExpansionCache.key("video-a", "llm", 2, "What is a Gradient?"))
+
+    def test_get_returns_what_was_put_across_instances(self):
+        self.cache.put("k", ["one", "two"])
+        self.assertEqual(QueryExpansionCache(self.cache.path).get("k"), ["one", "two"])
+        self.assertIsNone(self.cache.get("missing"))
+        self.assertEqual(self.cache.stats(), {"hits": 0, "misses": 1, "hit_ratio": 0.0})
+
+
+class ExpandingFusionRetrieverTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = QueryExpansionCache(os.path.join(tempfile.mkdtemp(dir=support.CACHE_DIR), "expansions.sqlite"))
+        self.retriever = EchoRetriever()
+        self.generated = mock.Mock(return_value=[QueryBundle("sub one"), QueryBundle("sub two")])
+        patcher = mock.patch.object(QueryFusionRetriever, "_get_queries", self.generated)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fusion(self, expansion="llm", **kwargs):
+        return ExpandingFusionRetriever([self.retriever], scope="video-a", expansion=expansion, cache=self.cache,
+                                        llm=MockLLM(), num_queries=3, **kwargs)
+
+    def test_generated_queries_are_cached_per_scope_and_question(self):
+        for _ in range(2):
+            queries = self.fusion()._get_queries("What is a gradient?")
+            self.assertEqual([q.query_str for q in queries], ["sub one", "sub two"])
+        self.generated.assert_called_once()
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_keyword_and_disabled_expansion_never_call_the_llm(self):
+        queries = self.fusion("keywords")._get_queries("How does gradient descent converge?")
+        self.assertEqual([q.query_str for q in queries], keyword_queries("How does gradient descent converge?", 2))
+        self.assertEqual(self.fusion("none")._get_queries("How does gradient descent converge?"), [])
+        self.generated.assert_not_called()
+        with self.assertRaises(ValueError):
+            self.fusion("sometimes")
+
+    def test_all_queries_are_embedded_in_one_request_then_retrieved(self):
+        embed_model = FakeEmbedding(model_name="fusion")
+        self.fusion(embed_model=embed_model).retrieve("What is a gradient?")
+        self.assertEqual([sorted(request) for request in embed_model.requests],
+                         [["What is a gradient?", "sub one", "sub two"]])
+        self.assertEqual(sorted(self.retriever.queries),
+                         [("What is a gradient?", [19.0, 1.0]), ("sub one", [7.0, 1.0]), ("sub two", [7.0, 1.0])])
+
+
+class KeywordQueriesTest(unittest.TestCase):
+    def test_rarest_terms_first_without_repeating_the_question(self):
+        self.assertEqual(keyword_queries("How does gradient descent converge?", 3),
+                         ["how does gradient descent converge", "gradient converge", "does gradient descent converge"])
+        self.assertEqual(keyword_queries("gradient", 3), [])
+        self.assertEqual(keyword_queries("???", 3), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
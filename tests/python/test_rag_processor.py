@@ -0,0 +1,143 @@
+import json
+import os
+import random
+import tempfile
+import unittest
+from collections import OrderedDict
+from unittest import mock
+
+import support
+
+import rag_processor
+from audio_processing import ChunkInfo
+from fakes import FakeEmbedding
+from rag_processor import (INDEX_EMBEDDING_FNAME, TranscriptMerger, build_rag_pipeline, combine_transcripts,
+                           load_rag_pipeline, rag_index_key, segments_to_text)
+
+
+def segment(start, end, text):
+    return {"start": start, "end": end, "text": text}
+
+
+class CombineTranscriptsTest(unittest.TestCase):
+    def test_overlap_is_split_down_the_middle(self):
+        chunks = [ChunkInfo(0, "", 0, 60), ChunkInfo(1, "", 50, 60)]
+        # The shared 50-60s is cut at 55s: segments starting before it come from the first chunk
+        first = [segment(0, 30, "a"), segment(30, 52, "b"), segment(52, 56, "c"), segment(56, 60, "tail-first")]
+        second = [segment(50, 52, "b-again"), segment(52, 56, "c-again"), segment(56, 60, "tail-second"),
+                  segment(60, 110, "d")]
+        merged = combine_transcripts(chunks, [first, second])
+        self.assertEqual([s["text"] for s in merged], ["a", "b", "c", "tail-second", "d"])
+
+    def test_chunks_cut_at_silence_share_nothing(self):
+        chunks = [ChunkInfo(0, "", 0, 40), ChunkInfo(1, "", 40, 40)]
+        merged = combine_transcripts(chunks, [[segment(0, 39, "a")], [segment(41, 79, "b")]])
+        self.assertEqual(segments_to_text(merged), "a b")
+
+    def test_empty_segments_are_dropped(self):
+        chunks = [ChunkInfo(0, "", 0, 30)]
+        merged = combine_transcripts(chunks, [[segment(0, 5, ""), segment(5, 10, "x")]])
+        self.assertEqual(merged, [segment(5, 10, "x")])
+
+    def test_no_chunks(self):
+        self.assertEqual(combine_transcripts([], []), [])
+
+
+def random_layout(rng, count=6, length=60, overlap=10):
+    """Overlapping chunks, each with segments that straddle its neighbours' overlaps"""
+    chunks, chunk_segments = [], []
+    for index in range(count):
+        start = index * (length - overlap)
+        chunks.append(ChunkInfo(index, "", start, length))
+        t, segments = start + rng.uniform(0, 2), []
+        while t < start + length:
+            end = min(t + rng.uniform(1, 8), start + length)
+            segments.append(segment(round(t, 3), round(end, 3), f"{index}:{len(segments)}"))
+            t = end
+        chunk_segments.append(segments)
+    return chunks, chunk_segments
+
+
+class TranscriptMergerTest(unittest.TestCase):
+    def merge(self, merger, chunks, chunk_segments, order):
+        merged = []
+        for i in order:
+            merged += merger.add(chunks[i], chunk_segments[i])
+        return merged + merger.finish()
+
+    def test_out_of_order_arrival_matches_combine_transcripts(self):
+        rng = random.Random(0)
+        for _ in range(50):
+            chunks, chunk_segments = random_layout(rng)
+            order = list(range(len(chunks)))
+            rng.shuffle(order)
+            for max_overlap in (float("inf"), 10):
+                with self.subTest(order=order, max_overlap=max_overlap):
+                    self.assertEqual(self.merge(TranscriptMerger(max_overlap), chunks, chunk_segments, order),
+                                     combine_transcripts(chunks, chunk_segments))
+
+    def test_nothing_is_released_until_earlier_chunks_arrive(self):
+        chunks = [ChunkInfo(0, "", 0, 60), ChunkInfo(1, "", 50, 60)]
+        merger = TranscriptMerger()
+        self.assertEqual(merger.add(chunks[1], [segment(60, 70, "later")]), [])
+        self.assertEqual(merger.add(chunks[0], [segment(0, 10, "first")]), [segment(0, 10, "first")])
+        self.assertEqual(merger.finish(), [segment(60, 70, "later")])
+
+    def test_max_overlap_releases_a_chunk_before_the_next_arrives(self):
+        chunk = ChunkInfo(0, "", 0, 60)
+        segments = [segment(0, 30, "a"), segment(30, 49, "b"), segment(50, 60, "c")]
+        merger = TranscriptMerger(max_overlap=10)
+        self.assertEqual([s["text"] for s in merger.add(chunk, segments)], ["a", "b"])
+        self.assertEqual([s["text"] for s in merger.finish()], ["c"])
+        self.assertEqual(TranscriptMerger().add(chunk, segments), [])
+
+
+TRANSCRIPT = " ".join(f"Sentence {i} explains gradient descent step {i} in some detail." for i in range(80))
+
+
+class PersistedIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.embed_model = FakeEmbedding()
+        patchers = [
+            mock.patch.object(rag_processor, "INDEX_ROOT", tempfile.mkdtemp(dir=support.CACHE_DIR)),
+            mock.patch.object(rag_processor, "_loaded_pipelines", OrderedDict()),
+            mock.patch.object(rag_processor, "get_embed_model", lambda: self.embed_model),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def persist_dir(self):
+        return os.path.join(rag_processor.INDEX_ROOT, rag_index_key(TRANSCRIPT))
+
+    def test_built_index_is_reused_from_memory_then_disk(self):
+        built = build_rag_pipeline(TRANSCRIPT)
+        self.assertIs(build_rag_pipeline(TRANSCRIPT), built)
+        with open(os.path.join(self.persist_dir(), INDEX_EMBEDDING_FNAME)) as f:
+            self.assertEqual(json.load(f)["embed_model"], "FakeEmbedding:fake")
+
+        rag_processor._loaded_pipelines.clear()
+        with mock.patch.object(rag_processor, "load_rag_pipeline", wraps=load_rag_pipeline) as load:
+            loaded = build_rag_pipeline(TRANSCRIPT)
+        load.assert_called_once_with(self.persist_dir())
+        self.assertEqual(len(loaded["index"].docstore.docs), len(built["index"].docstore.docs))
+        nodes = loaded["retrievers"]["bm25"].retrieve("gradient descent step 42")
+        self.assertIn("step 42", nodes[0].get_content())
+
+    def test_index_embedded_with_another_model_is_rebuilt(self):
+        build_rag_pipeline(TRANSCRIPT)
+        rag_processor._loaded_pipelines.clear()
+        marker = os.path.join(self.persist_dir(), INDEX_EMBEDDING_FNAME)
+        with open(marker, "w") as f:
+            json.dump({"backend": "openai", "embed_model": "OpenAIEmbedding:text-embedding-3-small"}, f)
+        with self.assertRaisesRegex(ValueError, "embedded with OpenAIEmbedding"):
+            load_rag_pipeline(self.persist_dir())
+
+        build_rag_pipeline(TRANSCRIPT)
+        with open(marker) as f:
+            self.assertEqual(json.load(f)["embed_model"], "FakeEmbedding:fake")
+        self.assertIn("index", load_rag_pipeline(self.persist_dir()))
+
+
+if __name__ == "__main__":
+    unittest.main()
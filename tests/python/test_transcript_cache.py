@@ -0,0 +1,67 @@
+import json
+import os
+import tempfile
+import unittest
+
+import support
+
+from transcript_cache import TranscriptCache, file_sha256, new_entry
+
+
+class TranscriptCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = TranscriptCache(tempfile.mkdtemp(dir=support.CACHE_DIR))
+
+    def entry(self, sha, transcript="hello"):
+        return new_entry("Youtube:abc", sha, transcript, [])
+
+    def age(self, key, mtime):
+        os.utime(self.cache._path(key), (mtime, mtime))
+
+    def test_entries_are_found_under_their_hash_or_any_alias(self):
+        self.cache.put("sha-1", self.entry("sha-1"), aliases=["Youtube:abc", "https://youtu.be/abc"])
+        for key in ("sha-1", "Youtube:abc", "https://youtu.be/abc"):
+            with self.subTest(key=key):
+                self.assertEqual(self.cache.get(key)["audio_sha256"], "sha-1")
+        self.assertIsNone(self.cache.get("Youtube:other"))
+        self.assertEqual(self.cache.stats(), {"hits": 3, "misses": 1, "hit_ratio": 0.75})
+
+    def test_get_tries_keys_in_order_and_skips_empty_ones(self):
+        self.cache.put("sha-1", self.entry("sha-1"))
+        self.cache.add_aliases("sha-1", ["Youtube:abc"])
+        self.assertEqual(self.cache.get(None, "", "missing", "Youtube:abc")["audio_sha256"], "sha-1")
+        self.assertIsNone(self.cache.get("missing", count_miss=False))
+        self.assertEqual(self.cache.stats()["misses"], 0)
+
+    def test_unreadable_entries_are_dropped(self):
+        self.cache.put("sha-1", self.entry("sha-1"))
+        with open(self.cache._path("sha-1"), "w") as f:
+            f.write("{not json")
+        self.assertIsNone(self.cache.get("sha-1"))
+        self.assertFalse(os.path.exists(self.cache._path("sha-1")))
+
+    def test_least_recently_used_entries_are_evicted_over_max_bytes(self):
+        size = len(json.dumps(self.entry("sha-a")))
+        self.cache.max_bytes = 2 * size + size // 2
+        self.cache.put("sha-a", self.entry("sha-a"))
+        self.cache.put("sha-b", self.entry("sha-b"))
+        self.age("sha-a", 1000)
+        self.age("sha-b", 2000)
+        self.cache.get("sha-a")
+        self.cache.put("sha-c", self.entry("sha-c"))
+        self.assertIsNotNone(self.cache.get("sha-a"))
+        self.assertIsNone(self.cache.get("sha-b"))
+        self.assertIsNotNone(self.cache.get("sha-c"))
+
+
+class FileSha256Test(unittest.TestCase):
+    def test_hashes_content_in_blocks(self):
+        path = os.path.join(tempfile.mkdtemp(dir=support.CACHE_DIR), "audio.mp3")
+        with open(path, "wb") as f:
+            f.write(b"abc")
+        self.assertEqual(file_sha256(path, block_size=1),
+                         "ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad")
+
+
+if __name__ == "__main__":
+    unittest.main()
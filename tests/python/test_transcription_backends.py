@@ -0,0 +1,63 @@
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import support  # noqa: F401
+
+import transcription_backends
+from transcription_backends import LocalWhisperBackend, OpenAIWhisperBackend, get_backend
+
+
+class GetBackendTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(transcription_backends._backends, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_one_shared_instance_per_name(self):
+        local = get_backend("local")
+        self.assertIsInstance(local, LocalWhisperBackend)
+        self.assertIs(get_backend("local"), local)
+        self.assertIsInstance(get_backend("openai"), OpenAIWhisperBackend)
+
+    def test_default_comes_from_the_environment_setting(self):
+        with mock.patch.object(transcription_backends, "TRANSCRIPTION_BACKEND", "local"):
+            self.assertEqual(get_backend().name, "local")
+            self.assertEqual(get_backend("openai").name, "openai")
+
+    def test_unknown_backend_names_the_choices(self):
+        with self.assertRaisesRegex(ValueError, "choose from openai, local"):
+            get_backend("whisper.cpp")
+
+
+class LocalWhisperBackendTest(unittest.TestCase):
+    def test_segments_are_decoded_from_the_shared_model(self):
+        backend = LocalWhisperBackend(model="tiny", compute_type="int8", threads=2, workers=3)
+        backend._model = mock.Mock()
+        backend._model.transcribe.return_value = (iter([SimpleNamespace(start=0.0, end=1.5, text=" hi")]), None)
+        self.assertEqual(backend.transcribe("chunk.mp3"), [{"start": 0.0, "end": 1.5, "text": " hi"}])
+        self.assertEqual(backend.max_concurrency, 3)
+        self.assertEqual(backend.describe(), {"backend": "local", "model": "tiny", "compute_type": "int8",
+                                              "threads": 2})
+
+    def test_missing_dependency_is_reported_on_first_use(self):
+        backend = LocalWhisperBackend()
+        with mock.patch.dict(sys.modules, {"faster_whisper": None}):
+            self.assertFalse(backend.available())
+            with self.assertRaisesRegex(RuntimeError, "pip install faster-whisper"):
+                backend.transcribe("chunk.mp3")
+
+
+class OpenAIWhisperBackendTest(unittest.TestCase):
+    def test_requests_go_through_the_whisper_scheduler(self):
+        response = SimpleNamespace(segments=[SimpleNamespace(start=2.0, end=3.0, text="hello")])
+        run = mock.Mock(return_value=response)
+        with mock.patch.object(transcription_backends.whisper_scheduler, "run", run):
+            segments = OpenAIWhisperBackend().transcribe("/tmp/chunk_001.mp3")
+        self.assertEqual(segments, [{"start": 2.0, "end": 3.0, "text": "hello"}])
+        self.assertEqual(run.call_args.args[0], "chunk_001.mp3")
+
+
+if __name__ == "__main__":
+    unittest.main()
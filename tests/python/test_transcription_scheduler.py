@@ -0,0 +1,94 @@
+import unittest
+from unittest import mock
+
+import support  # noqa: F401
+
+import transcription_scheduler
+from transcription_scheduler import TokenBucket, retry_after_seconds
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def http_error(headers):
+    error = Exception("rate limited")
+    error.response = mock.Mock(headers=headers)
+    return error
+
+
+class TokenBucketTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.multiple(transcription_scheduler.time, monotonic=self.clock.monotonic,
+                                      sleep=self.clock.sleep)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_up_to_capacity_then_waits_for_refill(self):
+        bucket = TokenBucket(rate_per_second=2.0, capacity=3)
+        for _ in range(3):
+            bucket.acquire()
+        self.assertEqual(self.clock.sleeps, [])
+        bucket.acquire()
+        self.assertEqual(len(self.clock.sleeps), 1)
+        self.assertAlmostEqual(self.clock.sleeps[0], 0.5)
+
+    def test_tokens_never_exceed_capacity(self):
+        bucket = TokenBucket(rate_per_second=4.0, capacity=2)
+        self.clock.now += 60
+        for _ in range(2):
+            bucket.acquire()
+        bucket.acquire()
+        self.assertAlmostEqual(sum(self.clock.sleeps), 0.25)
+
+    def test_defer_pauses_callers_even_with_tokens(self):
+        bucket = TokenBucket(rate_per_second=100.0, capacity=5)
+        bucket.defer(3.0)
+        bucket.acquire()
+        self.assertAlmostEqual(sum(self.clock.sleeps), 3.0)
+
+    def test_defer_keeps_the_later_deadline(self):
+        bucket = TokenBucket(rate_per_second=100.0, capacity=5)
+        bucket.defer(5.0)
+        bucket.defer(1.0)
+        bucket.acquire()
+        self.assertAlmostEqual(sum(self.clock.sleeps), 5.0)
+
+
+class RetryAfterTest(unittest.TestCase):
+    def test_seconds(self):
+        self.assertEqual(retry_after_seconds(http_error({"retry-after": "7"})), 7.0)
+
+    def test_milliseconds_take_precedence(self):
+        headers = {"retry-after-ms": "250", "retry-after": "7"}
+        self.assertEqual(retry_after_seconds(http_error(headers)), 0.25)
+
+    def test_http_date(self):
+        with mock.patch.object(transcription_scheduler.time, "time", return_value=1445412470.0):
+            delay = retry_after_seconds(http_error({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}))
+        self.assertAlmostEqual(delay, 10.0)
+
+    def test_past_date_is_zero(self):
+        self.assertEqual(retry_after_seconds(http_error({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"})), 0.0)
+
+    def test_malformed_value_is_none(self):
+        self.assertIsNone(retry_after_seconds(http_error({"retry-after": "soon"})))
+        self.assertEqual(retry_after_seconds(http_error({"retry-after-ms": "x", "retry-after": "2"})), 2.0)
+
+    def test_no_response_or_header(self):
+        self.assertIsNone(retry_after_seconds(Exception("boom")))
+        self.assertIsNone(retry_after_seconds(http_error({})))
+
+
+if __name__ == "__main__":
+    unittest.main()
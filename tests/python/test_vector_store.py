@@ -0,0 +1,115 @@
+import os
+import tempfile
+import unittest
+
+import support  # noqa: F401
+
+import numpy as np
+from llama_index.core.schema import NodeRelationship, RelatedNodeInfo, TextNode
+from llama_index.core.vector_stores.types import VectorStoreQuery
+
+from vector_store import VECTOR_STORE_FNAME, NumpyVectorStore, quantize, top_k
+
+
+def make_nodes(count, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    return [TextNode(id_=f"node-{i}", text=f"text {i}", embedding=rng.normal(size=dim).tolist())
+            for i in range(count)]
+
+
+def query(store, embedding, k=3):
+    return store.query(VectorStoreQuery(query_embedding=embedding, similarity_top_k=k))
+
+
+class QuantizeTest(unittest.TestCase):
+    def test_rows_are_unit_length(self):
+        rows, scales = quantize([[3.0, 4.0], [0.0, 2.0]], "float32")
+        self.assertIsNone(scales)
+        np.testing.assert_allclose(rows, [[0.6, 0.8], [0.0, 1.0]], rtol=1e-6)
+
+    def test_int8_round_trips_within_a_step(self):
+        embeddings = np.random.default_rng(1).normal(size=(5, 32))
+        rows, scales = quantize(embeddings, "int8")
+        self.assertEqual(rows.dtype, np.int8)
+        unit = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+        np.testing.assert_allclose(rows * scales[:, None], unit, atol=scales.max())
+
+    def test_top_k_skips_non_finite_scores(self):
+        scores = np.array([0.1, -np.inf, 0.9, 0.5], dtype=np.float32)
+        self.assertEqual(top_k(scores, 3).tolist(), [2, 3, 0])
+        self.assertEqual(top_k(np.array([-np.inf, 0.2]), 2).tolist(), [1])
+
+
+class NumpyVectorStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(dir=support.CACHE_DIR)
+        self.path = os.path.join(self.dir, VECTOR_STORE_FNAME)
+
+    def test_query_finds_the_nearest_node(self):
+        nodes = make_nodes(50)
+        store = NumpyVectorStore(dtype="float32")
+        store.add(nodes)
+        result = query(store, nodes[7].embedding)
+        self.assertEqual(result.ids[0], "node-7")
+        self.assertAlmostEqual(result.similarities[0], 1.0, places=5)
+
+    def test_node_id_filter(self):
+        nodes = make_nodes(20)
+        store = NumpyVectorStore()
+        store.add(nodes)
+        result = store.query(VectorStoreQuery(query_embedding=nodes[3].embedding, similarity_top_k=5,
+                                              node_ids=["node-1", "node-2"]))
+        self.assertEqual(sorted(result.ids), ["node-1", "node-2"])
+
+    def test_persist_and_mmap_reload(self):
+        for dtype in ("float16", "int8"):
+            with self.subTest(dtype=dtype):
+                nodes = make_nodes(40)
+                store = NumpyVectorStore(dtype=dtype, dimensions=8)
+                store.add(nodes)
+                store.persist(self.path)
+
+                loaded = NumpyVectorStore.from_persist_dir(self.dir)
+                self.assertIsInstance(loaded.vectors, np.memmap)
+                self.assertEqual((loaded.dtype, loaded.dimensions), (dtype, 8))
+                np.testing.assert_array_equal(loaded.vectors, store.vectors)
+                expected, actual = query(store, nodes[11].embedding), query(loaded, nodes[11].embedding)
+                self.assertEqual(actual.ids, expected.ids)
+                np.testing.assert_allclose(actual.similarities, expected.similarities, rtol=1e-6)
+
+    def test_adding_to_a_mapped_store_leaves_the_file_alone(self):
+        store = NumpyVectorStore()
+        store.add(make_nodes(10))
+        store.persist(self.path)
+        on_disk = np.load(os.path.join(self.dir, "default__vector_store.vectors.npy"))
+
+        loaded = NumpyVectorStore.from_persist_dir(self.dir)
+        extra = make_nodes(5, seed=2)
+        for node in extra:
+            node.id_ = "extra-" + node.id_
+        loaded.add(extra)
+        self.assertEqual(loaded.vectors.shape[0], 15)
+        self.assertEqual(query(loaded, extra[0].embedding).ids[0], "extra-node-0")
+        np.testing.assert_array_equal(
+            np.load(os.path.join(self.dir, "default__vector_store.vectors.npy")), on_disk)
+
+    def test_delete_by_document(self):
+        nodes = make_nodes(6)
+        for i, node in enumerate(nodes):
+            node.relationships = {NodeRelationship.SOURCE: RelatedNodeInfo(node_id="odd" if i % 2 else "even")}
+        store = NumpyVectorStore()
+        store.add(nodes)
+        store.delete("even")
+        self.assertEqual(store._ids, ["node-1", "node-3", "node-5"])
+        self.assertEqual(query(store, nodes[3].embedding).ids[0], "node-3")
+
+    def test_empty_store(self):
+        store = NumpyVectorStore()
+        self.assertEqual(query(store, [1.0, 0.0]).ids, [])
+        self.assertEqual(store.nbytes, 0)
+        with self.assertRaises(ValueError):
+            NumpyVectorStore(dtype="float64")
+
+
+if __name__ == "__main__":
+    unittest.main()
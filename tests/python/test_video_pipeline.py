@@ -0,0 +1,127 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import support
+
+import video_pipeline
+from audio_processing import AudioInfo, ChunkInfo
+from video_pipeline import cut_in_order, run_pipeline
+
+
+class FakeCutter:
+    """Stands in for ffmpeg: later chunks finish first, and overlapping cuts are counted"""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak = 0
+        self.started = []
+
+    def __call__(self, chunk):
+        with self.lock:
+            self.started.append(chunk.index)
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(self.delay / (chunk.index + 1))
+        with self.lock:
+            self.in_flight -= 1
+        with open(chunk.path, "wb") as f:
+            f.write(b"audio")
+        chunk.size = 5
+        return chunk
+
+
+def make_chunks(count, directory=""):
+    return [ChunkInfo(i, os.path.join(directory, f"chunk_{i:03d}.mp3"), i * 10.0, 10.0) for i in range(count)]
+
+
+class CutInOrderTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(dir=support.CACHE_DIR)
+
+    def test_cuts_concurrently_and_yields_in_order(self):
+        cutter = FakeCutter()
+        chunks = list(cut_in_order(make_chunks(8, self.dir), cutter, max_workers=3))
+        self.assertEqual([chunk.index for chunk in chunks], list(range(8)))
+        self.assertGreater(cutter.peak, 1)
+        self.assertLessEqual(cutter.peak, 3)
+
+    def test_never_cuts_more_than_max_workers_ahead(self):
+        cutter = FakeCutter(delay=0)
+        cuts = cut_in_order(make_chunks(8, self.dir), cutter, max_workers=2)
+        self.assertEqual(next(cuts).index, 0)
+        time.sleep(0.05)
+        self.assertLessEqual(len(cutter.started), 2)
+        cuts.close()
+
+    def test_errors_reach_the_consumer(self):
+        def cut(chunk):
+            if chunk.index == 1:
+                raise RuntimeError("ffmpeg failed")
+            return chunk
+
+        cuts = cut_in_order(make_chunks(4, self.dir), cut, max_workers=2)
+        self.assertEqual(next(cuts).index, 0)
+        with self.assertRaisesRegex(RuntimeError, "ffmpeg failed"):
+            next(cuts)
+
+
+class FakeDownloader:
+    """yt-dlp stand-in that "downloads" by firing the progress hooks for a local file"""
+
+    path = None
+
+    def __init__(self, opts):
+        self.hooks = opts["progress_hooks"]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def process_info(self, info):
+        size = os.path.getsize(self.path)
+        for hook in self.hooks:
+            hook({"status": "downloading", "downloaded_bytes": size, "total_bytes": size, "tmpfilename": self.path})
+        for hook in self.hooks:
+            hook({"status": "finished", "filename": self.path})
+
+
+class RunPipelineTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(dir=support.CACHE_DIR)
+        FakeDownloader.path = os.path.join(self.dir, "audio.mp3")
+        with open(FakeDownloader.path, "wb") as f:
+            f.write(b"\0" * 1000)
+        self.cutter = FakeCutter()
+        info = {"id": "abc", "extractor_key": "Test", "title": "Test", "duration": 80, "ext": "mp3",
+                "acodec": "mp3"}
+        patchers = [
+            mock.patch.object(video_pipeline, "fetch_info", return_value=info),
+            mock.patch.object(video_pipeline.yt_dlp, "YoutubeDL", FakeDownloader),
+            mock.patch.object(video_pipeline, "encode_chunk", lambda path, chunk, preprocess=False: self.cutter(chunk)),
+            mock.patch.object(video_pipeline, "probe_audio", lambda path: AudioInfo(10.0, "mp3", None)),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_chunks_are_cut_concurrently_and_queued_in_order(self):
+        transcribed = []
+        result = run_pipeline("https://example.com/abc", self.dir, lambda chunk: transcribed.append(chunk.index),
+                              max_workers=1, chunk_seconds=10, overlap_seconds=0, max_cut_workers=4)
+        self.assertEqual(transcribed, list(range(8)))
+        self.assertEqual([chunk.index for chunk in result.chunks], list(range(8)))
+        self.assertGreater(self.cutter.peak, 1)
+        self.assertLessEqual(self.cutter.peak, 4)
+        self.assertEqual(result.video_id, "Test:abc")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,214 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from transcript_cache import CACHE_ROOT
+
+logger = logging.getLogger(__name__)
+
+TRACE_ENABLED = os.environ.get("TRACE_ENABLED", "0") == "1" or bool(os.environ.get("TRACE_FILE"))
+TRACE_FILE = os.environ.get("TRACE_FILE") or os.path.join(CACHE_ROOT, "traces.jsonl")
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    started: float
+    duration: float = 0.0
+    status: str = "ok"
+    error: Optional[str] = None
+    pid: int = 0
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def incr(self, **counts) -> None:
+        for key, value in counts.items():
+            self.attrs[key] = self.attrs.get(key, 0) + value
+
+
+class _NoopSpan:
+    """Returned by a disabled tracer; every method is a no-op"""
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+    def set(self, **attrs) -> None:
+        pass
+
+    def incr(self, **counts) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+class _ActiveSpan:
+    def __init__(self, tracer: "Tracer", span: Span):
+        self.tracer = tracer
+        self.span = span
+        self._token = None
+        self._started = 0.0
+
+    def __enter__(self) -> Span:
+        self._token = _current.set(self.span)
+        self._started = time.perf_counter()
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.span.duration = time.perf_counter() - self._started
+        if exc_type is not None:
+            self.span.status = "cancelled" if exc_type is GeneratorExit else "error"
+            self.span.error = f"{exc_type.__name__}: {exc}"
+        _current.reset(self._token)
+        self.tracer._record(self.span)
+
+
+class Tracer:
+    """Nested timing spans for the video pipeline and the RAG question flow.
+
+    ``span(name, **attrs)`` times a block and records it with its parent
+    (the enclosing span in the same context) and any attributes set on it,
+    such as bytes, chunk counts or token counts. Finished spans are kept in
+    memory and, with ``path``, appended to a JSONL file shared by every
+    process. Disabled, ``span`` returns a shared no-op object, so the
+    instrumentation costs one attribute check per call.
+    """
+
+    def __init__(self, enabled: bool = TRACE_ENABLED, path: Optional[str] = TRACE_FILE,
+                 history: int = 5000):
+        self.enabled = enabled
+        self.path = path
+        if enabled and path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.spans = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def span(self, name: str, **attrs):
+        if not self.enabled:
+            return _NOOP
+        parent = _current.get()
+        return _ActiveSpan(self, Span(
+            name=name,
+            trace_id=parent.trace_id if parent else uuid.uuid4().hex,
+            span_id=uuid.uuid4().hex[:16],
+            parent_id=parent.span_id if parent else None,
+            started=time.time(),
+            pid=os.getpid(),
+            attrs=attrs
+        ))
+
+    def traced(self, name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+        """Decorator running the whole function in a span; attach attributes with ``current_span()``"""
+        def decorate(fn: Callable[..., Any]) -> Callable[..., Any]:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with self.span(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def _record(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+            if self.path:
+                try:
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(asdict(span), default=str) + "\n")
+                except OSError as e:
+                    logger.warning(f"Could not write trace to {self.path}: {e}")
+
+    def load(self, limit: int = 20000) -> List[dict]:
+        """Spans from the trace file (every process), or from memory without one"""
+        if self.path and os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                lines = deque(f, maxlen=limit)
+            return [json.loads(line) for line in lines if line.strip()]
+        with self._lock:
+            return [asdict(span) for span in self.spans]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans.clear()
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
+
+
+def current_span():
+    """The innermost open span in this context, or a no-op span"""
+    return _current.get() or _NOOP
+
+
+def propagate(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Bind ``fn`` to a copy of the caller's context so spans it opens on
+    another thread nest under the caller's current span. Bind once per
+    thread or task: a context cannot run on two threads at once."""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.run(fn, *args, **kwargs)
+    return run
+
+
+def percentile(values: List[float], q: float) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[int(q) - 1]
+
+
+def summarize(spans: Iterable[dict]) -> List[dict]:
+    """Per span name: count, errors, total and percentile seconds, and summed numeric attributes"""
+    by_name: Dict[str, List[dict]] = {}
+    for span in spans:
+        by_name.setdefault(span["name"], []).append(span)
+    rows = []
+    for name, group in by_name.items():
+        durations = [s["duration"] for s in group]
+        row = {
+            "stage": name,
+            "count": len(group),
+            "errors": sum(s["status"] == "error" for s in group),
+            "total_s": round(sum(durations), 3),
+            "p50_s": round(percentile(durations, 50), 3),
+            "p95_s": round(percentile(durations, 95), 3),
+        }
+        totals: Dict[str, float] = {}
+        for span in group:
+            for key, value in span["attrs"].items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    totals[key] = totals.get(key, 0) + value
+        row.update({key: round(value, 3) for key, value in totals.items()})
+        rows.append(row)
+    return sorted(rows, key=lambda row: row["total_s"], reverse=True)
+
+
+def traces(spans: Iterable[dict]) -> Dict[str, List[dict]]:
+    """Group spans by trace, each trace ordered by start time"""
+    grouped: Dict[str, List[dict]] = {}
+    for span in spans:
+        grouped.setdefault(span["trace_id"], []).append(span)
+    for group in grouped.values():
+        group.sort(key=lambda span: span["started"])
+    return grouped
+
+
+tracer = Tracer()
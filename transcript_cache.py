@@ -0,0 +1,145 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_ROOT = os.environ.get(
+    "RAG_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "polish_bot")
+)
+DEFAULT_MAX_BYTES = int(os.environ.get("RAG_TRANSCRIPT_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    """Hash a file's content without loading it into memory"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class TranscriptCache:
+    """Persistent, size-bounded LRU cache of finished transcripts.
+
+    Entries are stored once under their audio content hash; video IDs and
+    URLs are stored as small alias files pointing at that entry. File mtime
+    doubles as the LRU access time.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root or os.path.join(CACHE_ROOT, "transcripts")
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json")
+
+    def _read(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            os.utime(path)
+            return data
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Dropping unreadable cache file {path}: {e}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+    def _write(self, key: str, data: dict) -> None:
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def get(self, *keys: str, count_miss: bool = True) -> Optional[dict]:
+        """Return the first entry found under any of the given keys"""
+        with self._lock:
+            for key in keys:
+                if not key:
+                    continue
+                data = self._read(key)
+                if data and "alias" in data:
+                    data = self._read(data["alias"])
+                if data:
+                    self.hits += 1
+                    return data
+            if count_miss:
+                self.misses += 1
+            return None
+
+    def put(self, key: str, entry: dict, aliases: Iterable[str] = ()) -> None:
+        with self._lock:
+            self._write(key, entry)
+            self._write_aliases(key, aliases)
+            self._evict()
+
+    def add_aliases(self, key: str, aliases: Iterable[str]) -> None:
+        with self._lock:
+            self._write_aliases(key, aliases)
+
+    def _write_aliases(self, key: str, aliases: Iterable[str]) -> None:
+        for alias in aliases:
+            if alias and alias != key:
+                self._write(alias, {"alias": key})
+
+    def _evict(self) -> None:
+        files = []
+        total = 0
+        for name in os.listdir(self.root):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        if total <= self.max_bytes:
+            return
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+        logger.info(f"Transcript cache evicted down to {total} bytes")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def new_entry(video_id: Optional[str], audio_sha256: str, transcript: str, chunks: list,
+              segments: Optional[list] = None) -> dict:
+    return {
+        "video_id": video_id,
+        "audio_sha256": audio_sha256,
+        "transcript": transcript,
+        "chunks": chunks,
+        "segments": segments or [],
+        "created": time.time(),
+    }
@@ -0,0 +1,136 @@
+import logging
+import os
+import threading
+from typing import Dict, List, Optional
+
+from transcription_scheduler import WHISPER_MAX_CONCURRENCY, whisper_scheduler
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPTION_BACKEND = os.environ.get("TRANSCRIPTION_BACKEND", "openai")
+LOCAL_WHISPER_MODEL = os.environ.get("LOCAL_WHISPER_MODEL", "base")
+# int8 weights run several times faster than float32 on CPU at a small accuracy cost
+LOCAL_WHISPER_COMPUTE_TYPE = os.environ.get("LOCAL_WHISPER_COMPUTE_TYPE", "int8")
+LOCAL_WHISPER_THREADS = int(os.environ.get("LOCAL_WHISPER_THREADS", 0)) or os.cpu_count() or 1
+LOCAL_WHISPER_WORKERS = int(os.environ.get("LOCAL_WHISPER_WORKERS", 1))
+
+
+class TranscriptionBackend:
+    """Turns one audio file into segments with times relative to that file.
+
+    ``max_concurrency`` is how many files the backend usefully transcribes
+    at once; the video pipeline runs that many transcription threads.
+    """
+
+    name = "base"
+    max_concurrency = 1
+
+    def transcribe(self, path: str) -> List[dict]:
+        """[{"start", "end", "text"}, ...] in seconds from the start of ``path``"""
+        raise NotImplementedError
+
+    def describe(self) -> dict:
+        return {"backend": self.name}
+
+
+class OpenAIWhisperBackend(TranscriptionBackend):
+    """whisper-1 through the shared gateway, rate limited and retried by the Whisper scheduler"""
+
+    name = "openai"
+    max_concurrency = WHISPER_MAX_CONCURRENCY
+
+    def __init__(self, model: str = "whisper-1"):
+        self.model = model
+
+    def _create_transcription(self, path: str):
+        from clients import get_gateway
+
+        with open(path, "rb") as audio_file:
+            # Retries are owned by the scheduler so backoff and Retry-After apply uniformly
+            return get_gateway().transcribe(
+                "transcribe_chunk",
+                model=self.model,
+                file=audio_file,
+                response_format="verbose_json",
+                timestamp_granularities=["segment"]
+            )
+
+    def transcribe(self, path: str) -> List[dict]:
+        # Raises TranscriptionError instead of returning [] so a lost chunk never
+        # reaches combine_transcripts or the transcript cache
+        response = whisper_scheduler.run(os.path.basename(path), self._create_transcription, path)
+        return [{"start": s.start, "end": s.end, "text": s.text} for s in (response.segments or [])]
+
+    def describe(self) -> dict:
+        return {"backend": self.name, "model": self.model}
+
+
+class LocalWhisperBackend(TranscriptionBackend):
+    """Quantized Whisper on the CPU via faster-whisper (CTranslate2); no network calls.
+
+    The model is loaded on first use and shared by every thread; ``threads``
+    is the CPU threads per transcription and ``workers`` how many files are
+    transcribed in parallel.
+    """
+
+    name = "local"
+
+    def __init__(self, model: str = LOCAL_WHISPER_MODEL, compute_type: str = LOCAL_WHISPER_COMPUTE_TYPE,
+                 threads: int = LOCAL_WHISPER_THREADS, workers: int = LOCAL_WHISPER_WORKERS):
+        self.model_name = model
+        self.compute_type = compute_type
+        self.threads = threads
+        self.max_concurrency = workers
+        self._model = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def available() -> bool:
+        try:
+            import faster_whisper  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                try:
+                    from faster_whisper import WhisperModel
+                except ImportError as e:
+                    raise RuntimeError("The local transcription backend needs faster-whisper "
+                                       "(pip install faster-whisper)") from e
+                logger.info(f"Loading local Whisper model {self.model_name} ({self.compute_type}, "
+                            f"{self.threads} threads)")
+                self._model = WhisperModel(self.model_name, device="cpu", compute_type=self.compute_type,
+                                           cpu_threads=self.threads, num_workers=self.max_concurrency)
+            return self._model
+
+    def transcribe(self, path: str) -> List[dict]:
+        segments, _ = self.model.transcribe(path, beam_size=1, vad_filter=False)
+        # Segments are generated lazily; consuming them runs the decoder
+        return [{"start": s.start, "end": s.end, "text": s.text} for s in segments]
+
+    def describe(self) -> dict:
+        return {"backend": self.name, "model": self.model_name, "compute_type": self.compute_type,
+                "threads": self.threads}
+
+
+BACKENDS = {
+    "openai": OpenAIWhisperBackend,
+    "local": LocalWhisperBackend,
+}
+_backends: Dict[str, TranscriptionBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(name: Optional[str] = None) -> TranscriptionBackend:
+    """Shared backend instance by name (default ``TRANSCRIPTION_BACKEND``)"""
+    name = name or TRANSCRIPTION_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown transcription backend: {name} (choose from {', '.join(BACKENDS)})")
+    with _backends_lock:
+        if name not in _backends:
+            _backends[name] = BACKENDS[name]()
+        return _backends[name]
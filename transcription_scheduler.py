@@ -0,0 +1,180 @@
+import email.utils
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import timezone
+from typing import Any, Callable, Optional
+
+from openai import APIConnectionError, APIStatusError, APITimeoutError
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+WHISPER_MAX_CONCURRENCY = int(os.environ.get("WHISPER_MAX_CONCURRENCY", 4))
+WHISPER_REQUESTS_PER_MINUTE = float(os.environ.get("WHISPER_REQUESTS_PER_MINUTE", 50))
+
+
+class TranscriptionError(Exception):
+    pass
+
+
+@dataclass
+class JobMetrics:
+    name: str
+    queue_wait: float = 0.0
+    attempts: int = 0
+    latency: float = 0.0
+    status: str = "pending"
+    error: Optional[str] = None
+
+
+class TokenBucket:
+    """Thread-safe token bucket; ``defer`` pauses every caller, e.g. on Retry-After"""
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def defer(self, seconds: float) -> None:
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        # Neither seconds nor an HTTP date; fall back to computed backoff
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return max(0.0, parsed.timestamp() - time.time())
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, (APIConnectionError, APITimeoutError)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code in RETRYABLE_STATUS
+    return False
+
+
+class RateLimitedScheduler:
+    """Runs API calls under a concurrency cap and a shared request rate.
+
+    Failed calls are retried with exponential backoff and full jitter; a
+    Retry-After header from the server overrides the computed delay and
+    pauses all other callers for the same period.
+    """
+
+    def __init__(self, max_concurrency: int = 4, requests_per_minute: float = 50,
+                 max_attempts: int = 5, base_delay: float = 1.0, max_delay: float = 60.0,
+                 history: int = 1000):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.bucket = TokenBucket(requests_per_minute / 60.0, capacity=max(1, max_concurrency))
+        self.metrics = deque(maxlen=history)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+
+    def configure(self, max_concurrency: int, requests_per_minute: float) -> None:
+        """Replace the concurrency cap and request rate; call before any request is in flight"""
+        self.bucket = TokenBucket(requests_per_minute / 60.0, capacity=max(1, max_concurrency))
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            self.bucket.defer(retry_after)
+            return retry_after + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def run(self, name: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        job = JobMetrics(name=name)
+        with self._lock:
+            self.metrics.append(job)
+        submitted = time.perf_counter()
+        started = None
+        try:
+            for attempt in range(self.max_attempts):
+                with self._slots:
+                    self.bucket.acquire()
+                    if started is None:
+                        started = time.perf_counter()
+                        job.queue_wait = started - submitted
+                    job.attempts += 1
+                    try:
+                        result = fn(*args, **kwargs)
+                        job.status = "ok"
+                        return result
+                    except Exception as e:
+                        error = e
+                if not is_retryable(error) or attempt == self.max_attempts - 1:
+                    break
+                delay = self._backoff(attempt, error)
+                logger.warning(f"Retrying {name} in {delay:.1f}s (attempt {job.attempts}): {error}")
+                time.sleep(delay)
+            job.status = "failed"
+            job.error = str(error)
+            raise TranscriptionError(f"{name} failed after {job.attempts} attempts: {error}") from error
+        finally:
+            job.latency = time.perf_counter() - (started or submitted)
+
+    def summary(self) -> dict:
+        with self._lock:
+            jobs = list(self.metrics)
+        finished = [j for j in jobs if j.status != "pending"]
+        if not finished:
+            return {"jobs": 0}
+        return {
+            "jobs": len(finished),
+            "failed": sum(j.status == "failed" for j in finished),
+            "retries": sum(max(0, j.attempts - 1) for j in finished),
+            "avg_queue_wait": sum(j.queue_wait for j in finished) / len(finished),
+            "avg_latency": sum(j.latency for j in finished) / len(finished),
+            "max_latency": max(j.latency for j in finished),
+        }
+
+
+whisper_scheduler = RateLimitedScheduler(
+    max_concurrency=WHISPER_MAX_CONCURRENCY,
+    requests_per_minute=WHISPER_REQUESTS_PER_MINUTE,
+    max_attempts=int(os.environ.get("WHISPER_MAX_ATTEMPTS", 5)),
+)
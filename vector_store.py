@@ -0,0 +1,189 @@
+import json
+import os
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore, VectorStoreQuery, VectorStoreQueryResult
+)
+
+VECTOR_STORE_FNAME = "default__vector_store.json"
+# Rows scored per block, bounding the float32 scratch space a query needs
+QUERY_BLOCK_ROWS = 65536
+
+
+def _unit_rows(matrix: np.ndarray, dimensions: Optional[int]) -> np.ndarray:
+    # Matryoshka truncation only preserves meaning when followed by renormalisation
+    if dimensions:
+        matrix = matrix[:, :dimensions]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def quantize(embeddings: Sequence[Sequence[float]], dtype: str,
+             dimensions: Optional[int] = None) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Normalise embeddings and convert them to stored rows (plus int8 row scales)"""
+    unit = _unit_rows(np.asarray(embeddings, dtype=np.float32), dimensions)
+    if dtype == "int8":
+        scales = np.abs(unit).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        return np.round(unit / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+    return unit.astype(dtype), None
+
+
+def score(matrix: np.ndarray, scales: Optional[np.ndarray], query_embedding: Sequence[float],
+          dimensions: Optional[int] = None) -> np.ndarray:
+    """Cosine similarity of a query against stored rows, in bounded float32 blocks"""
+    query = _unit_rows(np.asarray([query_embedding], dtype=np.float32), dimensions)[0]
+    out = np.empty(matrix.shape[0], dtype=np.float32)
+    for start in range(0, matrix.shape[0], QUERY_BLOCK_ROWS):
+        block = matrix[start:start + QUERY_BLOCK_ROWS]
+        out[start:start + len(block)] = block.astype(np.float32) @ query
+    if scales is not None:
+        out *= scales
+    return out
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k best finite scores, best first"""
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return top[np.isfinite(scores[top])]
+
+
+class NumpyVectorStore(BasePydanticVectorStore):
+    """Vector store backed by one contiguous, optionally quantized NumPy matrix.
+
+    Vectors are unit-normalised (after optional Matryoshka truncation to
+    ``dimensions``) and stored as float16, or as int8 with a per-row scale, so
+    cosine similarity is a single matrix-vector product. Persisted matrices are
+    memory-mapped on load and only copied into memory when nodes are added.
+    """
+
+    stores_text: bool = False
+    dtype: str = "float16"
+    dimensions: Optional[int] = None
+
+    _matrix: Optional[np.ndarray] = PrivateAttr(default=None)
+    _scales: Optional[np.ndarray] = PrivateAttr(default=None)
+    _size: int = PrivateAttr(default=0)
+    _ids: List[str] = PrivateAttr(default_factory=list)
+    _ref_doc_ids: List[Optional[str]] = PrivateAttr(default_factory=list)
+
+    def __init__(self, dtype: str = "float16", dimensions: Optional[int] = None, **kwargs: Any):
+        if dtype not in ("float16", "int8", "float32"):
+            raise ValueError(f"Unsupported vector dtype: {dtype}")
+        super().__init__(dtype=dtype, dimensions=dimensions, **kwargs)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "NumpyVectorStore"
+
+    @property
+    def client(self) -> None:
+        return None
+
+    @property
+    def vectors(self) -> Optional[np.ndarray]:
+        return None if self._matrix is None else self._matrix[:self._size]
+
+    @property
+    def nbytes(self) -> int:
+        if self._matrix is None:
+            return 0
+        return self.vectors.nbytes + (self._scales[:self._size].nbytes if self._scales is not None else 0)
+
+    def _reserve(self, rows: int, dim: int) -> None:
+        needed = self._size + rows
+        if self._matrix is not None and needed <= self._matrix.shape[0] and self._matrix.flags.writeable:
+            return
+        # Grow geometrically so repeated appends stay amortised O(1) per row
+        capacity = max(needed, 2 * (self._matrix.shape[0] if self._matrix is not None else 0), 64)
+        matrix = np.zeros((capacity, dim), dtype=self.dtype)
+        scales = np.ones(capacity, dtype=np.float32) if self.dtype == "int8" else None
+        if self._matrix is not None:
+            matrix[:self._size] = self._matrix[:self._size]
+            if scales is not None:
+                scales[:self._size] = self._scales[:self._size]
+        self._matrix, self._scales = matrix, scales
+
+    def add(self, nodes: Sequence[BaseNode], **kwargs: Any) -> List[str]:
+        if not nodes:
+            return []
+        quantized, scales = quantize([node.get_embedding() for node in nodes], self.dtype, self.dimensions)
+        self._reserve(len(nodes), quantized.shape[1])
+        self._matrix[self._size:self._size + len(nodes)] = quantized
+        if scales is not None:
+            self._scales[self._size:self._size + len(nodes)] = scales
+        self._size += len(nodes)
+        self._ids.extend(node.node_id for node in nodes)
+        self._ref_doc_ids.extend(node.ref_doc_id for node in nodes)
+        return [node.node_id for node in nodes]
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        keep = [i for i, ref in enumerate(self._ref_doc_ids) if ref != ref_doc_id]
+        if len(keep) == self._size:
+            return
+        self._matrix = np.ascontiguousarray(self._matrix[keep])
+        if self._scales is not None:
+            self._scales = np.ascontiguousarray(self._scales[keep])
+        self._ids = [self._ids[i] for i in keep]
+        self._ref_doc_ids = [self._ref_doc_ids[i] for i in keep]
+        self._size = len(keep)
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if not self._size or query.query_embedding is None:
+            return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+        scales = self._scales[:self._size] if self._scales is not None else None
+        scores = score(self.vectors, scales, query.query_embedding, self.dimensions)
+        if query.node_ids:
+            allowed = set(query.node_ids)
+            mask = np.fromiter((node_id in allowed for node_id in self._ids), bool, self._size)
+            scores = np.where(mask, scores, -np.inf)
+        top = top_k(scores, query.similarity_top_k)
+        return VectorStoreQueryResult(
+            similarities=scores[top].tolist(),
+            ids=[self._ids[i] for i in top]
+        )
+
+    def persist(self, persist_path: str, fs: Any = None) -> None:
+        os.makedirs(os.path.dirname(persist_path) or ".", exist_ok=True)
+        base = os.path.splitext(persist_path)[0]
+        if self._matrix is not None:
+            np.save(base + ".vectors.npy", np.ascontiguousarray(self.vectors))
+            if self._scales is not None:
+                np.save(base + ".scales.npy", self._scales[:self._size])
+        with open(persist_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "class_name": self.class_name(),
+                "dtype": self.dtype,
+                "dimensions": self.dimensions,
+                "ids": self._ids,
+                "ref_doc_ids": self._ref_doc_ids,
+            }, f)
+
+    @classmethod
+    def from_persist_path(cls, persist_path: str, mmap: bool = True) -> "NumpyVectorStore":
+        with open(persist_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        store = cls(dtype=meta["dtype"], dimensions=meta["dimensions"])
+        base = os.path.splitext(persist_path)[0]
+        if os.path.exists(base + ".vectors.npy"):
+            mmap_mode = "r" if mmap else None
+            store._matrix = np.load(base + ".vectors.npy", mmap_mode=mmap_mode)
+            if os.path.exists(base + ".scales.npy"):
+                store._scales = np.load(base + ".scales.npy", mmap_mode=mmap_mode)
+            store._size = store._matrix.shape[0]
+        store._ids = meta["ids"]
+        store._ref_doc_ids = meta["ref_doc_ids"]
+        return store
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir: str, mmap: bool = True) -> "NumpyVectorStore":
+        return cls.from_persist_path(os.path.join(persist_dir, VECTOR_STORE_FNAME), mmap=mmap)
@@ -0,0 +1,350 @@
+import logging
+import os
+import queue
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+import yt_dlp
+
+from audio_processing import (
+    CHUNK_SECONDS, OVERLAP_SECONDS, STREAM_COPY_CONTAINERS, ChunkInfo, PreprocessReport,
+    cut_workers, encode_chunk, plan_chunks, plan_preprocessed_chunks, probe_audio
+)
+from tracing import current_span, propagate, tracer
+from transcript_cache import file_sha256
+
+logger = logging.getLogger(__name__)
+
+# Containers that are written front to back, so a partial download can be cut
+STREAMABLE_EXTS = {"webm", "mp3", "ogg", "opus"}
+# Seconds of audio beyond a chunk's end that must be on disk before cutting it
+SAFETY_MARGIN_SECONDS = 15.0
+# A chunk cut from the partial download this much shorter than planned is missing data
+SHORT_CHUNK_TOLERANCE_SECONDS = 1.0
+
+
+class PipelineCancelled(Exception):
+    def __init__(self, audio_sha256: Optional[str] = None):
+        super().__init__("pipeline cancelled")
+        self.audio_sha256 = audio_sha256
+
+
+@dataclass
+class PipelineResult:
+    video_id: str
+    title: Optional[str]
+    duration: float
+    audio_sha256: str
+    chunks: List[ChunkInfo] = field(default_factory=list)
+    transcripts: List[Any] = field(default_factory=list)
+    preprocess_report: Optional[dict] = None
+
+
+def _acodec_name(acodec: Optional[str]) -> Optional[str]:
+    if not acodec or acodec == "none":
+        return None
+    if acodec.startswith("mp4a"):
+        return "aac"
+    return acodec.split(".")[0]
+
+
+class DownloadProgress:
+    """Download state shared between the yt-dlp progress hook and the splitter"""
+
+    def __init__(self, duration: Optional[float]):
+        self.duration = duration
+        self.downloaded = 0
+        self.total = None
+        self.partial_path = None
+        self.path = None
+        self.finished = False
+        self.error = None
+        self._cond = threading.Condition()
+
+    def hook(self, d: dict) -> None:
+        with self._cond:
+            if d["status"] == "downloading":
+                self.downloaded = d.get("downloaded_bytes") or 0
+                # Estimates are too rough to tell which seconds are on disk
+                self.total = d.get("total_bytes")
+                self.partial_path = d.get("tmpfilename") or d.get("filename")
+            elif d["status"] == "finished":
+                self.path = d.get("filename")
+            self._cond.notify_all()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        with self._cond:
+            self.finished = True
+            self.error = error
+            self._cond.notify_all()
+
+    def available_seconds(self) -> float:
+        if self.finished:
+            return float("inf")
+        if not (self.total and self.duration):
+            return 0.0
+        return self.duration * self.downloaded / self.total
+
+    def wait_for(self, seconds: float, cancel: threading.Event) -> None:
+        with self._cond:
+            while self.available_seconds() < seconds and not cancel.is_set():
+                self._cond.wait(timeout=1.0)
+
+
+def fetch_info(video_url: str) -> dict:
+    """Resolve formats and metadata for the best audio stream without downloading"""
+    with tracer.span("fetch_info"), yt_dlp.YoutubeDL({'format': 'bestaudio/best', 'quiet': True}) as ydl:
+        return ydl.sanitize_info(ydl.extract_info(video_url, download=False))
+
+
+def info_video_id(info: dict) -> str:
+    return f"{info.get('extractor_key', 'generic')}:{info['id']}"
+
+
+def cut_in_order(chunks: Sequence[ChunkInfo], cut: Callable[[ChunkInfo], ChunkInfo],
+                 max_workers: int) -> Iterator[ChunkInfo]:
+    """Run ``cut`` on up to ``max_workers`` threads, yielding chunks in order.
+
+    At most ``max_workers`` chunks are in flight or waiting to be taken, so a
+    slow consumer holds back the cutting (and the disk it uses). Each cut runs
+    in a copy of the caller's context, so its spans nest under the caller's.
+    """
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline-cut")
+    pending = deque()
+    try:
+        for chunk in chunks:
+            if len(pending) >= max_workers:
+                yield pending.popleft().result()
+            pending.append(executor.submit(propagate(cut), chunk))
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # On an error, cuts still running are left to notice the pipeline's cancel event
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+@tracer.traced("run_pipeline")
+def run_pipeline(video_url: str, work_dir: str, transcribe: Callable[[ChunkInfo], Any],
+                 max_workers: int = 4, max_pending_chunks: int = 4,
+                 should_cancel: Optional[Callable[[str], bool]] = None,
+                 preprocess: bool = False,
+                 chunk_seconds: float = CHUNK_SECONDS,
+                 overlap_seconds: float = OVERLAP_SECONDS,
+                 on_progress: Optional[Callable[[str, int, int], None]] = None,
+                 on_chunk: Optional[Callable[[dict, ChunkInfo, Any], None]] = None,
+                 max_cut_workers: Optional[int] = None) -> PipelineResult:
+    """Download, split and transcribe concurrently.
+
+    Chunks are cut from the partially downloaded file as soon as enough
+    bytes have arrived, by up to ``max_cut_workers`` ffmpeg processes at
+    once (default: as many as segment_audio uses), and are handed in order
+    to ``max_workers`` transcription threads through a queue of at most
+    ``max_pending_chunks`` chunks, which caps disk use. Each chunk file is deleted once transcribed. Once the
+    download completes, ``should_cancel`` is called with the audio hash and
+    may return True to abandon the remaining work (e.g. on a cache hit).
+    With ``preprocess`` the splitter waits for the full download, since
+    silence detection needs the whole file, and then cuts trimmed 16 kHz
+    mono chunks at silences. ``on_progress(stage, done, total)`` is called
+    from the pipeline threads for the download, split and transcribe stages.
+    ``on_chunk(info, chunk, result)`` is called from a transcription thread
+    as each chunk's result lands, in completion order, with the yt-dlp info.
+    """
+    info = fetch_info(video_url)
+    duration = info.get("duration")
+    ext = info.get("ext")
+    copy_ext = STREAM_COPY_CONTAINERS.get(_acodec_name(info.get("acodec")) or "")
+    progress = DownloadProgress(duration if ext in STREAMABLE_EXTS else None)
+    cancel = threading.Event()
+    chunk_queue: "queue.Queue[Optional[ChunkInfo]]" = queue.Queue(maxsize=max_pending_chunks)
+    results: Dict[int, Any] = {}
+    chunks: List[ChunkInfo] = []
+    errors: List[BaseException] = []
+    state = {"duration": duration, "planned": 0, "transcribed": 0, "percent": -1}
+    progress_lock = threading.Lock()
+
+    def report(stage: str, done: int, total: int) -> None:
+        if on_progress:
+            with progress_lock:
+                on_progress(stage, done, total)
+
+    def report_download(d: dict) -> None:
+        total = d.get("total_bytes") or d.get("total_bytes_estimate")
+        if d["status"] != "downloading" or not total:
+            return
+        # The hook fires per network read; only report whole-percent steps
+        percent = int(100 * (d.get("downloaded_bytes") or 0) / total)
+        if percent != state["percent"]:
+            state["percent"] = percent
+            report("download", percent, 100)
+
+    def download():
+        ydl_opts = {
+            'format': 'bestaudio/best',
+            'quiet': True,
+            'outtmpl': os.path.join(work_dir, 'audio.%(ext)s'),
+            'progress_hooks': [progress.hook, report_download],
+        }
+        try:
+            with tracer.span("download") as span, yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                ydl.process_info(dict(info))
+                span.set(bytes=os.path.getsize(progress.path))
+            report("download", 100, 100)
+            state["sha256"] = file_sha256(progress.path)
+            if should_cancel and should_cancel(state["sha256"]):
+                cancel.set()
+            progress.finish()
+        except BaseException as e:
+            logger.error(f"Error downloading audio: {e}")
+            errors.append(e)
+            cancel.set()
+            progress.finish(e)
+
+    def cut(chunk: ChunkInfo) -> ChunkInfo:
+        with tracer.span("cut_chunk", audio_seconds=chunk.duration) as span:
+            chunk = _cut(chunk)
+            span.set(bytes=chunk.size)
+        return chunk
+
+    def _cut(chunk: ChunkInfo) -> ChunkInfo:
+        if progress.finished:
+            return encode_chunk(progress.path, chunk)
+        try:
+            encode_chunk(progress.partial_path, chunk)
+            # Byte ratios are only approximate for VBR audio, and ffmpeg succeeds on a
+            # partial file that ends early, so check the chunk is all there
+            with tracer.span("get_audio_duration"):
+                cut_seconds = probe_audio(chunk.path).duration
+            if cut_seconds >= chunk.duration - SHORT_CHUNK_TOLERANCE_SECONDS:
+                return chunk
+            logger.info(f"Chunk {chunk.index} was {cut_seconds:.1f}s of {chunk.duration:.1f}s; "
+                        "recutting after the download")
+        except subprocess.CalledProcessError:
+            pass
+        # The partial file was not readable or long enough yet; fall back to the finished download
+        progress.wait_for(float("inf"), cancel)
+        if progress.error or cancel.is_set():
+            raise PipelineCancelled()
+        return encode_chunk(progress.path, chunk)
+
+    def split_preprocessed():
+        progress.wait_for(float("inf"), cancel)
+        if progress.error or cancel.is_set():
+            return
+        with tracer.span("get_audio_duration"):
+            audio_info = probe_audio(progress.path)
+        state["duration"] = audio_info.duration
+        with tracer.span("detect_silences", audio_seconds=audio_info.duration):
+            planned = plan_preprocessed_chunks(progress.path, work_dir, audio_info, chunk_seconds, overlap_seconds)
+        state["planned"] = len(planned)
+
+        def cut_preprocessed(chunk: ChunkInfo) -> ChunkInfo:
+            if cancel.is_set():
+                raise PipelineCancelled()
+            with tracer.span("cut_chunk", audio_seconds=chunk.duration, preprocess=True) as span:
+                encode_chunk(progress.path, chunk, preprocess=True)
+                span.set(bytes=chunk.size)
+            return chunk
+
+        for chunk in cut_in_order(planned, cut_preprocessed, cut_workers(len(planned), max_cut_workers)):
+            chunks.append(chunk)
+            report("split", len(chunks), len(planned))
+            chunk_queue.put(chunk)
+        state["preprocess_report"] = PreprocessReport.from_chunks(audio_info, chunks).as_dict()
+        logger.info(f"Pre-processing report: {state['preprocess_report']}")
+
+    def split():
+        try:
+            if preprocess:
+                split_preprocessed()
+                return
+            if not progress.duration:
+                progress.wait_for(float("inf"), cancel)
+                if progress.error or cancel.is_set():
+                    return
+                with tracer.span("get_audio_duration"):
+                    state["duration"] = probe_audio(progress.path).duration
+            planned = [
+                ChunkInfo(index=index, path=os.path.join(work_dir, f"chunk_{index:03d}{copy_ext or '.mp3'}"),
+                          start=start, duration=length, stream_copy=bool(copy_ext))
+                for index, (start, length) in enumerate(plan_chunks(state["duration"], chunk_seconds,
+                                                                    overlap_seconds))
+            ]
+            state["planned"] = len(planned)
+
+            def wait_and_cut(chunk: ChunkInfo) -> ChunkInfo:
+                progress.wait_for(chunk.start + chunk.duration + SAFETY_MARGIN_SECONDS, cancel)
+                if cancel.is_set():
+                    raise PipelineCancelled()
+                return cut(chunk)
+
+            for chunk in cut_in_order(planned, wait_and_cut, cut_workers(len(planned), max_cut_workers)):
+                chunks.append(chunk)
+                report("split", len(chunks), len(planned))
+                logger.info(f"Chunk {chunk.index} ready after {chunk.elapsed:.2f}s "
+                            f"({progress.downloaded}/{progress.total or '?'} bytes downloaded)")
+                chunk_queue.put(chunk)
+        except PipelineCancelled:
+            pass
+        except BaseException as e:
+            logger.error(f"Error splitting audio: {e}")
+            errors.append(e)
+            cancel.set()
+        finally:
+            for _ in range(max_workers):
+                chunk_queue.put(None)
+
+    def transcribe_worker():
+        while True:
+            chunk = chunk_queue.get()
+            if chunk is None:
+                return
+            try:
+                if not cancel.is_set():
+                    results[chunk.index] = transcribe(chunk)
+                    if on_chunk:
+                        on_chunk(info, chunk, results[chunk.index])
+                    with progress_lock:
+                        state["transcribed"] += 1
+                        transcribed = state["transcribed"]
+                    report("transcribe", transcribed, state["planned"])
+            except BaseException as e:
+                logger.error(f"Error transcribing chunk {chunk.index}: {e}")
+                errors.append(e)
+                cancel.set()
+            finally:
+                if os.path.exists(chunk.path):
+                    os.remove(chunk.path)
+
+    started = time.perf_counter()
+    # Each thread runs in a copy of this context, so its spans nest under run_pipeline
+    threads = [threading.Thread(target=propagate(download), name="pipeline-download"),
+               threading.Thread(target=propagate(split), name="pipeline-split")]
+    threads += [threading.Thread(target=propagate(transcribe_worker), name=f"pipeline-transcribe-{i}")
+                for i in range(max_workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+    if cancel.is_set():
+        raise PipelineCancelled(state.get("sha256"))
+
+    logger.info(f"Pipeline finished {len(chunks)} chunks in {time.perf_counter() - started:.2f}s")
+    current_span().set(chunks=len(chunks), audio_seconds=float(state["duration"]),
+                       bytes=sum(chunk.size for chunk in chunks))
+    return PipelineResult(
+        video_id=info_video_id(info),
+        title=info.get("title"),
+        duration=float(state["duration"]),
+        audio_sha256=state["sha256"],
+        chunks=chunks,
+        transcripts=[results[chunk.index] for chunk in chunks],
+        preprocess_report=state.get("preprocess_report")
+    )